@@ -4,44 +4,133 @@ import datetime
 import os
 import json
 import re
-from openai import OpenAI
-from io import BytesIO
-from pydantic import BaseModel, Field
-from typing import List, Dict
-from enum import Enum
-import plotly.express as px
+import time
 import openpyxl
+from catalogador import pipeline, exportar, informe
+from catalogador.llm import crear_cliente, CatalogacionEnCurso, Circuito, MODELO
+from catalogador.metricas import Metricas
+from catalogador.cache import CacheDescripciones
+from catalogador.reutilizacion import IndiceColumnas
+from catalogador.almacen import AlmacenCatalogo
+from catalogador.relaciones import descubrir_relaciones, relaciones_df
+from catalogador.lectura import nombres_hojas, HOJAS_EXCLUIDAS
+from catalogador.perfil import CAMPOS_PERFIL
+from catalogador.incremental import cargar_catalogo, clasificar_tablas, indexar_catalogo
+from catalogador.huellas import IndiceDuplicados
+from catalogador.diccionario import AlmacenDiccionario
+from catalogador.completitud import (
+    CAMPOS_A_EVALUAR, MAX_TABLAS_GRAFICO_DETALLE, calcular_completitud, resumen_por,
+    grafico_por_tabla, grafico_agregado, histograma,
+)
 
 # Configuración de la API Key
 key_ = st.secrets["llm"]["key_"]
-client = OpenAI(api_key=key_)
+# Límites de concurrencia y tasa para las llamadas al modelo (configurables en secrets)
+MAX_EN_VUELO = int(st.secrets["llm"].get("max_en_vuelo", 4))
+SOLICITUDES_POR_MINUTO = st.secrets["llm"].get("solicitudes_por_minuto", 500)
+TOKENS_POR_MINUTO = st.secrets["llm"].get("tokens_por_minuto", 200000)
+# Presupuesto de tokens por llamada (las hojas más anchas se parten por columnas) y por hoja
+TOKENS_POR_SOLICITUD = int(st.secrets["llm"].get("tokens_por_solicitud", 6000))
+TOKENS_POR_TABLA = int(st.secrets["llm"].get("tokens_por_tabla", 24000))
+# Reintentos por llamada ante errores transitorios y fallos seguidos que cortan las llamadas
+REINTENTOS_IA = int(st.secrets["llm"].get("reintentos", 4))
+UMBRAL_CIRCUITO = int(st.secrets["llm"].get("umbral_circuito", 5))
+# Hojas con más filas que este umbral se leen en streaming (muestra reservorio, memoria acotada)
+UMBRAL_FILAS_STREAMING = int(st.secrets.get("lectura", {}).get("umbral_filas_streaming", 100000))
+# Número máximo de columnas de una clave compuesta en Columna_ID
+MAX_COLUMNAS_CLAVE = int(st.secrets.get("lectura", {}).get("max_columnas_clave", 3))
+# Filas de muestra para la IA: cobertura, estratificada, distintos o aleatoria (ver catalogador/muestreo.py)
+ESTRATEGIA_MUESTREO = st.secrets.get("lectura", {}).get("estrategia_muestreo", "cobertura")
+# Procesos que leen y analizan los archivos en paralelo (0: uno por núcleo disponible; 1: sin pool)
+PROCESOS_LECTURA = int(st.secrets.get("lectura", {}).get("procesos", 0)) or pipeline.procesos_disponibles()
+
+# --- Un solo cliente con pool de conexiones, compartido entre sesiones ---
+@st.cache_resource
+def get_client(api_key):
+    return crear_cliente(api_key, max_conexiones=MAX_EN_VUELO)
+
+client = get_client(key_)
+
+# --- Cache persistente de descripciones de la IA (sobrevive entre sesiones) ---
+@st.cache_resource
+def get_cache(ruta, ttl_dias, max_entradas):
+    return CacheDescripciones(ruta, ttl_dias=ttl_dias, max_entradas=max_entradas)
+
+cache_ia = get_cache(
+    st.secrets["llm"].get("cache_path", ".cache/descripciones_ia.sqlite"),
+    int(st.secrets["llm"].get("cache_ttl_dias", 90)),
+    int(st.secrets["llm"].get("cache_max_entradas", 20000)),
+)
 
-st.title("Catalogador de Múltiples Tablas - v2.0")
+# --- Índice de columnas ya catalogadas: las reconocidas reutilizan su descripción sin llamar al modelo ---
+@st.cache_resource
+def get_indice(ruta, umbral):
+    return IndiceColumnas(ruta, umbral=umbral)
 
+indice_columnas = None
+if st.secrets["llm"].get("reutilizar_descripciones", True):
+    indice_columnas = get_indice(
+        st.secrets["llm"].get("indice_columnas_path", ".cache/indice_columnas.sqlite"),
+        float(st.secrets["llm"].get("umbral_similitud_columnas", 0.5)),
+    )
 
+# --- Catálogo local persistente: búsqueda entre sesiones y apertura sin volver a leer el Excel ---
+@st.cache_resource
+def get_almacen(ruta):
+    return AlmacenCatalogo(ruta)
 
-class tipo_dato(str, Enum):
-    texto, numero, fecha = "texto", "numero", "fecha"
+almacen_catalogo = get_almacen(st.secrets.get("catalogo", {}).get("path", ".cache/catalogo.sqlite"))
 
-class Column(BaseModel):
-    name: str  # Nombre de la columna
-    description: str  # Breve descripción del significado de la columna
-    type: tipo_dato
-    new_name: str | None = None  # Nuevo nombre sugerido en Pascal_Snake_Case y en base al contenido de la columna, o None si no hay recomendación
-    reason: str | None = None  # Razón de la sugerencia del new_name, si aplica
+st.title("Catalogador de Múltiples Tablas - v2.0")
 
-class TableMetadata(BaseModel):
-    table_description: str  # Descripción general de la tabla (máx 500 caracteres)
-    columns: List[Column]
+def abrir_catalogo_local():
+    catalogo = almacen_catalogo.cargar()
+    if catalogo is None:
+        st.warning("El catálogo local está vacío.")
+        return
+    metadatos, diccionario = catalogo
+    if 'catalogacion' in st.session_state:
+        st.session_state.pop('catalogacion').cancelar()
+    # Los DataFrames guardados van directo a los editores: no se reconstruyen desde listas de filas
+    st.session_state['metadatos_list'] = metadatos.to_dict(orient="records")
+    st.session_state['metadatos_edit_df'] = metadatos
+    st.session_state['diccionario_store'] = AlmacenDiccionario(diccionario)
+    st.session_state['table_names'] = list(metadatos["table_name"])
+    relaciones = almacen_catalogo.relaciones()
+    st.session_state['relaciones'] = relaciones if relaciones is not None else relaciones_df([])
+    st.session_state['tablas_por_id'] = {}
+    st.session_state['duplicados'] = {}
+    st.session_state.pop('metadatos_actual', None)
+    st.session_state.pop('metricas', None)
+
+with st.expander("Catálogo local: buscar y abrir"):
+    stats_almacen = almacen_catalogo.estadisticas()
+    if stats_almacen["tablas"]:
+        st.caption(
+            f"{stats_almacen['tablas']} tablas y {stats_almacen['atributos']} atributos guardados "
+            f"(último guardado: {datetime.datetime.fromtimestamp(stats_almacen['guardado']):%d/%m/%Y %H:%M})."
+        )
+    else:
+        st.caption("Aún no se guardó ningún catálogo. Usa \"Guardar en el catálogo local\" junto a la descarga.")
+    col_busqueda, col_dominio = st.columns([3, 1])
+    texto_busqueda = col_busqueda.text_input(
+        "Buscar tablas y atributos", placeholder="p. ej. saldo cliente",
+        help="Busca en nombres y descripciones; cada palabra puede ser el inicio de una palabra."
+    )
+    dominio_busqueda = col_dominio.selectbox("Dominio", ["Todos"] + almacen_catalogo.dominios())
+    if texto_busqueda:
+        resultados = almacen_catalogo.buscar(texto_busqueda, None if dominio_busqueda == "Todos" else dominio_busqueda)
+        if resultados.empty:
+            st.caption("Sin resultados.")
+        else:
+            st.dataframe(resultados, use_container_width=True, hide_index=True)
+    if stats_almacen["tablas"]:
+        if st.button("Abrir catálogo local", help="Carga el catálogo guardado en los editores, sin procesar archivos."):
+            abrir_catalogo_local()
+        if st.toggle("Ver historial de ediciones"):
+            st.dataframe(almacen_catalogo.historial(), use_container_width=True, hide_index=True)
 
-TableMetadata.model_rebuild()  # This is required to enable recursive types
 
-# --- NUEVO: Función para verificar si la tabla tiene columna identificador único ---
-def tiene_columna_id(df):
-    for col in df.columns:
-        if df[col].is_unique and df[col].notnull().all():
-            return col
-    return "No tiene"
 
 # usar_ia = st.session_state.get("usar_ia", None)
 # if usar_ia is None:
@@ -52,122 +141,82 @@ usar_ia = st.checkbox(
 )
 # st.session_state["usar_ia"] = usar_ia
 
+OPCIONES_LLM = {
+    "modelo": MODELO,
+    "max_en_vuelo": MAX_EN_VUELO,
+    "solicitudes_por_minuto": SOLICITUDES_POR_MINUTO,
+    "tokens_por_minuto": TOKENS_POR_MINUTO,
+    "tokens_por_solicitud": TOKENS_POR_SOLICITUD,
+    "tokens_por_tabla": TOKENS_POR_TABLA,
+    "reintentos": REINTENTOS_IA,
+}
+
+# --- Pool de procesos para la lectura: se crea una vez y sus procesos quedan listos entre ejecuciones ---
+@st.cache_resource
+def get_pool_lectura(procesos):
+    return pipeline.pool_lectura(procesos)
+
+# Solo la lectura se cachea: las descripciones de la IA llegan después, tabla por tabla
 @st.cache_data(show_spinner=False)
-def procesar_archivos(files, selected_sheets_per_file, user_context):
-    metadatos_list = []
-    diccionarios_list = []
-    table_names = []
-    fecha = str(datetime.date.today())
-    for idx, uploaded_file in enumerate(files):
-        file_name = uploaded_file.name
-        file_format = file_name.split('.')[-1].lower()
-        xls = pd.ExcelFile(uploaded_file)
-        all_sheets = xls.sheet_names
-        sheets_to_analyze = selected_sheets_per_file.get(file_name, [])
-        for sheet_name in sheets_to_analyze:
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_name, dtype=str)
-            df = df.where(pd.notnull(df), None)
-            df = df.replace({pd.NaT: None})
-            df = df.astype(object).where(pd.notnull(df), None)
-            df = df.map(lambda x: str(x) if isinstance(x, pd.Timestamp) else x)
-            table_id = f"T{str(len(metadatos_list)+1).zfill(3)}"
-            muestra_tabla = df.sample(min(10, len(df)), random_state=1).to_dict(orient="list")
-            # --- Incluir contexto del usuario en el prompt del sistema ---
-            # --- Opción para usar IA o no ---
-            
-            if usar_ia:
-                system_msg = "Eres un experto catalogador de datos. Analiza la siguiente muestra de una tabla y responde en **español**."
-                if user_context and user_context.strip():
-                    system_msg += f"\n\nContexto adicional proporcionado por el usuario para mejorar la catalogación: {user_context.strip()}"
-                prompt_dict = f"""
-                Muestra de la tabla (formato JSON):
-                {json.dumps(muestra_tabla, ensure_ascii=False)}
-                """
-                response = client.responses.parse(
-                    model="gpt-4o-mini",
-                    input=[
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": prompt_dict}
-                    ],
-                    text_format=TableMetadata,
-                )
-                dict_ia = response.output_parsed.dict()
-            else:
-                # Generar estructura vacía con los mismos keys
-                dict_ia = {
-                    "table_description": "",
-                    "columns": [
-                        {
-                            "name": col,
-                            "description": "",
-                            "type": "",
-                            "new_name": "",
-                            "reason": ""
-                        } for col in df.columns
-                    ]
-                }
-            # --- Verificar si la tabla tiene columna identificador único ---
-            nombre_id = tiene_columna_id(df)
-            metadatos = {
-                "file_name": file_name,
-                "table_id": table_id,
-                "table_name": sheet_name,
-                "table_description": dict_ia.get("table_description", ""),
-                "format": file_format,
-                "date_modified": fecha,
-                "date_register": fecha,
-                "data_privacy": "Cerrado",
-                "data_steward_operativo_contact": "",
-                "data_steward_ejecutivo_contact": "",
-                "domain": "",
-                "data_owner_area": "",
-                "location_path": "",
-                "periodicity": "Ad hoc (sin frecuencia fija)",
-                "table_status": "Activa",
-                "Columna_ID": nombre_id,  # NUEVO: columna al final
-            }
-            metadatos_list.append(metadatos)
-            # if 'dict_ia' not in locals():
-            #     muestra_tabla = df.sample(min(10, len(df)), random_state=1).to_dict(orient="list")
-            #     system_msg = "Eres un experto catalogador de datos. Analiza la siguiente muestra de una tabla y responde en **español**."
-            #     if user_context and user_context.strip():
-            #         system_msg += f"\n\nContexto adicional proporcionado por el usuario para mejorar la catalogación: {user_context.strip()}"
-            #     prompt_dict = f"""
-            #     Muestra de la tabla (formato JSON):
-            #     {json.dumps(muestra_tabla, ensure_ascii=False)}
-            #     """
-            #     response = client.responses.parse(
-            #         model="gpt-4o-mini",
-            #         input=[
-            #             {"role": "system", "content": system_msg},
-            #             {"role": "user", "content": prompt_dict}
-            #         ],
-            #         text_format=TableMetadata,
-            #     )
-            #     dict_ia = response.output_parsed.dict()
-            for i, col in enumerate(dict_ia.get("columns", [])):
-                id_atributo = f"a{str(i+1).zfill(3)}"
-                diccionarios_list.append({
-                    "file_name": file_name,
-                    "table_name": sheet_name,
-                    "table_id": table_id,
-                    "id_atributo": id_atributo,
-                    "Atributo": col.get("name", ""),
-                    "Descripción": col.get("description", ""),
-                    "Tipo de dato": col.get("type", "").replace("tipo_dato.", ""),
-                    "column_rename_suggestion": col.get("new_name", ""),
-                    "reason": col.get("reason", ""),
-                })
-            table_names.append(sheet_name)
-    return metadatos_list, diccionarios_list, table_names
-
-# --- NUEVO: Solo Excel, cachear lectura de hojas y separar selección de pestañas del procesamiento ---
+def leer_tablas(files, selected_sheets_per_file, _al_leer=None):
+    # Con un solo archivo no hay nada que repartir entre procesos
+    usar_pool = PROCESOS_LECTURA > 1 and len(files) > 1
+    return pipeline.leer_tablas(
+        files,
+        selected_sheets_per_file,
+        umbral_streaming=UMBRAL_FILAS_STREAMING,
+        max_columnas_clave=MAX_COLUMNAS_CLAVE,
+        estrategia_muestreo=ESTRATEGIA_MUESTREO,
+        pool=get_pool_lectura(PROCESOS_LECTURA) if usar_pool else None,
+        al_leer=_al_leer,
+    )
+
+def iniciar_catalogacion(muestras, user_context, metricas, abierta=False):
+    # Las llamadas corren en segundo plano; seguimiento_catalogacion refresca la página al llegar respuestas
+    return CatalogacionEnCurso(
+        client, muestras, user_context, cache=cache_ia, metricas=metricas,
+        circuito=Circuito(UMBRAL_CIRCUITO), indice=indice_columnas, abierta=abierta, **OPCIONES_LLM
+    )
+
+@st.cache_data(show_spinner=False)
+def get_catalogo_anterior(archivo):
+    return cargar_catalogo(archivo)
+
+# Exportación memoizada por la huella exacta de las ediciones (los DataFrames no se hashean: llevan "_")
+@st.cache_data(show_spinner=False, max_entries=8)
+def exportar_cacheado(huella, formato, _metadatos, _diccionarios, _relaciones):
+    return exportar.exportar(_metadatos, _diccionarios, formato, relaciones=_relaciones)
+
+# Solo se recalcula cuando cambian los campos evaluados (st.cache_data usa un hash del DataFrame)
+@st.cache_data(show_spinner=False, max_entries=20)
+def calcular_completitud_cacheada(metadatos_evaluados):
+    return calcular_completitud(metadatos_evaluados)
+
+# --- NUEVO: cachear lectura de hojas y separar selección de pestañas del procesamiento ---
+# CSV/TXT/Parquet son una sola tabla con el nombre del archivo
 @st.cache_data(show_spinner=False)
 def get_excel_sheets(uploaded_file):
-    xls = pd.ExcelFile(uploaded_file)
-    return xls.sheet_names
+    return nombres_hojas(uploaded_file)
+
+uploaded_files = st.file_uploader(
+    "Sube tus archivos de datos (Excel .xlsx/.xls, CSV/TXT/TSV o Parquet)",
+    type=["xlsx", "xls", "csv", "txt", "tsv", "parquet"],
+    accept_multiple_files=True
+)
+# NUEVO: Catálogo exportado anteriormente para re-catalogar solo lo nuevo o modificado
+catalogo_anterior_file = st.file_uploader(
+    "Opcional: sube el catálogo anterior (catalogo_metadatos_diccionario.xlsx) para re-catalogar solo las hojas nuevas o modificadas",
+    type=["xlsx"],
+    help="Se conservan las ediciones hechas en el catálogo anterior; solo las hojas nuevas o con columnas distintas se envían a la IA."
+)
 
-uploaded_files = st.file_uploader("Sube tus archivos de datos (solo Excel .xlsx, .xls)", type=["xlsx", "xls"], accept_multiple_files=True)
+# Sin archivo subido, el catálogo local puede hacer de catálogo anterior (se abre sin leer un Excel)
+usar_catalogo_local = False
+if not catalogo_anterior_file and almacen_catalogo.estadisticas()["tablas"]:
+    usar_catalogo_local = st.checkbox(
+        "Usar el catálogo local como catálogo anterior",
+        help="Conserva las ediciones guardadas y solo envía a la IA las hojas nuevas o con columnas distintas."
+    )
 
 selected_sheets_per_file = {}
 # NUEVO: Cuadro de texto para contexto de catalogación
@@ -180,7 +229,7 @@ if uploaded_files and len(uploaded_files) > 0:
     for idx, uploaded_file in enumerate(uploaded_files):
         file_name = uploaded_file.name
         all_sheets = get_excel_sheets(uploaded_file)
-        sheets_to_show = [s for s in all_sheets if s.upper() not in ["METADATOS", "DICCIONARIO"]]
+        sheets_to_show = [s for s in all_sheets if s.upper() not in HOJAS_EXCLUIDAS]
         key = f"sheets_{file_name}_{idx}"
         selected = st.multiselect(
             f"Selecciona las pestañas a analizar del archivo '{file_name}':",
@@ -191,169 +240,249 @@ if uploaded_files and len(uploaded_files) > 0:
         selected_sheets_per_file[file_name] = selected
     # --- Botón para procesar archivos ---
     if st.button("Procesar archivos seleccionados"):
-        metadatos_list, diccionarios_list, table_names = procesar_archivos(uploaded_files, selected_sheets_per_file, user_context)
+        # Una catalogación anterior que siga en curso deja de enviar llamadas
+        if 'catalogacion' in st.session_state:
+            st.session_state.pop('catalogacion').cancelar()
+        catalogo_anterior = get_catalogo_anterior(catalogo_anterior_file) if catalogo_anterior_file else None
+        if usar_catalogo_local:
+            catalogo_anterior = almacen_catalogo.cargar()
+        # Las descripciones del catálogo anterior subido alimentan el índice de columnas, una vez por archivo.
+        # El catálogo local no: sus ediciones ya se indexaron al guardarlo y el resto es texto del modelo
+        indexados = st.session_state.setdefault('catalogos_indexados', set())
+        if catalogo_anterior_file and indice_columnas is not None and catalogo_anterior_file.file_id not in indexados:
+            indice_columnas.indexar_diccionario(catalogo_anterior[1])
+            indexados.add(catalogo_anterior_file.file_id)
+        metricas = Metricas(MODELO)
+        inicio = time.perf_counter()
+        # Hojas idénticas o casi idénticas: solo el representante de cada grupo va al modelo
+        indice_duplicados, vistas, duplicados, estados, enviadas = IndiceDuplicados(), {}, {}, {}, set()
+        indexado = indexar_catalogo(catalogo_anterior) if catalogo_anterior is not None else None
+        catalogacion = iniciar_catalogacion({}, user_context, metricas, abierta=True) if usar_ia else None
+
+        def al_leer(tablas_archivo):
+            # Cada archivo leído va al modelo mientras los procesos siguen leyendo los demás
+            duplicados.update(pipeline.marcar_duplicados(tablas_archivo, indice_duplicados, vistas))
+            if indexado is not None:
+                estados.update(clasificar_tablas(tablas_archivo, catalogo_anterior, indexado))
+            if catalogacion is not None:
+                muestras = pipeline.muestras_a_catalogar(tablas_archivo, estados, duplicados, enviadas)
+                enviadas.update(muestras)
+                catalogacion.agregar(muestras)
+
+        try:
+            with st.spinner("Leyendo hojas..."), metricas.medir("lectura_archivos"):
+                tablas = leer_tablas(uploaded_files, selected_sheets_per_file, _al_leer=al_leer)
+            # Con la lectura tomada del cache al_leer no se llamó: las hojas que faltan se envían ahora
+            al_leer([t for t in tablas if t["table_id"] not in vistas])
+        except Exception:
+            if catalogacion is not None:
+                catalogacion.cancelar()
+            raise
+        if catalogacion is not None:
+            catalogacion.cerrar()
+        metricas.agregar_hojas(tablas)
+        metricas.registrar_duplicadas(len(duplicados))
+        # Posibles claves foráneas entre las hojas de la carga, a partir de las firmas de cada columna
+        with metricas.medir("relaciones"):
+            relaciones = relaciones_df(descubrir_relaciones(tablas))
+        # El catálogo se muestra de inmediato; las descripciones se completan a medida que terminan
+        metadatos_list, diccionarios_list, table_names = pipeline.catalogo_inicial(
+            tablas, estados, {}, {f.name for f in uploaded_files}, catalogo_anterior
+        )
+        metricas.etapas["catalogo_inicial"] = metricas.etapas["total"] = time.perf_counter() - inicio
         st.session_state['metadatos_list'] = metadatos_list
-        st.session_state['diccionarios_list'] = diccionarios_list
+        # Diccionario indexado por table_id: selección, edición y exportación O(1) por tabla
+        st.session_state['diccionario_store'] = AlmacenDiccionario(diccionarios_list)
         st.session_state['table_names'] = table_names
+        st.session_state['metricas'] = metricas
+        st.session_state['tablas_por_id'] = {t["table_id"]: t for t in tablas}
+        st.session_state['duplicados'] = duplicados
+        st.session_state['relaciones'] = relaciones
+        st.session_state['contexto_catalogacion'] = user_context
+        # Un nuevo procesamiento reemplaza las ediciones de metadatos anteriores
+        st.session_state.pop('metadatos_edit_df', None)
+        st.session_state.pop('metadatos_actual', None)
+        if catalogacion is not None:
+            st.session_state['catalogacion'] = catalogacion
 else:
     metadatos_list = []
-    diccionarios_list = []
     table_names = []
 
-# --- Mostrar resultados si existen en session_state ---
-if 'metadatos_list' in st.session_state and st.session_state['metadatos_list']:
-    metadatos_list = st.session_state['metadatos_list']
-    diccionarios_list = st.session_state['diccionarios_list']
-    table_names = st.session_state['table_names']
-    st.subheader("Completitud de metadatos por tabla")
-    import streamlit as st
-    from streamlit import column_config
-    metadatos_df = pd.DataFrame(metadatos_list)
-    # Mostrar solo la parte de usuario para los correos en el editor
-    for col in ["data_steward_operativo_contact", "data_steward_ejecutivo_contact"]:
-        metadatos_df[col] = metadatos_df[col].str.replace("@asbanc.com.pe", "", regex=False)
-    # --- GESTIÓN DE ESTADO PARA METADATOS ---
-    if 'metadatos_edit_df' not in st.session_state:
-        st.session_state['metadatos_edit_df'] = metadatos_df.copy()
+# --- Métricas de la última ejecución: tiempos por etapa y hoja, llamadas a la IA y costo ---
+def mostrar_metricas(metricas):
+    resumen = metricas["resumen"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Tiempo total", f"{resumen['segundos_por_etapa'].get('total', 0):.1f} s")
+    col2.metric(
+        "Llamadas IA", resumen["llamadas_ia"],
+        help=f"Fallidas: {resumen['llamadas_fallidas']} · reintentos: {resumen['reintentos']} · tablas pendientes: {resumen['tablas_pendientes']}"
+    )
+    col3.metric("Tokens (entrada / salida)", f"{resumen['tokens_entrada']:,} / {resumen['tokens_salida']:,}")
+    col4.metric("Costo estimado", f"USD {resumen['costo_estimado_usd']:.4f}")
+    st.caption(
+        f"Latencia IA p50 {resumen['latencia_p50']:.2f} s · p95 {resumen['latencia_p95']:.2f} s · "
+        f"cache: {resumen['cache_aciertos']} aciertos, {resumen['cache_fallos']} fallos · "
+        f"hojas duplicadas (sin llamada): {resumen['tablas_duplicadas']} · "
+        f"hojas con la muestra recortada por tokens_por_tabla: {resumen['tablas_recortadas']}"
+    )
+    st.dataframe(
+        pd.DataFrame([resumen["segundos_por_etapa"]]).T.rename(columns={0: "Segundos"}),
+        use_container_width=True
+    )
+    if metricas["hojas"]:
+        st.markdown("Segundos por etapa y hoja")
+        st.dataframe(pd.DataFrame(metricas["hojas"]), use_container_width=True, hide_index=True)
+    if metricas["llamadas"]:
+        st.markdown("Llamadas al modelo")
+        st.dataframe(pd.DataFrame(metricas["llamadas"]), use_container_width=True, hide_index=True)
+    st.download_button(
+        label="Descargar métricas (JSON)",
+        data=json.dumps(metricas, ensure_ascii=False, indent=2),
+        file_name="metricas_catalogacion.json",
+        mime="application/json"
+    )
 
-    def guardar_metadatos():
-        st.session_state['metadatos_edit_df'] = st.session_state['meta_editor']
+if 'metricas' in st.session_state:
+    with st.expander("Métricas de la ejecución (tiempos, tokens y costo)"):
+        mostrar_metricas(st.session_state['metricas'].a_dict())
 
+# --- Mostrar resultados si existen en session_state ---
+# Cada sección es un fragmento: editar una celda vuelve a ejecutar solo la sección que la contiene
+COLUMN_CONFIG_METADATOS = {
+    "data_owner_area": st.column_config.SelectboxColumn(
+        "Gerencia o Jefatura propietaria de los datos",
+        options=[
+            "Comercial",
+            "Coordinación Institucional",
+            "Coordinación Parlamentaria",
+            "Cumplimiento y Ética",
+            "Evaluación, Analítica y Sostenibilidad",
+            "Gestión Humana",
+            "Imagen Institucional y Comunicaciones",
+            "Seguridad Estratégica",
+            "SRC",
+            "GAF - Contabilidad",
+            "GAF - Logística",
+            "GAF - Planificación Estratégica",
+            "GTO - Centro de Experiencia",
+            "GTO - Soluciones de Seguridad Física",
+            "GTO - Soluciones Digitales",
+            "GTO - Soluciones Tecnológicas",
+            "GTO - TI",
+            "GAF",
+            "GTO"
+        ]
+    ),
+    "data_privacy": st.column_config.SelectboxColumn(
+        "Privacidad de los datos",
+        options=["Abierto", "Personales", "Cerrado"],
+        help='Se propone "Personales" cuando alguna columna tiene datos personales (columna "Dato personal" del diccionario)'
+    ),
+    "periodicity": st.column_config.SelectboxColumn(
+        "Frecuencia de actualización",
+        options=[
+            "Tiempo real", "Diaria", "Semanal", "Mensual", "Trimestral", "Semestral", "Anual", "Ad hoc (sin frecuencia fija)", "Sin necesidad de actualizar"
+        ]
+    ),
+    "table_status": st.column_config.SelectboxColumn(
+        "Estado de la tabla",
+        options=["Activa", "Desactivada"]
+    ),
+    "data_steward_operativo_contact": st.column_config.TextColumn(
+        "Usuario del data steward operativo (sin @asbanc.com.pe)",
+        help="Solo el usuario, el dominio se agregará automáticamente"
+    ),
+    "data_steward_ejecutivo_contact": st.column_config.TextColumn(
+        "Usuario del data steward ejecutivo (sin @asbanc.com.pe)",
+        help="Solo el usuario, el dominio se agregará automáticamente"
+    ),
+    "domain": st.column_config.TextColumn(
+        "Dominio › Subdominio (ej.: Finanzas › Créditos)"
+    ),
+    "location_path": st.column_config.TextColumn(
+        "Ruta o ubicación del archivo"
+    ),
+    "schema_hash": st.column_config.TextColumn("Huella de esquema", disabled=True),
+    "content_hash": st.column_config.TextColumn("Huella de contenido", disabled=True),
+    "duplicado_de": st.column_config.TextColumn("Duplicado de (archivo › hoja)", disabled=True),
+    "similitud_duplicado": st.column_config.TextColumn("Similitud con el original", disabled=True),
+}
+
+# --- Secciones del informe memoizadas: cada una solo recibe las columnas de las que depende ---
+@st.cache_data(show_spinner=False, max_entries=20)
+def html_tabla_archivos(df):
+    return informe.tabla_archivos(df)
+
+@st.cache_data(show_spinner=False, max_entries=20)
+def html_tabla_ids(df):
+    return informe.tabla_ids(df)
+
+@st.cache_data(show_spinner=False, max_entries=20)
+def html_tabla_roles(df):
+    return informe.tabla_roles(df)
+
+@st.cache_data(show_spinner=False, max_entries=20)
+def html_tabla_relaciones(df):
+    return informe.tabla_relaciones(df)
+
+# El diccionario completo no se hashea: la versión del almacén cambia con cada edición
+@st.cache_data(show_spinner=False, max_entries=20)
+def html_secciones_diccionario(version, _diccionario):
+    return informe.tabla_atributos(_diccionario), informe.tabla_renombres(_diccionario), len(_diccionario)
+
+@st.fragment
+def seccion_metadatos():
     metadatos_edit = st.data_editor(
         st.session_state['metadatos_edit_df'],
         num_rows="static",
         key="meta_editor",
-        column_config={
-            "data_owner_area": st.column_config.SelectboxColumn(
-                "Gerencia o Jefatura propietaria de los datos",
-                options=[
-                    "Comercial",
-                    "Coordinación Institucional",
-                    "Coordinación Parlamentaria",
-                    "Cumplimiento y Ética",
-                    "Evaluación, Analítica y Sostenibilidad",
-                    "Gestión Humana",
-                    "Imagen Institucional y Comunicaciones",
-                    "Seguridad Estratégica",
-                    "SRC",
-                    "GAF - Contabilidad",
-                    "GAF - Logística",
-                    "GAF - Planificación Estratégica",
-                    "GTO - Centro de Experiencia",
-                    "GTO - Soluciones de Seguridad Física",
-                    "GTO - Soluciones Digitales",
-                    "GTO - Soluciones Tecnológicas",
-                    "GTO - TI",
-                    "GAF",
-                    "GTO"
-                ]
-            ),
-            "data_privacy": st.column_config.SelectboxColumn(
-                "Privacidad de los datos",
-                options=["Abierto", "Personales", "Cerrado"]
-            ),
-            "periodicity": st.column_config.SelectboxColumn(
-                "Frecuencia de actualización",
-                options=[
-                    "Tiempo real", "Diaria", "Semanal", "Mensual", "Trimestral", "Semestral", "Anual", "Ad hoc (sin frecuencia fija)", "Sin necesidad de actualizar"
-                ]
-            ),
-            "table_status": st.column_config.SelectboxColumn(
-                "Estado de la tabla",
-                options=["Activa", "Desactivada"]
-            ),
-            "data_steward_operativo_contact": st.column_config.TextColumn(
-                "Usuario del data steward operativo (sin @asbanc.com.pe)",
-                help="Solo el usuario, el dominio se agregará automáticamente"
-            ),
-            "data_steward_ejecutivo_contact": st.column_config.TextColumn(
-                "Usuario del data steward ejecutivo (sin @asbanc.com.pe)",
-                help="Solo el usuario, el dominio se agregará automáticamente"
-            ),
-            "domain": st.column_config.TextColumn(
-                "Dominio › Subdominio (ej.: Finanzas › Créditos)"
-            ),
-            "location_path": st.column_config.TextColumn(
-                "Ruta o ubicación del archivo"
-            )
-        }
+        column_config=COLUMN_CONFIG_METADATOS
     )
 
     # --- GRAFICO DE COMPLETITUD ---
-    campos_a_evaluar = [
-        "table_id", "table_name", "table_description", "format", "date_modified", "date_register",
-        "data_privacy", "data_steward_operativo_contact", "data_steward_ejecutivo_contact", "domain",
-        "data_owner_area", "location_path", "periodicity", "table_status"
-    ]
-    completitud = []
-    vacios_dict = {}
-    for idx, row in metadatos_edit.iterrows():
-        total = len(campos_a_evaluar)
-        vacios = [campo for campo in campos_a_evaluar if not str(row[campo]).strip()]
-        llenos = total - len(vacios)
-        pct = round(100 * llenos / total, 1)
-        completitud.append(pct)
-        vacios_dict[row["table_id"]] = vacios
+    metadatos_evaluados = metadatos_edit[CAMPOS_A_EVALUAR + ["file_name"]]
+    completitud, vacios = calcular_completitud_cacheada(metadatos_evaluados)
     metadatos_edit["% Completitud"] = completitud
-    metadatos_edit_sorted = metadatos_edit.sort_values("% Completitud")
-    # Tooltip personalizado con campos vacíos
-    hovertext = [
-        f"Tabla: {row['table_name']}<br>Completitud: {row['% Completitud']}%<br>Vacíos: {', '.join(vacios_dict[row['table_id']]) if vacios_dict[row['table_id']] else 'Ninguno'}"
-        for _, row in metadatos_edit_sorted.iterrows()
-    ]
-    fig = px.bar(
-        metadatos_edit_sorted,
-        y="table_name",
-        x="% Completitud",
-        orientation="h",
-        text="% Completitud",
-        title="Porcentaje de completitud de metadatos por tabla",
-        labels={"table_name": "Tabla", "% Completitud": "% Completitud"},
-        color="% Completitud",
-        color_continuous_scale=["#ff0000", "#ffff00", "#00ff00"],  # Rojo → Amarillo → Verde
-        range_color=[0, 100]
-    )
-    fig.update_traces(
-        marker_line_color='black', marker_line_width=0,
-        hovertemplate=hovertext
+    if len(metadatos_edit) <= MAX_TABLAS_GRAFICO_DETALLE:
+        fig = grafico_por_tabla(metadatos_edit, completitud, vacios)
+        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+    else:
+        # Catálogos grandes: vista agregada en lugar de una barra por tabla
+        tab_archivo, tab_dominio, tab_histograma = st.tabs(["Por archivo", "Por dominio", "Distribución"])
+        with tab_archivo:
+            fig = grafico_agregado(resumen_por(metadatos_evaluados, completitud, "file_name"), "file_name", "Archivo")
+            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+        with tab_dominio:
+            fig = grafico_agregado(resumen_por(metadatos_evaluados, completitud, "domain"), "domain", "Dominio")
+            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+        with tab_histograma:
+            st.plotly_chart(histograma(completitud), use_container_width=True, config={"displayModeBar": False})
+    # Las demás secciones leen los metadatos editados desde aquí
+    st.session_state['metadatos_actual'] = metadatos_edit
+
+@st.fragment
+def seccion_diccionario(diccionario_store, etiquetas_tablas):
+    # Se elige por table_id: dos archivos pueden tener hojas con el mismo nombre
+    table_id_selected = st.selectbox(
+        "Selecciona una tabla para ver su diccionario",
+        list(etiquetas_tablas),
+        format_func=lambda table_id: f"{table_id} · {etiquetas_tablas[table_id]}"
     )
-    st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+    editor_key = f"diccionario_editor_{table_id_selected}"
 
-    st.subheader("Diccionario de datos por tabla")
-    selected_table = st.selectbox("Selecciona una tabla para ver su diccionario", table_names)
-    table_id_selected = metadatos_df.loc[metadatos_df["table_name"] == selected_table, "table_id"].values[0]
-    diccionario_df = pd.DataFrame([d for d in diccionarios_list if d["table_id"] == table_id_selected])
     # --- GESTIÓN DE ESTADO PARA DICCIONARIO DE DATOS ---
-    if 'diccionario_edit_dict' not in st.session_state:
-        st.session_state['diccionario_edit_dict'] = {}
-    if table_id_selected not in st.session_state['diccionario_edit_dict']:
-        st.session_state['diccionario_edit_dict'][table_id_selected] = diccionario_df.copy()
-    # Si por error hay una lista, conviértela a DataFrame
-    if not isinstance(st.session_state['diccionario_edit_dict'][table_id_selected], pd.DataFrame):
-        st.session_state['diccionario_edit_dict'][table_id_selected] = pd.DataFrame(st.session_state['diccionario_edit_dict'][table_id_selected])
-
     def guardar_diccionario():
-        changes = st.session_state.get(f'diccionario_editor_{selected_table}', {})
-        df = st.session_state['diccionario_edit_dict'][table_id_selected].copy()
-        # Aplicar cambios de edición
-        for idx, row_changes in changes.get('edited_rows', {}).items():
-            for col, val in row_changes.items():
-                df.at[idx, col] = val
-        # Agregar filas nuevas
-        for row in changes.get('added_rows', []):
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        # Eliminar filas
-        if changes.get('deleted_rows'):
-            df = df.drop(changes['deleted_rows']).reset_index(drop=True)
-        st.session_state['diccionario_edit_dict'][table_id_selected] = df
-
-    diccionario_edit = st.data_editor(
-        st.session_state['diccionario_edit_dict'][table_id_selected],
+        diccionario_store.aplicar_cambios(table_id_selected, st.session_state.get(editor_key, {}))
+
+    st.data_editor(
+        diccionario_store.tabla(table_id_selected),
         use_container_width=True,
         num_rows="static",
-        key=f"diccionario_editor_{selected_table}",
+        key=editor_key,
         column_config={
             "id_atributo": st.column_config.TextColumn("ID de atributo", disabled=True),
+            # El perfil de columnas es calculado: solo lectura
+            **{etiqueta: st.column_config.Column(etiqueta, disabled=True) for etiqueta in CAMPOS_PERFIL.values()},
             "Tipo de dato": st.column_config.SelectboxColumn(
                 "Tipo de dato",
                 options=["texto", "numero", "fecha"]
@@ -362,202 +491,163 @@ if 'metadatos_list' in st.session_state and st.session_state['metadatos_list']:
         on_change=guardar_diccionario
     )
 
+@st.fragment
+def seccion_exportar(diccionario_store):
     # Al descargar, usar los datos editados
-    def to_excel(metadatos, diccionarios_dict, diccionarios_list, metadatos_df):
-        metadatos = metadatos.copy()
-        # Eliminar columna de completitud si existe
-        if '% Completitud' in metadatos.columns:
-            metadatos = metadatos.drop(columns=['% Completitud'])
-        for col in ["data_steward_operativo_contact", "data_steward_ejecutivo_contact"]:
-            metadatos[col] = metadatos[col].astype(str).str.strip() + "@asbanc.com.pe"
-        # --- Concatenar todos los diccionarios, editados o no ---
-        diccionarios_all = []
-        for idx, row in metadatos_df.iterrows():
-            table_id = row['table_id']
-            if table_id in diccionarios_dict:
-                df_dic = diccionarios_dict[table_id]
-            else:
-                # Si nunca fue editado, usar el original
-                df_dic = pd.DataFrame([d for d in diccionarios_list if d["table_id"] == table_id])
-            diccionarios_all.append(df_dic)
-        diccionarios_concat = pd.concat(diccionarios_all, ignore_index=True)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            metadatos.to_excel(writer, index=False, sheet_name='METADATOS')
-            diccionarios_concat.to_excel(writer, index=False, sheet_name='DICCIONARIO')
-        output.seek(0)
-        return output
-
+    metadatos_edit = st.session_state['metadatos_actual']
+    formato_exportacion = st.selectbox("Formato de exportación", list(exportar.FORMATOS))
     if st.button("Descargar metadatos y diccionarios consolidados"):
-        excel_bytes = to_excel(metadatos_edit, st.session_state['diccionario_edit_dict'], diccionarios_list, metadatos_df)
+        # --- Concatenar todos los diccionarios, editados o no, en el orden de METADATOS ---
+        diccionarios_concat = diccionario_store.concatenar(metadatos_edit["table_id"])
+        relaciones = st.session_state.get('relaciones', relaciones_df([]))
+        huella = exportar.huella_catalogo(metadatos_edit, diccionarios_concat, relaciones)
+        inicio = time.perf_counter()
+        datos_exportados, nombre_exportado, mime_exportado = exportar_cacheado(
+            huella, formato_exportacion, metadatos_edit, diccionarios_concat, relaciones
+        )
+        # Con la exportación en cache el tiempo registrado es casi cero
+        if 'metricas' in st.session_state:
+            st.session_state['metricas'].etapas['exportacion'] = time.perf_counter() - inicio
         st.download_button(
-            label="Descargar Excel",
-            data=excel_bytes,
-            file_name="catalogo_metadatos_diccionario.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            label=f"Descargar {formato_exportacion}",
+            data=datos_exportados,
+            file_name=nombre_exportado,
+            mime=mime_exportado
         )
-    # --- INFORME MARKDOWN ---
-    import io
-    from datetime import date
-
-    # Helper function to convert DataFrame to HTML table with black borders
-    def df_to_html_table(df):
-        if df.empty:
-            return ""
-        return df.to_html(index=False, border=1, classes="black-border-table", escape=False)
-
-    # CSS for black borders
-    st.markdown("""
-    <style>
-    .black-border-table, .black-border-table th, .black-border-table td {
-        border: 2px solid black !important;
-        border-collapse: collapse !important;
-        padding: 4px 8px !important;
-        text-align: left !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    df_file_tables = metadatos_edit[['file_name', 'table_name']].groupby('file_name').agg({'table_name':'nunique'}).reset_index().rename(columns={'table_name':'Nro_tablas'})
-    tabla1_html = df_to_html_table(df_file_tables)
-
-    df_file_table_attrs = pd.DataFrame(diccionarios_list).groupby(['file_name','table_name']).agg({'Atributo':'count'}).reset_index().rename(columns={'Atributo':'Nro_atributos'})
-    tabla2_html = df_to_html_table(df_file_table_attrs)
-
-    df_id = metadatos_edit[['file_name','table_name','Columna_ID']].rename(columns={'Columna_ID':'ID_identificador'})
-    # Agregar estilos de color según el valor de ID_identificador
-    def color_id(val):
-        if val == "No tiene":
-            return 'background-color: #ffcccc; border: 2px solid black !important;'  # rojo claro + borde negro
-        else:
-            return 'background-color: #ccffcc; border: 2px solid black !important;'  # verde claro + borde negro
-
-    # Aplicar estilos solo a la columna ID_identificador
-    styled_df_id = df_id.style.applymap(color_id, subset=['ID_identificador'])
-    # Convertir a HTML con estilos embebidos y bordes negros
-    tabla3_html = styled_df_id.to_html(
-        index=False,
-        border=1,
-        classes="black-border-table",
-        escape=False
-    )
-    # Asegurar que todos los bordes sean negros (sobrescribir posibles estilos por defecto)
-    tabla3_html = tabla3_html.replace(
-        '<table ',
-        '<table style="border:2px solid black;border-collapse:collapse;" '
-    ).replace(
-        '<th ',
-        '<th style="border:2px solid black;" '
-    ).replace(
-        '<td ',
-        '<td style="border:2px solid black;" '
+    if st.button("Guardar en el catálogo local", help="Guarda metadatos, diccionario y relaciones para buscarlos y abrirlos en otra sesión."):
+        cambios = almacen_catalogo.guardar(
+            metadatos_edit,
+            diccionario_store.concatenar(metadatos_edit["table_id"]),
+            st.session_state.get('relaciones')
+        )
+        if indice_columnas is not None:
+            # Solo lo editado a mano cuenta como revisado; cada edición se indexa una vez aunque se guarde de nuevo
+            editados = diccionario_store.tomar_editados()
+            tablas_por_id = st.session_state.get('tablas_por_id', {})
+            indice_columnas.indexar_diccionario(
+                editados, {table_id: t["muestra_tabla"] for table_id, t in tablas_por_id.items()}
+            )
+        st.success(f"Catálogo guardado ({cambios} campos editados desde el último guardado).")
+
+@st.fragment
+def seccion_informe(diccionario_store):
+    # Las ediciones dentro de otras secciones no vuelven a ejecutar esta; el botón la refresca
+    st.button("Actualizar informe", help="Incluye en el informe las últimas ediciones de metadatos y diccionario.")
+    metadatos_edit = st.session_state['metadatos_actual']
+    tabla2_html, tabla5_html, num_atributos = html_secciones_diccionario(diccionario_store.version, diccionario_store.completo())
+    markdown_report = informe.informe_markdown(
+        fecha_generacion=datetime.date.today().strftime('%d/%m/%Y'),
+        num_tablas=metadatos_edit['table_name'].nunique(),
+        num_atributos=num_atributos,
+        tabla1_html=html_tabla_archivos(metadatos_edit[['file_name', 'table_name']]),
+        tabla2_html=tabla2_html,
+        tabla3_html=html_tabla_ids(metadatos_edit[['file_name', 'table_name', 'Columna_ID']]),
+        tabla4_html=html_tabla_roles(metadatos_edit[['file_name', 'table_name', 'data_owner_area', 'data_steward_operativo_contact', 'data_steward_ejecutivo_contact']]),
+        tabla5_html=tabla5_html,
+        tabla6_html=html_tabla_relaciones(st.session_state.get('relaciones', relaciones_df([]))),
     )
+    st.markdown(markdown_report, unsafe_allow_html=True)
 
-    df_roles = metadatos_edit[['file_name','table_name','data_owner_area','data_steward_operativo_contact','data_steward_ejecutivo_contact']]
-    tabla4_html = df_to_html_table(df_roles)
+# --- Descripciones de la IA que llegan mientras se revisa el catálogo ---
+def aplicar_respuestas(trabajo):
+    terminadas = trabajo.recoger()
+    if not terminadas:
+        return
+    diccionario_store = st.session_state['diccionario_store']
+    tablas_por_id = st.session_state['tablas_por_id']
+    # Se parte de los metadatos ya editados: el editor se reinicia cuando cambian sus datos
+    metadatos = st.session_state.get('metadatos_actual', st.session_state['metadatos_edit_df'])
+    metadatos = metadatos.drop(columns=["% Completitud"], errors="ignore").copy()
+    # Las hojas duplicadas reciben la respuesta de su representante
+    respuestas = pipeline.propagar_duplicados(
+        {table_id: dict_ia for table_id, dict_ia, error in terminadas if dict_ia is not None},
+        st.session_state.get('duplicados', {}),
+        tablas_por_id
+    )
+    for table_id, dict_ia in respuestas.items():
+        descripcion, filas = pipeline.respuesta_tabla(tablas_por_id[table_id], dict_ia)
+        # Una descripción escrita a mano o traída del catálogo anterior no se reemplaza
+        vacia = (metadatos["table_id"] == table_id) & (metadatos["table_description"].fillna("") == "")
+        metadatos.loc[vacia, "table_description"] = descripcion
+        diccionario_store.completar(table_id, filas, pipeline.CAMPOS_IA_DICCIONARIO)
+    st.session_state['metadatos_edit_df'] = metadatos
+    if trabajo.terminada:
+        metricas = st.session_state['metricas']
+        # Las llamadas empiezan junto con la lectura: el total es la más larga de las dos
+        metricas.etapas["total"] = max(metricas.etapas.get("catalogo_inicial", 0.0), metricas.etapas.get("ia", 0.0))
+
+@st.fragment(run_every=1.0)
+def seguimiento_catalogacion(trabajo):
+    # Con respuestas nuevas se vuelve a ejecutar la página completa para mostrarlas en los editores
+    if trabajo.hay_nuevas:
+        st.rerun()
+    st.progress(
+        trabajo.hechas / max(trabajo.total, 1),
+        text=f"Descripciones IA: {trabajo.hechas} de {trabajo.total} tablas"
+    )
 
-    df_dicc = pd.DataFrame(diccionarios_list)
-    df_renames = df_dicc[df_dicc['column_rename_suggestion'].notnull() & (df_dicc['column_rename_suggestion'] != '')]
-    if not df_renames.empty:
-        tabla5_html = df_to_html_table(
-            df_renames[['file_name','table_name','Atributo','column_rename_suggestion']]
-            .rename(columns={'Atributo':'Atributo_original','column_rename_suggestion':'Nuevo_nombre_propuesto'})
+def seccion_pendientes(trabajo):
+    st.warning(
+        f"{len(trabajo.fallidas)} tabla(s) quedaron sin descripción de la IA tras los reintentos: "
+        f"{', '.join(trabajo.fallidas)}. El resto del catálogo no se ve afectado."
+    )
+    if st.button("Reintentar tablas pendientes"):
+        tablas_por_id = st.session_state['tablas_por_id']
+        st.session_state['catalogacion'] = iniciar_catalogacion(
+            {table_id: tablas_por_id[table_id]["muestra_tabla"] for table_id in trabajo.fallidas},
+            st.session_state['contexto_catalogacion'],
+            st.session_state['metricas']
         )
-    else:
-        tabla5_html = '<p>No hay propuestas de renombre.</p>'
-
-    FECHA_GENERACION = date.today().strftime('%d/%m/%Y')
-    NUM_TABLAS = metadatos_edit['table_name'].nunique()
-    NUM_ATRIBUTOS = df_dicc['Atributo'].shape[0] # .nunique()
-
-    markdown_report = f"""
----
-# <b>INFORME DE RESULTADOS</b>
-
-Procesamiento Automático de Metadatos y Descripciones de Tablas
-
-<b>Fecha de generación: {FECHA_GENERACION}</b>
-
----
-
-### I. Resumen ejecutivo
-
-Durante el proceso se analizaron <b>{NUM_TABLAS}</b> tablas que contienen <b>{NUM_ATRIBUTOS}</b> atributos. Se generaron descripciones automáticas, se verificó la presencia de identificadores de registro, se asignaron/validaron responsables de gobierno de datos y se propusieron nombres para los atributos que carecían de denominación.
-
----
-
-### II. Resultados detallados
-
-1. <b>Descripciones generadas</b>
+        st.rerun()
 
-{tabla1_html}
-    
-{tabla2_html}
-
-2. <b>Identificación de IDs de registro</b>
-
-{tabla3_html}
-
-3. <b>Asignación de roles de Gobierno de Datos</b>
-
-{tabla4_html}
-
-4. <b>Propuestas de nomenclatura para atributos sin nombre</b>
-
-{tabla5_html}
-
----
-
-### III. Recomendaciones inmediatas
-
-1. <b>Validar descripciones</b>: Revisar y aprobar las descripciones generadas para asegurar precisión semántica y alineación con el glosario corporativo.
-2. <b>Crear/normalizar IDs</b>: Asignar identificadores únicos a las tablas que carecen de ellos para garantizar trazabilidad.
-3. <b>Confirmar responsables</b>: Verificar la asignación de Data Stewards y Data Owners para cada tabla y actualizar en caso de cambios organizacionales.
-4. <b>Revisar nombres propuestos</b>: Aceptar o ajustar las sugerencias de nombre de atributos, asegurando consistencia con los estándares de nomenclatura. Verificar si no existen procesos automatizados que impidan el cambio del nombre del atributo.
-
----
+if 'metadatos_list' in st.session_state and st.session_state['metadatos_list']:
+    diccionario_store = st.session_state['diccionario_store']
+    table_names = st.session_state['table_names']
+    # --- GESTIÓN DE ESTADO PARA METADATOS ---
+    if 'metadatos_edit_df' not in st.session_state:
+        metadatos_df = pd.DataFrame(st.session_state['metadatos_list'])
+        # Mostrar solo la parte de usuario para los correos en el editor
+        for col in exportar.CAMPOS_CORREO:
+            metadatos_df[col] = metadatos_df[col].str.replace(exportar.DOMINIO_CORREO, "", regex=False)
+        st.session_state['metadatos_edit_df'] = metadatos_df
+    trabajo = st.session_state.get('catalogacion')
+    if trabajo is not None:
+        aplicar_respuestas(trabajo)
+        if trabajo.hay_nuevas or not trabajo.terminada:
+            seguimiento_catalogacion(trabajo)
+        else:
+            if trabajo.fallidas:
+                seccion_pendientes(trabajo)
+            stats_cache = cache_ia.estadisticas()
+            st.caption(f"Cache de descripciones IA: {stats_cache['aciertos']} aciertos, {stats_cache['fallos']} fallos, {stats_cache['entradas']} entradas guardadas.")
+            if indice_columnas is not None:
+                resumen = st.session_state['metricas'].resumen()
+                st.caption(
+                    f"Columnas con descripción reutilizada del índice: {resumen['columnas_reutilizadas']} "
+                    f"(enviadas al modelo: {resumen['columnas_enviadas']})."
+                )
+    metadatos_base = st.session_state['metadatos_edit_df']
 
-### IV. Próximos pasos
+    st.subheader("Completitud de metadatos por tabla")
+    seccion_metadatos()
 
-<table class="black-border-table">
-<thead>
-<tr>
-<th>Fase</th>
-<th>Acción</th>
-<th>Responsable</th>
-<th>Fecha objetivo</th>
-</tr>
-</thead>
-<tbody>
-<tr>
-<td>1</td>
-<td>Validación de descripciones y nombres propuestos</td>
-<td></td>
-<td></td>
-</tr>
-<tr>
-<td>2</td>
-<td>Actualización de metadatos en el Catálogo de datos</td>
-<td></td>
-<td></td>
-</tr>
-</tbody>
-</table>
+    st.subheader("Diccionario de datos por tabla")
+    etiquetas_tablas = dict(zip(metadatos_base["table_id"], metadatos_base["file_name"] + " › " + metadatos_base["table_name"]))
+    seccion_diccionario(diccionario_store, etiquetas_tablas)
 
----
+    st.subheader("Relaciones entre tablas")
+    relaciones = st.session_state.get('relaciones', relaciones_df([]))
+    if relaciones.empty:
+        st.caption("No se encontraron posibles claves foráneas entre las hojas procesadas.")
+    else:
+        st.caption(
+            "Columnas cuyos valores están contenidos en una columna sin repetidos de otra hoja. "
+            "Confianza alta: además coinciden los nombres."
+        )
+        st.dataframe(relaciones, use_container_width=True, hide_index=True)
 
-### V. Anexos
+    seccion_exportar(diccionario_store)
 
-<ul>
-<li><b>A1. Metadatos y Diccionario de datos</b></li>
-<li><b>A2. Datos técnicos de automatización</b>
-    <ol>
-        <li><b>Fuente de los datos</b>:</li>
-        <li><b>Versión del modelo de IA utilizada</b>: ChatGPT-4.1-mini</li>
-        <li><b>Versión de la App</b>: v2.0</li>
-    </ol>
-</li>
-</ul>
----
-"""
-    st.markdown(markdown_report, unsafe_allow_html=True)
+    # --- INFORME MARKDOWN ---
+    st.markdown(informe.CSS_TABLAS, unsafe_allow_html=True)
+    seccion_informe(diccionario_store)
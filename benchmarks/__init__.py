@@ -0,0 +1 @@
+# Benchmarks reproducibles del catalogador: libros sintéticos, modelo simulado y runner (python -m benchmarks)
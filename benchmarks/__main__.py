@@ -0,0 +1,158 @@
+"""Runner de benchmarks del catalogador, sin acceso a red.
+
+Ejemplos:
+    python -m benchmarks --escenario pequeno
+    python -m benchmarks --escenario mediano --latencia 0.8 --repeticiones 3
+    python -m benchmarks --comparar benchmarks/resultados/mediano-a1b2c3d.json benchmarks/resultados/mediano-e4f5a6b.json
+
+Cada caso (procesar_archivos, tiene_columna_id, to_excel) corre en un proceso
+nuevo, de modo que el pico de memoria de uno no contamina al siguiente. Los
+libros sintéticos se generan una vez por configuración y se reutilizan.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.casos import FUNCIONES_CASO
+
+ESCENARIOS = {
+    "pequeno": {"libros": 2, "hojas": 3, "filas": 2000, "columnas": 15, "densidad_nulos": 0.1, "clave": "simple", "atributos": 3000},
+    "mediano": {"libros": 4, "hojas": 4, "filas": 20000, "columnas": 30, "densidad_nulos": 0.2, "clave": "compuesta", "atributos": 30000},
+    "grande": {"libros": 4, "hojas": 5, "filas": 100000, "columnas": 40, "densidad_nulos": 0.3, "clave": "compuesta", "atributos": 100000},
+}
+CASOS = tuple(FUNCIONES_CASO)
+DIRECTORIO_DATOS = os.path.join(".cache", "benchmarks")
+DIRECTORIO_RESULTADOS = os.path.join("benchmarks", "resultados")
+
+
+def preparar_libros(configuracion, semilla=1):
+    from benchmarks.sinteticos import generar_libro
+
+    campos = {k: configuracion[k] for k in ("libros", "hojas", "filas", "columnas", "densidad_nulos", "clave")}
+    firma = hashlib.sha256(json.dumps({**campos, "semilla": semilla}, sort_keys=True).encode()).hexdigest()[:12]
+    directorio = os.path.join(DIRECTORIO_DATOS, firma)
+    rutas = []
+    for i in range(campos["libros"]):
+        ruta = os.path.join(directorio, f"libro_{i + 1}.xlsx")
+        if not os.path.exists(ruta):
+            generar_libro(ruta, campos["hojas"], campos["filas"], campos["columnas"], campos["densidad_nulos"],
+                          campos["clave"], semilla + 100 * i)
+        rutas.append(ruta)
+    return rutas
+
+
+def medir_caso(caso, rutas, configuracion, opciones, repeticiones):
+    # Proceso "spawn" nuevo por repetición: memoria y caches parten de cero
+    corridas = []
+    for _ in range(repeticiones):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            corridas.append(pool.submit(FUNCIONES_CASO[caso], rutas, configuracion, opciones).result())
+    mediana = statistics.median(c["segundos"] for c in corridas)
+    representativa = min(corridas, key=lambda c: abs(c["segundos"] - mediana))
+    picos = [c["pico_mb"] for c in corridas if c["pico_mb"] is not None]
+    return {
+        **representativa,
+        "segundos": round(mediana, 4),
+        "segundos_corridas": [round(c["segundos"], 4) for c in corridas],
+        "pico_mb": max(picos) if picos else None,
+        "incremento_mb": round(max(picos) - representativa["base_mb"], 1) if picos else None,
+    }
+
+
+def entorno():
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "desconocido"
+    try:
+        import pyarrow
+        version_pyarrow = pyarrow.__version__
+    except ImportError:
+        version_pyarrow = None
+    from catalogador.lectura import HAY_CALAMINE
+    return {
+        "commit": commit,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "pyarrow": version_pyarrow,
+        "calamine": HAY_CALAMINE,
+    }
+
+
+def comparar(ruta_base, ruta_nueva):
+    with open(ruta_base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(ruta_nueva, encoding="utf-8") as f:
+        nueva = json.load(f)
+    print(f"{'caso':<20}{'métrica':<22}{base['entorno']['commit']:>14}{nueva['entorno']['commit']:>14}{'nuevo/base':>12}")
+    for caso in CASOS:
+        a, b = base["casos"].get(caso), nueva["casos"].get(caso)
+        if not a or not b:
+            continue
+        metricas = ["segundos", "filas_por_segundo", "pico_mb"] + [f"etapa:{e}" for e in b.get("etapas", {})]
+        for metrica in metricas:
+            if metrica.startswith("etapa:"):
+                va, vb = a.get("etapas", {}).get(metrica[6:]), b["etapas"].get(metrica[6:])
+            else:
+                va, vb = a.get(metrica), b.get(metrica)
+            if va is None or vb is None:
+                continue
+            ratio = f"{vb / va:.2f}x" if va else "-"
+            print(f"{caso:<20}{metrica:<22}{va:>14.3f}{vb:>14.3f}{ratio:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Benchmarks reproducibles del catalogador (sin red).")
+    parser.add_argument("--escenario", choices=list(ESCENARIOS), default="pequeno")
+    parser.add_argument("--casos", nargs="+", choices=CASOS, default=list(CASOS))
+    parser.add_argument("--repeticiones", type=int, default=1, help="Corridas por caso; se reporta la mediana")
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latencia media del modelo simulado (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variación uniforme de la latencia (s)")
+    parser.add_argument("--tasa-errores", type=float, default=0.0, help="Probabilidad de error por llamada simulada")
+    parser.add_argument("--max-en-vuelo", type=int, default=4)
+    parser.add_argument("--umbral-streaming", type=int, default=100000)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="Reporte JSON (por defecto benchmarks/resultados/<escenario>-<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Compara dos reportes y termina")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return 0
+
+    configuracion = ESCENARIOS[args.escenario]
+    opciones = {
+        "latencia": args.latencia, "jitter": args.jitter, "tasa_errores": args.tasa_errores,
+        "max_en_vuelo": args.max_en_vuelo, "umbral_streaming": args.umbral_streaming,
+    }
+    print(f"Preparando libros sintéticos ({args.escenario})...", file=sys.stderr)
+    rutas = preparar_libros(configuracion, args.semilla)
+    reporte = {"entorno": entorno(), "escenario": args.escenario, "configuracion": configuracion, "opciones": opciones, "casos": {}}
+    for caso in args.casos:
+        print(f"Midiendo {caso}...", file=sys.stderr)
+        reporte["casos"][caso] = medir_caso(caso, rutas, configuracion, opciones, args.repeticiones)
+        resultado = reporte["casos"][caso]
+        print(f"  {resultado['segundos']:.2f} s, {resultado['filas_por_segundo']:,.0f} filas/s, pico {resultado['pico_mb']} MB", file=sys.stderr)
+
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"{args.escenario}-{reporte['entorno']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"Reporte escrito en {salida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
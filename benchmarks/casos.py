@@ -0,0 +1,98 @@
+"""Casos medidos por el runner; cada uno corre en un proceso nuevo y devuelve sus mediciones."""
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de memoria
+    resource = None
+
+
+def _pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def caso_procesar_archivos(rutas, configuracion, opciones):
+    from benchmarks.llm_simulado import ClienteSimulado
+    from catalogador.lectura import nombres_hojas
+    from catalogador.llm import MODELO
+    from catalogador.pipeline import procesar_archivos
+
+    cliente = ClienteSimulado(opciones["latencia"], opciones["jitter"], opciones["tasa_errores"])
+    seleccion = {os.path.basename(r): nombres_hojas(r) for r in rutas}
+    base = _pico_mb()
+    inicio = time.perf_counter()
+    resultado = {}
+    try:
+        *_, metricas = procesar_archivos(
+            rutas, seleccion, "", True, client=cliente,
+            opciones_llm={"modelo": MODELO, "max_en_vuelo": opciones["max_en_vuelo"]},
+            umbral_streaming=opciones["umbral_streaming"],
+        )
+        resultado["etapas"] = metricas["resumen"]["segundos_por_etapa"]
+        resultado["tokens_entrada"] = metricas["resumen"]["tokens_entrada"]
+        resultado["reintentos_ia"] = metricas["resumen"]["reintentos"]
+        resultado["tablas_pendientes"] = metricas["resumen"]["tablas_pendientes"]
+    except Exception as e:
+        resultado["error"] = repr(e)
+    segundos = time.perf_counter() - inicio
+    filas = configuracion["libros"] * configuracion["hojas"] * configuracion["filas"]
+    return {
+        **resultado,
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos,
+        "celdas_por_segundo": filas * configuracion["columnas"] / segundos,
+        "llamadas_ia": cliente.llamadas,
+        "errores_ia": cliente.errores,
+        "base_mb": base,
+        "pico_mb": _pico_mb(),
+    }
+
+
+def caso_tiene_columna_id(rutas, configuracion, opciones):
+    import pandas as pd
+    from catalogador.claves import tiene_columna_id
+    from catalogador.normalizacion import DTYPE_TEXTO, normalizar_hoja
+
+    df = normalizar_hoja(pd.read_excel(rutas[0], sheet_name=0, dtype=DTYPE_TEXTO))
+    base = _pico_mb()
+    inicio = time.perf_counter()
+    clave = tiene_columna_id(df)
+    segundos = time.perf_counter() - inicio
+    return {
+        "segundos": segundos,
+        "filas_por_segundo": len(df) / segundos,
+        "resultado": clave,
+        "base_mb": base,
+        "pico_mb": _pico_mb(),
+    }
+
+
+def caso_to_excel(rutas, configuracion, opciones):
+    from benchmarks.sinteticos import diccionario_sintetico
+    from catalogador.exportar import to_excel
+
+    metadatos, diccionarios = diccionario_sintetico(configuracion["atributos"])
+    base = _pico_mb()
+    inicio = time.perf_counter()
+    tamano = len(to_excel(metadatos, diccionarios).getvalue())
+    segundos = time.perf_counter() - inicio
+    return {
+        "segundos": segundos,
+        "filas_por_segundo": len(diccionarios) / segundos,
+        "bytes": tamano,
+        "base_mb": base,
+        "pico_mb": _pico_mb(),
+    }
+
+
+FUNCIONES_CASO = {
+    "procesar_archivos": caso_procesar_archivos,
+    "tiene_columna_id": caso_tiene_columna_id,
+    "to_excel": caso_to_excel,
+}
@@ -0,0 +1,70 @@
+"""Sustituto local de la API Responses de OpenAI para medir sin red.
+
+Responde con un TableMetadata que describe exactamente las columnas de la
+muestra recibida, después de una latencia configurable y, con la
+probabilidad indicada, falla con el mismo error de conexión que lanzaría el
+cliente real.
+"""
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from catalogador.modelos import TableMetadata
+from catalogador.prompt import contar_tokens
+
+
+def _muestra_del_prompt(mensajes):
+    contenido = mensajes[-1]["content"]
+    inicio = contenido.index("{", contenido.index("(formato JSON):"))
+    return json.loads(contenido[inicio:].strip())
+
+
+class _Responses:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def parse(self, model, input, text_format=TableMetadata):
+        return self._cliente._responder(model, input, text_format)
+
+
+class ClienteSimulado:
+    """Imita `client.responses.parse`; latencia en segundos y tasa de errores entre 0 y 1."""
+
+    def __init__(self, latencia=0.5, jitter=0.2, tasa_errores=0.0, semilla=1):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_errores = tasa_errores
+        self.responses = _Responses(self)
+        self.llamadas = 0
+        self.errores = 0
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def _responder(self, modelo, mensajes, text_format):
+        with self._lock:
+            self.llamadas += 1
+            espera = max(0.0, self.latencia + self._rng.uniform(-self.jitter, self.jitter))
+            falla = self._rng.random() < self.tasa_errores
+        time.sleep(espera)
+        if falla:
+            with self._lock:
+                self.errores += 1
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+        muestra = _muestra_del_prompt(mensajes)
+        salida = text_format(
+            table_description=f"Tabla simulada con {len(muestra)} columnas.",
+            columns=[{"name": col, "description": f"Valores de {col}."} for col in muestra],
+        )
+        tokens_entrada = sum(contar_tokens(m["content"], modelo) for m in mensajes)
+        tokens_salida = contar_tokens(salida.model_dump_json(), modelo)
+        return SimpleNamespace(
+            output_parsed=salida,
+            usage=SimpleNamespace(
+                input_tokens=tokens_entrada, output_tokens=tokens_salida, total_tokens=tokens_entrada + tokens_salida
+            ),
+        )
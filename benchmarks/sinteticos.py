@@ -0,0 +1,101 @@
+"""Generador de libros sintéticos con tamaño y estructura configurables.
+
+Todo sale de un generador numpy con semilla fija: la misma configuración
+produce el mismo archivo, de modo que los reportes de distintas versiones
+son comparables.
+"""
+import os
+
+import numpy as np
+import xlsxwriter
+
+# Tipos de columna que se rotan después de las columnas clave
+TIPOS_COLUMNA = ["texto", "numero", "fecha", "categoria"]
+CLAVES = ("simple", "compuesta", "ninguna")
+CATEGORIAS = ["Lima", "Arequipa", "Cusco", "Piura", "Trujillo", "Chiclayo"]
+
+
+def _columnas_clave(clave, filas, rng):
+    indice = np.arange(filas)
+    if clave == "simple":
+        return {"id_registro": indice.astype(str)}
+    if clave == "compuesta":
+        # Ninguna de las dos es única por sí sola; el par sí
+        grupos = max(2, int(np.sqrt(filas)))
+        return {"codigo_agencia": (indice // grupos).astype(str), "nro_operacion": (indice % grupos).astype(str)}
+    return {"codigo_agencia": rng.integers(0, max(2, filas // 10), filas).astype(str)}
+
+
+def _columna(tipo, filas, rng):
+    if tipo == "texto":
+        return np.char.add("Cliente ", rng.integers(0, filas, filas).astype(str))
+    if tipo == "numero":
+        return np.round(rng.random(filas) * 10000, 2).astype(str)
+    if tipo == "fecha":
+        return (np.datetime64("2020-01-01") + rng.integers(0, 1500, filas).astype("timedelta64[D]")).astype(str)
+    return np.array(CATEGORIAS)[rng.integers(0, len(CATEGORIAS), filas)]
+
+
+def datos_hoja(filas, columnas, densidad_nulos=0.1, clave="simple", semilla=1):
+    """Devuelve {nombre: array de texto u objeto con None} para una hoja."""
+    if clave not in CLAVES:
+        raise ValueError(f"Estructura de clave desconocida: {clave}")
+    rng = np.random.default_rng(semilla)
+    datos = _columnas_clave(clave, filas, rng)
+    for j in range(max(0, columnas - len(datos))):
+        tipo = TIPOS_COLUMNA[j % len(TIPOS_COLUMNA)]
+        valores = _columna(tipo, filas, rng).astype(object)
+        # Las columnas clave nunca llevan nulos; el resto, con la densidad pedida
+        valores[rng.random(filas) < densidad_nulos] = None
+        datos[f"{tipo}_{j + 1}"] = valores
+    return dict(list(datos.items())[:columnas])
+
+
+def generar_libro(ruta, hojas=3, filas=10000, columnas=20, densidad_nulos=0.1, clave="simple", semilla=1):
+    """Escribe un .xlsx (o .csv si `ruta` termina en .csv, con una sola hoja)."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    if ruta.lower().endswith(".csv"):
+        import pandas as pd
+        pd.DataFrame(datos_hoja(filas, columnas, densidad_nulos, clave, semilla)).to_csv(ruta, index=False)
+        return ruta
+    workbook = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+    for h in range(hojas):
+        datos = datos_hoja(filas, columnas, densidad_nulos, clave, semilla + h)
+        hoja = workbook.add_worksheet(f"Hoja{h + 1}")
+        hoja.write_row(0, 0, list(datos))
+        valores = list(datos.values())
+        for i in range(filas):
+            hoja.write_row(i + 1, 0, [v[i] for v in valores])
+    workbook.close()
+    return ruta
+
+
+def diccionario_sintetico(atributos, atributos_por_tabla=30, semilla=1):
+    """METADATOS y DICCIONARIO con la forma que produce consolidar_tablas, para medir la exportación."""
+    import pandas as pd
+    from catalogador.pipeline import consolidar_tablas, respuesta_vacia
+
+    rng = np.random.default_rng(semilla)
+    tablas = []
+    for t in range(max(1, atributos // atributos_por_tabla)):
+        columnas = [f"columna_{j + 1}" for j in range(atributos_por_tabla)]
+        tablas.append({
+            "file_name": f"libro_{t // 10 + 1}.xlsx", "sheet_name": f"Hoja{t % 10 + 1}", "table_id": f"T{t + 1:03d}",
+            "file_format": "xlsx", "columnas": columnas, "nombre_id": "columna_1",
+            "schema_hash": "0" * 16, "content_hash": "0" * 16,
+            "perfil_columnas": {
+                c: {"tipo": "numero", "pct_nulos": float(rng.integers(0, 100)), "distintos": int(rng.integers(1, 10000)),
+                    "minimo": "0", "maximo": "9999", "formatos_fecha": "", "longitud_max": 4,
+                    "dato_personal": ""}
+                for c in columnas
+            },
+        })
+    respuestas = {}
+    for t in tablas:
+        respuesta = respuesta_vacia(t["columnas"])
+        respuesta["table_description"] = "Tabla sintética de operaciones por agencia. " * 4
+        for col in respuesta["columns"]:
+            col["description"] = f"Descripción generada para {col['name']}, con el detalle habitual del modelo."
+        respuestas[t["table_id"]] = respuesta
+    metadatos, diccionarios, _ = consolidar_tablas(tablas, respuestas)
+    return pd.DataFrame(metadatos), pd.DataFrame(diccionarios)
@@ -0,0 +1 @@
+# Lógica reutilizable del catalogador (independiente de la interfaz de Streamlit)
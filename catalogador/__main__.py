@@ -0,0 +1,5 @@
+import sys
+
+from catalogador.cli import main
+
+sys.exit(main())
@@ -0,0 +1,294 @@
+"""Catálogo local persistente (SQLite) con búsqueda de texto completo.
+
+Guarda el último catálogo revisado: METADATOS, DICCIONARIO (con el perfil de
+columnas) y RELACIONES como instantáneas Parquet, que se cargan en
+milisegundos sin reconstruir DataFrames fila por fila, y además una fila por
+tabla y por atributo con índices por table_id, file_name y dominio. Una
+tabla FTS5 indexa nombres y descripciones para el buscador de la app.
+
+Cada guardado anota en el historial los campos editables que cambiaron.
+Como en la re-catalogación incremental, al guardar se conservan las tablas
+de los archivos que no forman parte del catálogo guardado, con table_id
+nuevos; sus relaciones entre sí se conservan con esos table_id, y las que
+apuntaban a una tabla del catálogo nuevo se descartan (esa tabla se volvió a
+analizar y sus relaciones salen de la sesión). Los correos se guardan sin el
+dominio, igual que en el editor.
+"""
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from catalogador.exportar import escribir_tabla
+from catalogador.incremental import CAMPOS_CALCULADOS, CAMPOS_EDITABLES_DICCIONARIO
+
+CLAVE_TABLA = ["file_name", "table_name"]
+CLAVE_ATRIBUTO = ["file_name", "table_name", "Atributo"]
+
+
+def _a_parquet(df):
+    buffer = io.BytesIO()
+    escribir_tabla(df, "parquet", buffer)
+    return buffer.getvalue()
+
+
+def _de_parquet(datos):
+    # Textos como columnas Arrow (sin un objeto Python por celda) y vacíos como "", igual que
+    # incremental.cargar_catalogo (keep_default_na=False)
+    df = pq.read_table(io.BytesIO(datos)).to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    textos = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.StringDtype)]
+    return df.fillna({col: "" for col in textos})
+
+
+def _texto(serie):
+    return serie.astype(object).where(serie.notna(), "").astype(str)
+
+
+def _cambios(anterior, nuevo, clave, campos):
+    # Filas (clave..., campo, anterior, nuevo) de los campos que cambiaron entre dos versiones
+    unidos = anterior.merge(nuevo, on=clave, suffixes=("_anterior", "_nuevo"))
+    cambios = []
+    for campo in campos:
+        if f"{campo}_anterior" not in unidos.columns or f"{campo}_nuevo" not in unidos.columns:
+            continue
+        antes, despues = _texto(unidos[f"{campo}_anterior"]), _texto(unidos[f"{campo}_nuevo"])
+        distintos = antes != despues
+        for fila, a, d in zip(unidos.loc[distintos, clave].itertuples(index=False, name=None), antes[distintos], despues[distintos]):
+            cambios.append((*fila, campo, a, d))
+    return cambios
+
+
+class AlmacenCatalogo:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS instantaneas (
+                    nombre TEXT PRIMARY KEY,
+                    datos BLOB NOT NULL,
+                    guardado REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tablas (
+                    table_id TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    domain TEXT NOT NULL DEFAULT '',
+                    table_description TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS idx_tablas_archivo ON tablas (file_name, table_name);
+                CREATE INDEX IF NOT EXISTS idx_tablas_dominio ON tablas (domain);
+                CREATE TABLE IF NOT EXISTS atributos (
+                    table_id TEXT NOT NULL,
+                    id_atributo TEXT NOT NULL,
+                    atributo TEXT NOT NULL,
+                    descripcion TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (table_id, id_atributo)
+                );
+                CREATE TABLE IF NOT EXISTS historial (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    momento REAL NOT NULL,
+                    file_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    atributo TEXT NOT NULL DEFAULT '',
+                    campo TEXT NOT NULL,
+                    anterior TEXT,
+                    nuevo TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_historial_tabla ON historial (file_name, table_name);"""
+            )
+        # Sin FTS5 en el SQLite del sistema, la búsqueda cae a LIKE sobre tablas y atributos
+        try:
+            with self._conn:
+                self._conn.execute(
+                    """CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+                        table_id UNINDEXED, tipo UNINDEXED, nombre, descripcion,
+                        tokenize = "unicode61 remove_diacritics 2"
+                    )"""
+                )
+            self.texto_completo = True
+        except sqlite3.OperationalError:
+            self.texto_completo = False
+
+    # --- Lectura ---
+    def _instantanea(self, nombre):
+        fila = self._conn.execute("SELECT datos FROM instantaneas WHERE nombre = ?", (nombre,)).fetchone()
+        return _de_parquet(fila[0]) if fila is not None else None
+
+    def cargar(self):
+        """(METADATOS, DICCIONARIO) guardados, en el formato de incremental.cargar_catalogo; None si está vacío."""
+        with self._lock:
+            metadatos, diccionario = self._instantanea("METADATOS"), self._instantanea("DICCIONARIO")
+        if metadatos is None or diccionario is None:
+            return None
+        return metadatos, diccionario
+
+    def relaciones(self):
+        with self._lock:
+            return self._instantanea("RELACIONES")
+
+    # --- Guardado ---
+    def _conservar_anteriores(self, metadatos, diccionario, anterior):
+        # Tablas guardadas de archivos que no están en el catálogo nuevo: se agregan al final con table_id nuevo
+        metadatos_previos, diccionario_previo = anterior
+        conservadas = metadatos_previos[~metadatos_previos["file_name"].isin(set(metadatos["file_name"]))]
+        if conservadas.empty:
+            return metadatos, diccionario, {}
+        usados = set(metadatos["table_id"])
+        libres = (f"T{str(i).zfill(3)}" for i in range(1, len(metadatos) + len(conservadas) + 1))
+        libres = (table_id for table_id in libres if table_id not in usados)
+        nuevos_ids = dict(zip(conservadas["table_id"], libres))
+        conservadas = conservadas.assign(table_id=conservadas["table_id"].map(nuevos_ids))
+        atributos = diccionario_previo[diccionario_previo["table_id"].isin(set(nuevos_ids))]
+        atributos = atributos.assign(table_id=atributos["table_id"].map(nuevos_ids))
+        return (
+            pd.concat([metadatos, conservadas], ignore_index=True),
+            pd.concat([diccionario, atributos], ignore_index=True),
+            nuevos_ids,
+        )
+
+    def _relaciones_conservadas(self, nuevos_ids):
+        # Relaciones guardadas entre dos tablas conservadas, con sus table_id nuevos
+        if not nuevos_ids:
+            return None
+        with self._lock:
+            previas = self._instantanea("RELACIONES")
+        if previas is None:
+            return None
+        entre_conservadas = previas["table_id_origen"].isin(set(nuevos_ids)) & previas["table_id_destino"].isin(set(nuevos_ids))
+        previas = previas[entre_conservadas]
+        return previas.assign(
+            table_id_origen=previas["table_id_origen"].map(nuevos_ids),
+            table_id_destino=previas["table_id_destino"].map(nuevos_ids),
+        )
+
+    def guardar(self, metadatos, diccionario, relaciones=None):
+        """Reemplaza el catálogo guardado; devuelve el número de cambios anotados en el historial."""
+        metadatos = metadatos.drop(columns=["% Completitud"], errors="ignore")
+        anterior = self.cargar()
+        cambios = []
+        if anterior is not None:
+            metadatos, diccionario, nuevos_ids = self._conservar_anteriores(metadatos, diccionario, anterior)
+            conservadas = self._relaciones_conservadas(nuevos_ids)
+            if conservadas is not None and not conservadas.empty:
+                relaciones = conservadas if relaciones is None or relaciones.empty else pd.concat(
+                    [relaciones, conservadas], ignore_index=True
+                )
+            campos_metadatos = [c for c in metadatos.columns if c not in CAMPOS_CALCULADOS]
+            cambios = [
+                (file_name, table_name, "", campo, a, d)
+                for file_name, table_name, campo, a, d in _cambios(anterior[0], metadatos, CLAVE_TABLA, campos_metadatos)
+            ]
+            cambios += _cambios(anterior[1], diccionario, CLAVE_ATRIBUTO, CAMPOS_EDITABLES_DICCIONARIO)
+        ahora = time.time()
+        # Sin relaciones de la sesión ni conservadas se borran las anteriores: apuntan a table_id que cambiaron
+        instantaneas = [("METADATOS", metadatos), ("DICCIONARIO", diccionario), ("RELACIONES", relaciones)]
+        tablas = pd.DataFrame({
+            campo: _texto(metadatos[campo]) if campo in metadatos.columns else ""
+            for campo in ("table_id", "file_name", "table_name", "domain", "table_description")
+        })
+        atributos = pd.DataFrame({
+            "table_id": _texto(diccionario["table_id"]),
+            "id_atributo": _texto(diccionario["id_atributo"]),
+            "atributo": _texto(diccionario["Atributo"]),
+            "descripcion": _texto(diccionario["Descripción"]),
+        })
+        with self._lock, self._conn:
+            for nombre, df in instantaneas:
+                if df is None:
+                    self._conn.execute("DELETE FROM instantaneas WHERE nombre = ?", (nombre,))
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO instantaneas (nombre, datos, guardado) VALUES (?, ?, ?)",
+                    (nombre, _a_parquet(df), ahora),
+                )
+            self._conn.execute("DELETE FROM tablas")
+            self._conn.executemany("INSERT INTO tablas VALUES (?, ?, ?, ?, ?)", tablas.itertuples(index=False, name=None))
+            self._conn.execute("DELETE FROM atributos")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO atributos VALUES (?, ?, ?, ?)", atributos.itertuples(index=False, name=None)
+            )
+            self._conn.executemany(
+                "INSERT INTO historial (momento, file_name, table_name, atributo, campo, anterior, nuevo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(ahora, *cambio) for cambio in cambios],
+            )
+            if self.texto_completo:
+                self._conn.execute("DELETE FROM busqueda")
+                self._conn.execute(
+                    """INSERT INTO busqueda (table_id, tipo, nombre, descripcion)
+                       SELECT table_id, 'tabla', file_name || ' ' || table_name, table_description FROM tablas"""
+                )
+                self._conn.execute(
+                    """INSERT INTO busqueda (table_id, tipo, nombre, descripcion)
+                       SELECT table_id, 'atributo', atributo, descripcion FROM atributos"""
+                )
+        return len(cambios)
+
+    # --- Búsqueda e historial ---
+    def buscar(self, texto, dominio=None, limite=50):
+        """Tablas y atributos cuyo nombre o descripción contienen todas las palabras de `texto`."""
+        palabras = [p for p in str(texto).replace('"', " ").split() if p]
+        columnas = ["tipo", "table_id", "file_name", "table_name", "domain", "atributo", "descripcion"]
+        if not palabras:
+            return pd.DataFrame(columns=columnas)
+        filtro_dominio, parametros_dominio = ("AND t.domain = ?", [dominio]) if dominio else ("", [])
+        if self.texto_completo:
+            # Cada palabra como prefijo entre comillas: la entrada del usuario no se interpreta como sintaxis FTS5
+            consulta = " ".join(f'"{p}"*' for p in palabras)
+            sql = f"""SELECT b.tipo, b.table_id, t.file_name, t.table_name, t.domain,
+                             CASE b.tipo WHEN 'atributo' THEN b.nombre ELSE '' END,
+                             snippet(busqueda, 3, '**', '**', ' … ', 16)
+                      FROM busqueda b JOIN tablas t ON t.table_id = b.table_id
+                      WHERE busqueda MATCH ? {filtro_dominio}
+                      ORDER BY bm25(busqueda) LIMIT ?"""
+            parametros = [consulta, *parametros_dominio, limite]
+        else:
+            condiciones = " AND ".join(["(nombre LIKE ? OR descripcion LIKE ?)"] * len(palabras))
+            sql = f"""SELECT b.tipo, b.table_id, t.file_name, t.table_name, t.domain, b.atributo, b.descripcion FROM (
+                          SELECT 'tabla' AS tipo, table_id, file_name || ' ' || table_name AS nombre, '' AS atributo,
+                                 table_description AS descripcion FROM tablas
+                          UNION ALL
+                          SELECT 'atributo', table_id, atributo, atributo, descripcion FROM atributos
+                      ) b JOIN tablas t ON t.table_id = b.table_id
+                      WHERE {condiciones} {filtro_dominio} LIMIT ?"""
+            parametros = [f"%{p}%" for p in palabras for _ in range(2)] + parametros_dominio + [limite]
+        with self._lock:
+            filas = self._conn.execute(sql, parametros).fetchall()
+        return pd.DataFrame(filas, columns=columnas)
+
+    def dominios(self):
+        with self._lock:
+            filas = self._conn.execute("SELECT DISTINCT domain FROM tablas WHERE domain != '' ORDER BY domain").fetchall()
+        return [f[0] for f in filas]
+
+    def historial(self, file_name=None, table_name=None, limite=500):
+        condiciones, parametros = [], []
+        if file_name is not None:
+            condiciones.append("file_name = ?")
+            parametros.append(file_name)
+        if table_name is not None:
+            condiciones.append("table_name = ?")
+            parametros.append(table_name)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self._lock:
+            filas = self._conn.execute(
+                f"""SELECT datetime(momento, 'unixepoch', 'localtime'), file_name, table_name, atributo, campo, anterior, nuevo
+                    FROM historial {where} ORDER BY id DESC LIMIT ?""",
+                [*parametros, limite],
+            ).fetchall()
+        return pd.DataFrame(filas, columns=["momento", "file_name", "table_name", "atributo", "campo", "anterior", "nuevo"])
+
+    def estadisticas(self):
+        with self._lock:
+            tablas = self._conn.execute("SELECT COUNT(*) FROM tablas").fetchone()[0]
+            atributos = self._conn.execute("SELECT COUNT(*) FROM atributos").fetchone()[0]
+            guardado = self._conn.execute("SELECT MAX(guardado) FROM instantaneas").fetchone()[0]
+        return {"tablas": tablas, "atributos": atributos, "guardado": guardado}
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def clave_cache(muestra_tabla, user_context, modelo, version_prompt):
+    # Hash del contenido muestreado, nombres de columna, contexto, modelo y versión del prompt
+    contenido = json.dumps(
+        {
+            "columnas": list(muestra_tabla),
+            "muestra": muestra_tabla,
+            "contexto": (user_context or "").strip(),
+            "modelo": modelo,
+            "version_prompt": version_prompt,
+        },
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheDescripciones:
+    """Cache en disco (SQLite) de las respuestas TableMetadata del modelo.
+
+    Las entradas expiran tras `ttl_dias` y, si se supera `max_entradas`, se
+    eliminan las de acceso menos reciente.
+    """
+
+    def __init__(self, ruta, ttl_dias=90, max_entradas=20000):
+        self.ruta = ruta
+        self.ttl_segundos = ttl_dias * 86400 if ttl_dias else None
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS descripciones (
+                    clave TEXT PRIMARY KEY,
+                    respuesta TEXT NOT NULL,
+                    creado REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL,
+                    usos INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_descripciones_acceso ON descripciones (ultimo_acceso)"
+            )
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT respuesta, creado FROM descripciones WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is not None and self.ttl_segundos and ahora - fila[1] > self.ttl_segundos:
+                with self._conn:
+                    self._conn.execute("DELETE FROM descripciones WHERE clave = ?", (clave,))
+                fila = None
+            if fila is None:
+                self.fallos += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE descripciones SET ultimo_acceso = ?, usos = usos + 1 WHERE clave = ?",
+                    (ahora, clave),
+                )
+            self.aciertos += 1
+        return json.loads(fila[0])
+
+    def guardar(self, clave, dict_ia):
+        ahora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descripciones (clave, respuesta, creado, ultimo_acceso, usos) VALUES (?, ?, ?, ?, 0)",
+                (clave, json.dumps(dict_ia, ensure_ascii=False, default=str), ahora, ahora),
+            )
+            self._evictar(ahora)
+
+    def _evictar(self, ahora):
+        if self.ttl_segundos:
+            self._conn.execute(
+                "DELETE FROM descripciones WHERE creado < ?", (ahora - self.ttl_segundos,)
+            )
+        if self.max_entradas:
+            self._conn.execute(
+                """DELETE FROM descripciones WHERE clave IN (
+                    SELECT clave FROM descripciones ORDER BY ultimo_acceso DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entradas,),
+            )
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM descripciones").fetchone()[0]
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": entradas}
@@ -0,0 +1,149 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+SIN_ID = "No tiene"
+# Hojas en streaming demasiado grandes para guardar los hashes por fila: no se afirma ni se descarta una clave
+NO_VERIFICADO = "No verificado"
+_PRIMO = np.uint64(0x9E3779B97F4A7C15)
+# hash_pandas_object asigna este valor a los nulos, en columnas object y Arrow
+HASH_NULO = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _combinar(hashes):
+    # Combina los hashes de varias columnas en un solo uint64 por fila
+    combinado = hashes[0].copy()
+    with np.errstate(over="ignore"):
+        for h in hashes[1:]:
+            combinado = (combinado * _PRIMO) ^ h
+    return combinado
+
+
+def _es_unico(hashes):
+    return len(hashes) == len(np.unique(hashes))
+
+
+class _Columnas:
+    # Hashes, nulos y cardinalidad por posición de columna, calculados solo cuando se piden
+    def __init__(self, df):
+        self.df = df
+        self._hashes = {}
+        self._nulos = {}
+        self._distintos = {}
+
+    def tiene_nulos(self, i):
+        if i not in self._nulos:
+            self._nulos[i] = bool(self.df.iloc[:, i].isna().any())
+        return self._nulos[i]
+
+    def hashes(self, i):
+        if i not in self._hashes:
+            self._hashes[i] = pd.util.hash_pandas_object(self.df.iloc[:, i], index=False).to_numpy()
+        return self._hashes[i]
+
+    def distintos(self, i):
+        if i not in self._distintos:
+            self._distintos[i] = len(np.unique(self.hashes(i)))
+        return self._distintos[i]
+
+
+class _ColumnasHash:
+    # Misma interfaz que _Columnas sobre hashes por fila ya calculados (hojas en streaming); un nulo vale HASH_NULO
+    def __init__(self, hashes):
+        self._hashes = hashes
+        self._distintos = {}
+
+    def tiene_nulos(self, i):
+        return bool((self._hashes[i] == HASH_NULO).any())
+
+    def hashes(self, i):
+        return self._hashes[i]
+
+    def distintos(self, i):
+        if i not in self._distintos:
+            self._distintos[i] = len(np.unique(self._hashes[i]))
+        return self._distintos[i]
+
+
+def posiciones_muestra(n, tam_muestra):
+    # Mismas filas que df.sample(tam_muestra, random_state=1)
+    return np.random.RandomState(1).choice(n, tam_muestra, replace=False)
+
+
+def tiene_columna_id(df, max_columnas=3, tam_muestra=10000, max_combinaciones=2000):
+    """Devuelve la primera columna identificadora o la clave compuesta mínima.
+
+    Las claves compuestas se devuelven como "col_a + col_b". Las columnas con
+    nulos o duplicados dentro de una muestra se descartan sin leer la tabla
+    completa (lo que falla en la muestra falla también en el total) y solo
+    las sobrevivientes se verifican con hashes sobre la columna completa.
+    """
+    n = len(df)
+    if n == 0 or len(df.columns) == 0:
+        return SIN_ID
+    muestra = df.sample(tam_muestra, random_state=1) if n > tam_muestra else df
+    columnas = _Columnas(df)
+    columnas_muestra = _Columnas(muestra)
+    # Poda barata en la muestra
+    nulos_muestra = muestra.isna().any().to_numpy()
+    cardinalidad = muestra.nunique(dropna=False).to_numpy()
+    return _clave_minima(list(df.columns), n, len(muestra), columnas, columnas_muestra, nulos_muestra, cardinalidad,
+                         max_columnas, max_combinaciones)
+
+
+def clave_por_hashes(nombres, hashes, max_columnas=3, tam_muestra=10000, max_combinaciones=2000):
+    """Como tiene_columna_id, a partir de los hashes por fila de cada columna (hash_pandas_object).
+
+    Lo usan las hojas leídas en streaming: la muestra toma las mismas filas que
+    df.sample, así que el resultado coincide con el de la hoja en memoria.
+    """
+    n = len(hashes[0]) if hashes else 0
+    if n == 0:
+        return SIN_ID
+    columnas = _ColumnasHash(hashes)
+    columnas_muestra = columnas
+    if n > tam_muestra:
+        posiciones = posiciones_muestra(n, tam_muestra)
+        columnas_muestra = _ColumnasHash([h[posiciones] for h in hashes])
+    m = min(n, tam_muestra)
+    nulos_muestra = np.array([columnas_muestra.tiene_nulos(i) for i in range(len(nombres))])
+    cardinalidad = np.array([columnas_muestra.distintos(i) for i in range(len(nombres))])
+    return _clave_minima(nombres, n, m, columnas, columnas_muestra, nulos_muestra, cardinalidad,
+                         max_columnas, max_combinaciones)
+
+
+def _clave_minima(nombres, n, m, columnas, columnas_muestra, nulos_muestra, cardinalidad, max_columnas,
+                  max_combinaciones):
+    # Búsqueda común a las hojas en memoria y en streaming; m es el número de filas de la muestra
+    candidatas = [i for i in range(len(nombres)) if not nulos_muestra[i]]
+
+    # --- Claves simples, en el orden original de las columnas ---
+    for i in candidatas:
+        if cardinalidad[i] < m or columnas.tiene_nulos(i):
+            continue
+        if _es_unico(columnas.hashes(i)):
+            return nombres[i]
+    if max_columnas < 2:
+        return SIN_ID
+
+    # --- Claves compuestas mínimas, probando primero las columnas de mayor cardinalidad ---
+    candidatas.sort(key=lambda i: (-cardinalidad[i], i))
+    evaluadas = 0
+    for k in range(2, max_columnas + 1):
+        for combo in combinations(candidatas, k):
+            if evaluadas >= max_combinaciones:
+                return SIN_ID
+            evaluadas += 1
+            # Si el producto de cardinalidades no alcanza el número de filas, hay duplicados
+            if np.prod([float(cardinalidad[i]) for i in combo]) < m:
+                continue
+            if not _es_unico(_combinar([columnas_muestra.hashes(i) for i in combo])):
+                continue
+            if any(columnas.tiene_nulos(i) for i in combo):
+                continue
+            if np.prod([float(columnas.distintos(i)) for i in combo]) < n:
+                continue
+            if _es_unico(_combinar([columnas.hashes(i) for i in combo])):
+                return " + ".join(str(nombres[i]) for i in sorted(combo))
+    return SIN_ID
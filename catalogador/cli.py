@@ -0,0 +1,324 @@
+"""Catalogación por lotes sin interfaz.
+
+Ejemplo:
+    python -m catalogador "//servidor/compartido/**/*.xlsx" --salida catalogo.xlsx
+    python -m catalogador //servidor/extractos --umbral-streaming 1000000
+
+Además de Excel se catalogan CSV/TXT/TSV y Parquet (una tabla por archivo).
+
+La lectura de libros corre en un pool de procesos y las llamadas al modelo en
+un pool de hilos acotado. Cada libro terminado se agrega a un archivo de
+checkpoint (JSON Lines); al relanzar el comando se omiten los libros ya
+catalogados que no cambiaron. Una hoja que falla tras los reintentos queda
+sin descripción y su libro se vuelve a procesar en la siguiente ejecución
+(las hojas ya descritas salen del cache).
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+import tomllib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from catalogador import exportar
+from catalogador.almacen import AlmacenCatalogo
+from catalogador.cache import CacheDescripciones
+from catalogador.huellas import IndiceDuplicados
+from catalogador.llm import (
+    crear_cliente, derivar_respuesta, enviar_tablas, resolver_parcial, Circuito, LimitadorTasa, MODELO, REINTENTOS,
+)
+from catalogador.incremental import cargar_catalogo
+from catalogador.metricas import Metricas
+from catalogador.muestreo import ESTRATEGIAS, ESTRATEGIA_POR_DEFECTO
+from catalogador.prompt import TOKENS_POR_SOLICITUD, TOKENS_POR_TABLA
+from catalogador.relaciones import descubrir_relaciones, relaciones_df
+from catalogador.reutilizacion import IndiceColumnas
+from catalogador.pipeline import leer_archivo, asignar_ids, consolidar_tablas, etiqueta_tabla
+
+EXTENSIONES = (".xlsx", ".xlsm", ".xls", ".csv", ".txt", ".tsv", ".parquet", ".pq")
+# Archivos que escribe el propio catalogador (--salida .csv/.parquet/...), que no se vuelven a catalogar
+SUFIJOS_EXCLUIDOS = (".METADATOS", ".DICCIONARIO", ".RELACIONES")
+
+logger = logging.getLogger("catalogador")
+
+
+def expandir_rutas(patrones):
+    # Directorios (recursivo), patrones glob o archivos sueltos; sin duplicados y en orden estable
+    rutas = set()
+    for patron in patrones:
+        if os.path.isdir(patron):
+            candidatos = glob.glob(os.path.join(patron, "**", "*"), recursive=True)
+        else:
+            candidatos = glob.glob(patron, recursive=True)
+        for ruta in candidatos:
+            nombre = os.path.basename(ruta)
+            propio = os.path.splitext(nombre)[0].endswith(SUFIJOS_EXCLUIDOS)
+            if ruta.lower().endswith(EXTENSIONES) and not nombre.startswith("~$") and not propio and os.path.isfile(ruta):
+                rutas.add(os.path.abspath(ruta))
+    return sorted(rutas)
+
+
+def firma_archivo(ruta):
+    estado = os.stat(ruta)
+    return [estado.st_size, int(estado.st_mtime)]
+
+
+def cargar_checkpoint(ruta_checkpoint):
+    avance = {}
+    if not os.path.exists(ruta_checkpoint):
+        return avance
+    with open(ruta_checkpoint, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea truncada por una interrupción
+                continue
+            avance[registro["ruta"]] = registro
+    return avance
+
+
+def guardar_checkpoint(f, ruta, configuracion, tablas, respuestas, fallidas=None):
+    # No se guardan las muestras: solo lo necesario para consolidar al final
+    tablas = [{k: v for k, v in t.items() if k not in ("muestra_tabla", "firma_filas")} for t in tablas]
+    registro = {
+        "ruta": ruta,
+        "firma": firma_archivo(ruta),
+        "configuracion": configuracion,
+        "tablas": tablas,
+        "respuestas": respuestas,
+        # Tablas sin descripción tras los reintentos: el libro se vuelve a procesar en la próxima ejecución
+        "fallidas": sorted(fallidas or {}),
+    }
+    f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+    f.flush()
+
+
+def leer_api_key(api_key=None):
+    if api_key:
+        return api_key
+    if os.environ.get("OPENAI_API_KEY"):
+        return os.environ["OPENAI_API_KEY"]
+    # Misma configuración que usa la app de Streamlit
+    secrets = os.path.join(".streamlit", "secrets.toml")
+    if os.path.exists(secrets):
+        with open(secrets, "rb") as f:
+            return tomllib.load(f).get("llm", {}).get("key_")
+    return None
+
+
+def catalogar_directorio(rutas, salida, ruta_checkpoint, user_context="", usar_ia=True, client=None, cache=None,
+                         procesos=None, max_en_vuelo=4, solicitudes_por_minuto=None, tokens_por_minuto=None,
+                         modelo=MODELO, umbral_streaming=100000, max_columnas_clave=3,
+                         tokens_por_solicitud=TOKENS_POR_SOLICITUD, tokens_por_tabla=TOKENS_POR_TABLA,
+                         estrategia_muestreo=ESTRATEGIA_POR_DEFECTO, reintentos=REINTENTOS, indice=None,
+                         almacen=None):
+    # Un libro se vuelve a procesar si cambió en disco o si cambió la configuración de la corrida
+    configuracion = {
+        "usar_ia": usar_ia, "contexto": (user_context or "").strip(), "modelo": modelo, "muestreo": estrategia_muestreo,
+    }
+    avance = {
+        ruta: registro for ruta, registro in cargar_checkpoint(ruta_checkpoint).items()
+        if registro.get("configuracion") == configuracion
+    }
+    pendientes_lectura = [
+        r for r in rutas
+        if avance.get(r, {}).get("firma") != firma_archivo(r) or avance[r].get("fallidas")
+    ]
+    logger.info("%d archivos, %d ya catalogados en el checkpoint", len(rutas), len(rutas) - len(pendientes_lectura))
+
+    limitador = LimitadorTasa(solicitudes_por_minuto, tokens_por_minuto)
+    circuito = Circuito()
+    metricas = Metricas(modelo)
+    inicio = time.perf_counter()
+    en_curso = {}  # ruta -> (tablas, {table_id: Future | dict_ia})
+    # Hojas duplicadas entre todos los libros leídos en esta ejecución: (ruta, table_id) del representante
+    duplicados = IndiceDuplicados()
+    etiquetas = {}  # (ruta, table_id) -> "archivo › hoja"
+    enviadas = {}  # (ruta, table_id) -> Future | dict_ia de los representantes
+
+    def cerrar_terminados(f, esperar=False):
+        for ruta in list(en_curso):
+            tablas, futuros = en_curso[ruta]
+            if not esperar and any(isinstance(v, Future) and not v.done() for v in futuros.values()):
+                continue
+            del en_curso[ruta]
+            # Las hojas que fallan quedan sin descripción; las demás del libro se guardan igual
+            respuestas, fallidas = resolver_parcial(futuros)
+            for table_id, error in fallidas.items():
+                metricas.registrar_fallida(f"{os.path.basename(ruta)}:{table_id}", error)
+                logger.warning("Falló la descripción de %s %s: %s", ruta, table_id, error)
+            guardar_checkpoint(f, ruta, configuracion, tablas, respuestas, fallidas)
+            avance[ruta] = {"tablas": tablas, "respuestas": respuestas}
+            if fallidas:
+                logger.info("Catalogado %s (%d hojas, %d pendientes para la próxima ejecución)", ruta, len(tablas), len(fallidas))
+            else:
+                logger.info("Catalogado %s (%d hojas)", ruta, len(tablas))
+
+    with open(ruta_checkpoint, "a", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=procesos) as pool_lectura, \
+            ThreadPoolExecutor(max_workers=max(1, max_en_vuelo)) as pool_ia:
+        lecturas = {
+            pool_lectura.submit(leer_archivo, ruta, None, umbral_streaming, max_columnas_clave, estrategia_muestreo): ruta
+            for ruta in pendientes_lectura
+        }
+        # Mientras los procesos siguen leyendo, las hojas ya leídas se envían al modelo
+        for futuro in as_completed(lecturas):
+            ruta = lecturas[futuro]
+            try:
+                tablas = asignar_ids(futuro.result())
+            except Exception:
+                logger.exception("No se pudo leer %s", ruta)
+                continue
+            metricas.agregar_hojas(tablas)
+            copias = {}
+            for t in tablas:
+                etiquetas[(ruta, t["table_id"])] = etiqueta_tabla(t)
+                encontrada = duplicados.agregar((ruta, t["table_id"]), t)
+                if encontrada is not None:
+                    copias[t["table_id"]] = encontrada[0]
+                    t["duplicado_de"] = etiquetas[encontrada[0]]
+                    t["similitud_duplicado"] = f"{encontrada[1]:.0%}"
+            metricas.registrar_duplicadas(len(copias))
+            futuros = {}
+            if usar_ia and tablas:
+                futuros = enviar_tablas(
+                    pool_ia, client, {t["table_id"]: t["muestra_tabla"] for t in tablas if t["table_id"] not in copias},
+                    user_context, modelo, limitador, cache, tokens_por_solicitud, tokens_por_tabla, metricas, circuito, reintentos, indice,
+                )
+                enviadas.update({(ruta, table_id): valor for table_id, valor in futuros.items()})
+                # Las duplicadas esperan la respuesta de su representante, aunque esté en otro libro
+                for t in tablas:
+                    if t["table_id"] in copias:
+                        futuros[t["table_id"]] = derivar_respuesta(enviadas[copias[t["table_id"]]], t["columnas"])
+            en_curso[ruta] = (tablas, futuros)
+            cerrar_terminados(f)
+        cerrar_terminados(f, esperar=True)
+
+    # --- Consolidar en orden de ruta, renumerando table_id de forma global ---
+    tablas_todas, respuestas_todas = [], {}
+    for ruta in rutas:
+        if ruta not in avance:
+            continue
+        for t in avance[ruta]["tablas"]:
+            respuesta = avance[ruta]["respuestas"].get(t["table_id"])
+            t = dict(t)
+            asignar_ids([t], inicio=len(tablas_todas) + 1)
+            tablas_todas.append(t)
+            if respuesta is not None:
+                respuestas_todas[t["table_id"]] = respuesta
+    with metricas.medir("consolidacion"):
+        metadatos_list, diccionarios_list, _ = consolidar_tablas(tablas_todas, respuestas_todas)
+    # Las relaciones se buscan entre todas las hojas, también las tomadas del checkpoint
+    with metricas.medir("relaciones"):
+        relaciones = relaciones_df(descubrir_relaciones(tablas_todas))
+    metadatos_df, diccionarios_df = pd.DataFrame(metadatos_list), pd.DataFrame(diccionarios_list)
+    extension = os.path.splitext(salida)[1].lstrip(".").lower()
+    with metricas.medir("exportacion"):
+        if extension in ("parquet", "csv", "jsonl"):
+            # Un archivo por hoja: <salida>.METADATOS.<ext> y <salida>.DICCIONARIO.<ext>
+            base = os.path.splitext(salida)[0]
+            exportar.escribir_tabla(exportar.preparar_metadatos(metadatos_df), extension, f"{base}.METADATOS.{extension}")
+            exportar.escribir_tabla(diccionarios_df, extension, f"{base}.DICCIONARIO.{extension}")
+            exportar.escribir_tabla(relaciones, extension, f"{base}.RELACIONES.{extension}")
+        else:
+            exportar.to_excel(metadatos_df, diccionarios_df, salida, relaciones=relaciones)
+        if almacen is not None:
+            # Las ediciones guardadas en el almacén de otros libros se conservan
+            cambios = almacen.guardar(metadatos_df, diccionarios_df, relaciones)
+            logger.info("Catálogo guardado en %s (%d campos editados desde el último guardado)", almacen.ruta, cambios)
+    metricas.etapas["total"] = time.perf_counter() - inicio
+    # Las hojas tomadas del checkpoint no se vuelven a medir: solo cuentan las de esta ejecución
+    with open(f"{salida}.metricas.json", "w", encoding="utf-8") as f:
+        f.write(metricas.a_json())
+    resumen = metricas.resumen()
+    logger.info(
+        "Métricas: %d llamadas IA (%d reintentos), %d tokens de entrada, %d de salida, costo estimado USD %.4f (detalle en %s.metricas.json)",
+        resumen["llamadas_ia"], resumen["reintentos"], resumen["tokens_entrada"], resumen["tokens_salida"],
+        resumen["costo_estimado_usd"], salida,
+    )
+    if indice is not None:
+        logger.info("Columnas con descripción reutilizada del índice: %d (enviadas al modelo: %d)",
+                    resumen["columnas_reutilizadas"], resumen["columnas_enviadas"])
+    if resumen["tablas_recortadas"]:
+        logger.warning("%d hojas no cabían en --tokens-por-tabla y se enviaron con la muestra recortada (detalle en %s.metricas.json)",
+                       resumen["tablas_recortadas"], salida)
+    if resumen["tablas_pendientes"]:
+        logger.warning("%d hojas quedaron sin descripción; vuelva a ejecutar para reintentarlas", resumen["tablas_pendientes"])
+    logger.info("Catálogo escrito en %s (%d tablas, %d relaciones entre tablas)", salida, len(metadatos_list), len(relaciones))
+    return metadatos_list, diccionarios_list
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="catalogador", description="Cataloga libros de Excel sin la interfaz de Streamlit.")
+    parser.add_argument("rutas", nargs="+", help="Directorios, archivos o patrones glob (use ** para recursivo)")
+    parser.add_argument("--salida", default="catalogo_metadatos_diccionario.xlsx", help="Salida METADATOS/DICCIONARIO/RELACIONES: .xlsx, o .parquet/.csv/.jsonl (un archivo por hoja)")
+    parser.add_argument("--checkpoint", help="Archivo JSON Lines de avance (por defecto <salida>.checkpoint.jsonl)")
+    parser.add_argument("--contexto", default="", help="Contexto adicional para el modelo")
+    parser.add_argument("--sin-ia", action="store_true", help="No generar descripciones con IA")
+    parser.add_argument("--api-key", help="API key de OpenAI (por defecto OPENAI_API_KEY o .streamlit/secrets.toml)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para leer libros (por defecto, núcleos disponibles)")
+    parser.add_argument("--max-en-vuelo", type=int, default=4, help="Llamadas simultáneas al modelo")
+    parser.add_argument("--rpm", type=int, default=500, help="Solicitudes por minuto")
+    parser.add_argument("--tpm", type=int, default=200000, help="Tokens por minuto")
+    parser.add_argument("--cache", default=os.path.join(".cache", "descripciones_ia.sqlite"), help="Cache de descripciones ('' para desactivar)")
+    parser.add_argument("--umbral-streaming", type=int, default=100000, help="Filas a partir de las cuales una hoja se lee en streaming")
+    parser.add_argument("--max-columnas-clave", type=int, default=3, help="Columnas máximas de una clave compuesta")
+    parser.add_argument("--tokens-por-solicitud", type=int, default=TOKENS_POR_SOLICITUD, help="Presupuesto de tokens de cada llamada; las hojas más anchas se parten por columnas")
+    parser.add_argument("--tokens-por-tabla", type=int, default=TOKENS_POR_TABLA, help="Presupuesto de tokens de todas las llamadas de una hoja")
+    parser.add_argument("--muestreo", choices=list(ESTRATEGIAS), default=ESTRATEGIA_POR_DEFECTO, help="Estrategia para elegir las filas de muestra del prompt")
+    parser.add_argument("--indice", default=os.path.join(".cache", "indice_columnas.sqlite"), help="Índice de columnas ya descritas que se reutilizan ('' para desactivar)")
+    parser.add_argument("--indexar", nargs="+", default=[], metavar="CATALOGO", help="Catálogos .xlsx revisados cuyas descripciones se agregan al índice antes de catalogar")
+    parser.add_argument("--reintentos", type=int, default=REINTENTOS, help="Reintentos por llamada ante errores transitorios del modelo")
+    parser.add_argument("--almacen", default="", help="Catálogo local SQLite donde guardar el resultado para buscarlo desde la app ('' para no guardar)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    rutas = expandir_rutas(args.rutas)
+    if not rutas:
+        parser.error("No se encontraron archivos de Excel, CSV o Parquet en las rutas indicadas.")
+
+    client = cache = indice = None
+    usar_ia = not args.sin_ia
+    if usar_ia:
+        api_key = leer_api_key(args.api_key)
+        if not api_key:
+            parser.error("Falta la API key: use --api-key, OPENAI_API_KEY o .streamlit/secrets.toml.")
+        client = crear_cliente(api_key, max_conexiones=args.max_en_vuelo)
+        cache = CacheDescripciones(args.cache) if args.cache else None
+        indice = IndiceColumnas(args.indice) if args.indice else None
+        for catalogo in args.indexar if indice is not None else []:
+            indice.indexar_diccionario(cargar_catalogo(catalogo)[1])
+            logger.info("Indexadas las descripciones de %s", catalogo)
+
+    catalogar_directorio(
+        rutas,
+        args.salida,
+        args.checkpoint or f"{args.salida}.checkpoint.jsonl",
+        user_context=args.contexto,
+        usar_ia=usar_ia,
+        client=client,
+        cache=cache,
+        procesos=args.procesos,
+        max_en_vuelo=args.max_en_vuelo,
+        solicitudes_por_minuto=args.rpm,
+        tokens_por_minuto=args.tpm,
+        umbral_streaming=args.umbral_streaming,
+        max_columnas_clave=args.max_columnas_clave,
+        tokens_por_solicitud=args.tokens_por_solicitud,
+        tokens_por_tabla=args.tokens_por_tabla,
+        estrategia_muestreo=args.muestreo,
+        reintentos=args.reintentos,
+        indice=indice,
+        almacen=AlmacenCatalogo(args.almacen) if args.almacen else None,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
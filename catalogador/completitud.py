@@ -0,0 +1,95 @@
+import pandas as pd
+import plotly.express as px
+
+CAMPOS_A_EVALUAR = [
+    "table_id", "table_name", "table_description", "format", "date_modified", "date_register",
+    "data_privacy", "data_steward_operativo_contact", "data_steward_ejecutivo_contact", "domain",
+    "data_owner_area", "location_path", "periodicity", "table_status"
+]
+ESCALA_COLORES = ["#ff0000", "#ffff00", "#00ff00"]  # Rojo → Amarillo → Verde
+# A partir de este número de tablas se muestra la vista agregada en lugar de una barra por tabla
+MAX_TABLAS_GRAFICO_DETALLE = 60
+
+
+def calcular_completitud(metadatos, campos=CAMPOS_A_EVALUAR):
+    """Devuelve (% de completitud por tabla, máscara de campos vacíos) para todas las tablas a la vez."""
+    valores = metadatos[campos].astype("string").fillna("")
+    vacios = valores.apply(lambda col: col.str.strip().eq("")).astype(bool)
+    pct = (100 * (1 - vacios.sum(axis=1) / len(campos))).round(1)
+    return pct, vacios
+
+
+def texto_vacios(vacios):
+    # "campo_a, campo_b" por fila sin recorrer filas: producto de la máscara por los nombres
+    texto = vacios.dot(pd.Index(vacios.columns) + ", ").str.rstrip(", ")
+    return texto.mask(texto == "", "Ninguno")
+
+
+def resumen_por(metadatos, pct, columna):
+    agrupador = metadatos[columna].astype("string").fillna("").str.strip().replace("", "(sin asignar)")
+    return (
+        pd.DataFrame({columna: agrupador, "% Completitud": pct})
+        .groupby(columna)
+        .agg(**{"% Completitud": ("% Completitud", "mean"), "Tablas": ("% Completitud", "size")})
+        .round(1)
+        .reset_index()
+        .sort_values("% Completitud")
+    )
+
+
+def grafico_por_tabla(metadatos, pct, vacios):
+    datos = pd.DataFrame({
+        "table_name": metadatos["table_name"],
+        "% Completitud": pct,
+        # Tooltip personalizado con campos vacíos
+        "Vacíos": texto_vacios(vacios),
+    }).sort_values("% Completitud")
+    fig = px.bar(
+        datos,
+        y="table_name",
+        x="% Completitud",
+        orientation="h",
+        text="% Completitud",
+        title="Porcentaje de completitud de metadatos por tabla",
+        labels={"table_name": "Tabla", "% Completitud": "% Completitud"},
+        color="% Completitud",
+        color_continuous_scale=ESCALA_COLORES,
+        range_color=[0, 100],
+        custom_data=["Vacíos"],
+    )
+    fig.update_traces(
+        marker_line_color='black', marker_line_width=0,
+        hovertemplate="Tabla: %{y}<br>Completitud: %{x}%<br>Vacíos: %{customdata[0]}<extra></extra>"
+    )
+    return fig
+
+
+def grafico_agregado(resumen, columna, etiqueta):
+    fig = px.bar(
+        resumen,
+        y=columna,
+        x="% Completitud",
+        orientation="h",
+        text="% Completitud",
+        title=f"Completitud promedio de metadatos por {etiqueta.lower()}",
+        labels={columna: etiqueta},
+        color="% Completitud",
+        color_continuous_scale=ESCALA_COLORES,
+        range_color=[0, 100],
+        hover_data=["Tablas"],
+    )
+    fig.update_traces(marker_line_width=0)
+    return fig
+
+
+def histograma(pct):
+    fig = px.histogram(
+        pd.DataFrame({"% Completitud": pct}),
+        x="% Completitud",
+        nbins=20,
+        range_x=[0, 100],
+        title="Distribución de la completitud de metadatos",
+        labels={"count": "Tablas"},
+    )
+    fig.update_layout(yaxis_title="Tablas")
+    return fig
@@ -0,0 +1,106 @@
+import uuid
+
+import pandas as pd
+
+# Campos cuya edición convierte un atributo en revisado (alimenta el índice de columnas reutilizables)
+CAMPOS_REVISION = ("Descripción", "column_rename_suggestion", "reason")
+
+
+class AlmacenDiccionario:
+    """Diccionario de datos indexado por table_id.
+
+    Los atributos se pasan una sola vez a un DataFrame (respaldo columnar) y se
+    separan por tabla, de modo que leer, editar o exportar una tabla no recorre
+    los atributos de las demás.
+    """
+
+    def __init__(self, diccionarios_list):
+        df = pd.DataFrame(diccionarios_list)
+        self.columnas = list(df.columns)
+        self._tablas = {}
+        if not df.empty:
+            self._tablas = {
+                table_id: grupo.reset_index(drop=True)
+                for table_id, grupo in df.groupby("table_id", sort=False)
+            }
+        self._uid = uuid.uuid4().hex
+        self._version = 0
+        self._completo = None  # (versión, DataFrame concatenado)
+        self._editados = {}  # table_id -> atributos editados a mano aún no entregados por tomar_editados
+
+    @property
+    def version(self):
+        # Cambia con cada edición y es distinta entre almacenes: sirve de clave para memoizar
+        return f"{self._uid}:{self._version}"
+
+    def __contains__(self, table_id):
+        return table_id in self._tablas
+
+    def table_ids(self):
+        return list(self._tablas)
+
+    def tabla(self, table_id):
+        if table_id not in self._tablas:
+            return pd.DataFrame(columns=self.columnas)
+        return self._tablas[table_id]
+
+    def guardar(self, table_id, df):
+        self._tablas[table_id] = df
+        self._version += 1
+
+    def aplicar_cambios(self, table_id, changes):
+        # Cambios en el formato de st.data_editor: edited_rows, added_rows, deleted_rows
+        df = self.tabla(table_id).copy()
+        # Aplicar cambios de edición
+        for idx, row_changes in changes.get('edited_rows', {}).items():
+            for col, val in row_changes.items():
+                df.at[int(idx), col] = val
+            if any(col in CAMPOS_REVISION for col in row_changes):
+                self._editados.setdefault(table_id, set()).add(df.at[int(idx), "Atributo"])
+        # Agregar filas nuevas
+        if changes.get('added_rows'):
+            df = pd.concat([df, pd.DataFrame(changes['added_rows'])], ignore_index=True)
+        # Eliminar filas
+        if changes.get('deleted_rows'):
+            df = df.drop(changes['deleted_rows']).reset_index(drop=True)
+        self.guardar(table_id, df)
+
+    def completar(self, table_id, filas, campos):
+        # Rellena solo los `campos` vacíos, por Atributo: las ediciones hechas mientras tanto se conservan
+        nuevas = pd.DataFrame(filas)
+        if table_id not in self._tablas:
+            self.guardar(table_id, nuevas)
+            return
+        df = self._tablas[table_id].copy()
+        por_atributo = nuevas.drop_duplicates("Atributo").set_index("Atributo")
+        for campo in campos:
+            if campo not in por_atributo.columns:
+                continue
+            valores = df["Atributo"].map(por_atributo[campo])
+            vacios = (df[campo].isna() | (df[campo].astype(str) == "")) & valores.notna()
+            df.loc[vacios, campo] = valores[vacios]
+        self.guardar(table_id, df)
+
+    def concatenar(self, table_ids):
+        # Diccionarios en el orden pedido (p. ej. el de METADATOS), editados o no
+        partes = [self._tablas[t] for t in table_ids if t in self._tablas]
+        if not partes:
+            return pd.DataFrame(columns=self.columnas)
+        return pd.concat(partes, ignore_index=True)
+
+    def completo(self):
+        # Se reconstruye solo cuando hubo ediciones desde la última llamada
+        if self._completo is None or self._completo[0] != self._version:
+            self._completo = (self._version, self.concatenar(self.table_ids()))
+        return self._completo[1]
+
+    def tomar_editados(self):
+        """Filas de los atributos editados a mano desde la última llamada (cada edición se entrega una vez)."""
+        partes = [
+            df[df["Atributo"].isin(self._editados[table_id])]
+            for table_id, df in self._tablas.items() if table_id in self._editados
+        ]
+        self._editados = {}
+        if not partes:
+            return pd.DataFrame(columns=self.columnas)
+        return pd.concat(partes, ignore_index=True)
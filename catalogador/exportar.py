@@ -0,0 +1,121 @@
+import hashlib
+import math
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import xlsxwriter
+
+DOMINIO_CORREO = "@asbanc.com.pe"
+CAMPOS_CORREO = ["data_steward_operativo_contact", "data_steward_ejecutivo_contact"]
+
+# Formatos de exportación: etiqueta -> (extensión, mime)
+FORMATOS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/zip"),
+    "CSV": ("csv", "application/zip"),
+    "JSON Lines": ("jsonl", "application/zip"),
+}
+
+
+def preparar_metadatos(metadatos):
+    metadatos = metadatos.copy()
+    # Eliminar columna de completitud si existe
+    if '% Completitud' in metadatos.columns:
+        metadatos = metadatos.drop(columns=['% Completitud'])
+    for col in CAMPOS_CORREO:
+        metadatos[col] = metadatos[col].astype(str).str.strip() + DOMINIO_CORREO
+    return metadatos
+
+
+def huella_catalogo(metadatos, diccionarios, relaciones=None):
+    # Hash exacto del contenido editado; sirve de clave para memoizar la exportación
+    h = hashlib.sha256()
+    for df in (metadatos, diccionarios) if relaciones is None else (metadatos, diccionarios, relaciones):
+        h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _celda(valor):
+    # xlsxwriter no acepta NaN/NA: se escriben como celdas vacías
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def _escribir_hoja(workbook, nombre, df, formato_encabezado, filas_por_bloque=5000):
+    hoja = workbook.add_worksheet(nombre)
+    hoja.write_row(0, 0, [str(c) for c in df.columns], formato_encabezado)
+    fila = 1
+    # En modo constant_memory las filas deben escribirse en orden; se recorren por bloques
+    for inicio in range(0, len(df), filas_por_bloque):
+        bloque = df.iloc[inicio:inicio + filas_por_bloque].astype(object)
+        for valores in bloque.itertuples(index=False, name=None):
+            hoja.write_row(fila, 0, [_celda(v) for v in valores])
+            fila += 1
+
+
+def to_excel(metadatos, diccionarios, destino=None, relaciones=None):
+    """Escribe las hojas METADATOS, DICCIONARIO y (si se dan) RELACIONES; sin `destino` devuelve un BytesIO.
+
+    Se usa xlsxwriter en modo constant_memory: cada fila se vuelca a disco al
+    escribirse, de modo que la memoria no crece con el tamaño del diccionario.
+    """
+    output = destino if destino is not None else BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    encabezado = workbook.add_format({"bold": True, "border": 1})
+    _escribir_hoja(workbook, "METADATOS", preparar_metadatos(metadatos), encabezado)
+    _escribir_hoja(workbook, "DICCIONARIO", diccionarios, encabezado)
+    if relaciones is not None:
+        _escribir_hoja(workbook, "RELACIONES", relaciones, encabezado)
+    workbook.close()
+    if destino is None:
+        output.seek(0)
+    return output
+
+
+def _como_texto(df):
+    # Columnas object con tipos mezclados (p. ej. Mínimo/Máximo) se fijan como texto para Parquet
+    return df.astype({col: "string" for col, dtype in df.dtypes.items() if dtype == object})
+
+
+def escribir_tabla(df, extension, destino):
+    if extension == "parquet":
+        _como_texto(df).to_parquet(destino, index=False)
+    elif extension == "csv":
+        df.to_csv(destino, index=False, encoding="utf-8")
+    elif extension == "jsonl":
+        df.to_json(destino, orient="records", lines=True, force_ascii=False)
+    else:
+        raise ValueError(f"Formato de exportación no soportado: {extension}")
+
+
+def exportar(metadatos, diccionarios, formato, relaciones=None, destino=None):
+    """Escribe el catálogo en `destino` y devuelve (destino, nombre_archivo, mime).
+
+    Excel produce un solo libro; los demás formatos, un .zip con
+    METADATOS.<ext> y DICCIONARIO.<ext> listos para cargar en el catálogo.
+    Con `relaciones` se agrega la hoja (o el archivo) RELACIONES. Sin
+    `destino` se escribe en un BytesIO, posicionado al inicio.
+    """
+    extension, mime = FORMATOS[formato]
+    output = destino if destino is not None else BytesIO()
+    if extension == "xlsx":
+        to_excel(metadatos, diccionarios, output, relaciones=relaciones)
+        nombre_archivo = "catalogo_metadatos_diccionario.xlsx"
+    else:
+        hojas = [("METADATOS", preparar_metadatos(metadatos)), ("DICCIONARIO", diccionarios)]
+        if relaciones is not None:
+            hojas.append(("RELACIONES", relaciones))
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for nombre, df in hojas:
+                # Cada archivo se comprime a medida que se escribe, sin una copia intermedia en memoria
+                with zf.open(f"{nombre}.{extension}", "w", force_zip64=True) as miembro:
+                    escribir_tabla(df, extension, miembro)
+        nombre_archivo = f"catalogo_metadatos_diccionario_{extension}.zip"
+    if destino is None:
+        output.seek(0)
+    return output, nombre_archivo, mime
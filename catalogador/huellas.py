@@ -0,0 +1,125 @@
+"""Huellas de hoja: esquema, contenido y firma de filas para detectar duplicados.
+
+La firma de filas es un MinHash sobre el hash de cada fila (los mismos hashes
+que dan content_hash), así que no depende del orden de las filas.
+IndiceDuplicados agrupa hojas idénticas o casi idénticas con LSH
+por bandas: cada hoja solo se compara con las que comparten alguna banda.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+NUM_PERMUTACIONES = 64
+# Bandas de LSH: 16 bandas de 4 valores detectan con alta probabilidad pares con similitud >= 0.6
+BANDAS = 16
+# Similitud de Jaccard estimada entre filas a partir de la cual una hoja es casi duplicada de otra
+UMBRAL_DUPLICADO = 0.8
+# Filas por bloque al calcular el MinHash: acota la matriz temporal filas x permutaciones
+FILAS_POR_BLOQUE = 8192
+
+# Primo de Mersenne 2**31 - 1: con hashes de 32 bits, a * h da muchas vueltas al módulo
+# (permutaciones bien mezcladas) y a * h + b no desborda uint64
+_PRIMO = np.uint64((1 << 31) - 1)
+_generador = np.random.default_rng(20240601)
+_A = _generador.integers(1, 1 << 31, NUM_PERMUTACIONES, dtype=np.uint64)
+_B = _generador.integers(0, 1 << 31, NUM_PERMUTACIONES, dtype=np.uint64)
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+
+
+# --- Huellas de hoja: esquema (nombres y orden de columnas) y contenido ---
+def hash_esquema(columnas):
+    return hashlib.sha256(json.dumps([str(c) for c in columnas], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def hashes_filas(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def hash_contenido(df, hashes=None):
+    # PerfilIncremental.hash_contenido da el mismo valor para las hojas leídas en streaming
+    if hashes is None:
+        hashes = hashes_filas(df)
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+
+# --- MinHash ---
+def firma_minhash(hashes, firma=None):
+    """Firma MinHash de un arreglo de hashes enteros; con `firma` la actualiza (unión de conjuntos)."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    hashes = (hashes ^ (hashes >> np.uint64(32))) & _MASCARA_32
+    if firma is None:
+        firma = np.full(NUM_PERMUTACIONES, _PRIMO, dtype=np.uint64)
+    for inicio in range(0, len(hashes), FILAS_POR_BLOQUE):
+        bloque = hashes[inicio:inicio + FILAS_POR_BLOQUE]
+        firma = np.minimum(firma, ((np.outer(bloque, _A) + _B) % _PRIMO).min(axis=0))
+    return firma
+
+
+def similitud_firmas(firma_a, firma_b):
+    return float(np.mean(np.asarray(firma_a) == np.asarray(firma_b)))
+
+
+def suma_hashes(hashes, suma=0):
+    # Suma módulo 2**64 de los hashes de fila: no depende del orden de las filas
+    return (int(suma) + int(np.sum(hashes, dtype=np.uint64))) & ((1 << 64) - 1)
+
+
+def huellas_duplicados(df, hashes=None):
+    """Campos de la tabla que usa IndiceDuplicados, a partir de la hoja completa."""
+    if hashes is None:
+        hashes = hashes_filas(df)
+    return {
+        "huella_filas": f"{len(hashes)}:{suma_hashes(hashes):016x}",
+        "firma_filas": firma_minhash(hashes).tolist(),
+    }
+
+
+class IndiceDuplicados:
+    """Agrupa tablas idénticas (mismas filas en cualquier orden) o casi idénticas.
+
+    Solo se comparan tablas con el mismo esquema (schema_hash). Las idénticas se
+    reconocen por huella_filas; las casi idénticas, con LSH sobre la firma de
+    filas: cada tabla se compara únicamente con los representantes que
+    comparten alguna banda, de modo que el costo crece linealmente con el
+    número de hojas.
+    """
+
+    def __init__(self, umbral=UMBRAL_DUPLICADO, bandas=BANDAS):
+        self.umbral = umbral
+        self.bandas = bandas
+        self._exactas = {}  # (esquema, huella_filas) -> clave del representante
+        self._cubetas = {}  # (esquema, banda, valores) -> claves de representantes
+        self._firmas = {}
+
+    def _llaves(self, tabla, firma):
+        filas_banda = len(firma) // self.bandas
+        return [
+            (tabla["schema_hash"], b, firma[b * filas_banda:(b + 1) * filas_banda].tobytes())
+            for b in range(self.bandas)
+        ]
+
+    def agregar(self, clave, tabla):
+        """Devuelve (clave del representante, similitud) si `tabla` duplica a una anterior; si no, la registra."""
+        if "firma_filas" not in tabla:
+            return None
+        exacta = (tabla["schema_hash"], tabla["huella_filas"])
+        if exacta in self._exactas:
+            return self._exactas[exacta], 1.0
+        firma = np.asarray(tabla["firma_filas"], dtype=np.uint64)
+        llaves = self._llaves(tabla, firma)
+        candidatos = {c for llave in llaves for c in self._cubetas.get(llave, ())}
+        mejor, parecido_mejor = None, self.umbral
+        for candidato in sorted(candidatos, key=str):
+            parecido = similitud_firmas(firma, self._firmas[candidato])
+            if parecido >= parecido_mejor:
+                mejor, parecido_mejor = candidato, parecido
+        if mejor is not None:
+            return mejor, round(parecido_mejor, 3)
+        # Es representante de su grupo: las siguientes hojas se comparan con ella
+        self._exactas[exacta] = clave
+        self._firmas[clave] = firma
+        for llave in llaves:
+            self._cubetas.setdefault(llave, []).append(clave)
+        return None
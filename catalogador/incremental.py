@@ -0,0 +1,128 @@
+"""Re-catalogación incremental contra un catálogo exportado anteriormente.
+
+Cada hoja se compara con la misma (file_name, table_name) del catálogo previo:
+
+- "sin_cambios": mismo esquema y contenido; se reutiliza todo lo anterior.
+- "contenido": mismo esquema, datos distintos; se conservan descripciones y
+  ediciones, y se actualizan el perfil, Columna_ID y date_modified.
+- "esquema": columnas distintas; se consulta al modelo y se conservan las
+  ediciones de la tabla y de los atributos que siguen existiendo.
+- "nueva": no estaba en el catálogo previo.
+
+Solo "nueva" y "esquema" llegan al modelo.
+"""
+import pandas as pd
+
+from catalogador.exportar import CAMPOS_CORREO, DOMINIO_CORREO
+from catalogador.huellas import hash_esquema
+from catalogador.perfil import CAMPOS_PERFIL
+
+# Campos de METADATOS que se recalculan siempre; el resto puede haber sido editado por un steward
+CAMPOS_CALCULADOS = [
+    "file_name", "table_id", "table_name", "format", "date_modified", "Columna_ID", "schema_hash", "content_hash",
+    "duplicado_de", "similitud_duplicado",
+]
+# Campos de DICCIONARIO que se conservan del catálogo previo para los atributos que siguen existiendo
+CAMPOS_EDITABLES_DICCIONARIO = ["Descripción", "Tipo de dato", "column_rename_suggestion", "reason"]
+ESTADOS_A_CATALOGAR = ("nueva", "esquema")
+
+
+def cargar_catalogo(archivo):
+    """Lee METADATOS y DICCIONARIO de un catalogo_metadatos_diccionario.xlsx."""
+    hojas = pd.read_excel(archivo, sheet_name=["METADATOS", "DICCIONARIO"], dtype=str, keep_default_na=False)
+    metadatos, diccionario = hojas["METADATOS"], hojas["DICCIONARIO"]
+    # En el editor los correos se muestran sin el dominio
+    for col in CAMPOS_CORREO:
+        if col in metadatos.columns:
+            metadatos[col] = metadatos[col].str.replace(DOMINIO_CORREO, "", regex=False)
+    # Los campos numéricos del perfil vuelven a su tipo para no mezclar texto y números en el editor
+    for campo in ("pct_nulos", "distintos", "longitud_max"):
+        etiqueta = CAMPOS_PERFIL[campo]
+        if etiqueta in diccionario.columns:
+            diccionario[etiqueta] = pd.to_numeric(diccionario[etiqueta], errors="coerce")
+    return metadatos, diccionario
+
+
+def indexar_catalogo(catalogo_anterior):
+    # (filas por (archivo, tabla), atributos por (archivo, tabla)) del catálogo previo
+    metadatos, diccionario = catalogo_anterior
+    filas = {(m["file_name"], m["table_name"]): m for m in metadatos.to_dict(orient="records")}
+    atributos = {
+        clave: grupo.to_dict(orient="records")
+        for clave, grupo in diccionario.groupby(["file_name", "table_name"], sort=False)
+    }
+    return filas, atributos
+
+
+def clasificar_tablas(tablas, catalogo_anterior, indexado=None):
+    """Devuelve {table_id: estado} comparando las huellas de cada hoja con el catálogo previo.
+
+    `indexado` (de indexar_catalogo) evita volver a indexar el catálogo cuando
+    las hojas se clasifican por partes, a medida que se leen.
+    """
+    filas, atributos = indexado or indexar_catalogo(catalogo_anterior)
+    estados = {}
+    for t in tablas:
+        previa = filas.get((t["file_name"], t["sheet_name"]))
+        if previa is None:
+            estados[t["table_id"]] = "nueva"
+            continue
+        # Catálogos exportados antes de las huellas: el esquema se toma del DICCIONARIO
+        esquema_previo = previa.get("schema_hash") or hash_esquema(
+            [a["Atributo"] for a in atributos.get((t["file_name"], t["sheet_name"]), [])]
+        )
+        if esquema_previo != t["schema_hash"]:
+            estados[t["table_id"]] = "esquema"
+        elif previa.get("content_hash") and previa["content_hash"] != t["content_hash"]:
+            estados[t["table_id"]] = "contenido"
+        else:
+            estados[t["table_id"]] = "sin_cambios"
+    return estados
+
+
+def fusionar_con_anterior(metadatos_list, diccionarios_list, estados, catalogo_anterior, archivos_subidos):
+    """Aplica las ediciones del catálogo previo sobre el resultado nuevo.
+
+    Las tablas previas de archivos que no se volvieron a subir se conservan al
+    final con un table_id nuevo.
+    """
+    filas, atributos = indexar_catalogo(catalogo_anterior)
+    atributos_por_tabla = {}
+    for d in diccionarios_list:
+        atributos_por_tabla.setdefault(d["table_id"], []).append(d)
+
+    for m in metadatos_list:
+        clave = (m["file_name"], m["table_name"])
+        estado = estados.get(m["table_id"], "nueva")
+        previa = filas.get(clave)
+        if previa is None:
+            continue
+        for campo, valor in previa.items():
+            if campo in CAMPOS_CALCULADOS or campo not in m:
+                continue
+            # La descripción nueva del modelo solo reemplaza una vacía
+            if campo == "table_description" and not valor:
+                continue
+            m[campo] = valor
+        if estado == "sin_cambios" and previa.get("date_modified"):
+            m["date_modified"] = previa["date_modified"]
+        previos = {a["Atributo"]: a for a in atributos.get(clave, [])}
+        for d in atributos_por_tabla.get(m["table_id"], []):
+            anterior = previos.get(d["Atributo"])
+            if anterior is None:
+                continue
+            for campo in CAMPOS_EDITABLES_DICCIONARIO:
+                if anterior.get(campo):
+                    d[campo] = anterior[campo]
+
+    # --- Conservar tablas de archivos que no forman parte de esta carga ---
+    siguiente = len(metadatos_list) + 1
+    for clave, previa in filas.items():
+        if clave[0] in archivos_subidos:
+            continue
+        table_id = f"T{str(siguiente).zfill(3)}"
+        siguiente += 1
+        metadatos_list.append({**previa, "table_id": table_id})
+        for a in atributos.get(clave, []):
+            diccionarios_list.append({**a, "table_id": table_id})
+    return metadatos_list, diccionarios_list
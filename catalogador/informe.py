@@ -0,0 +1,179 @@
+"""Secciones del informe de resultados.
+
+Cada tabla HTML depende solo de unas pocas columnas de METADATOS o del
+DICCIONARIO, de modo que la página puede memoizarlas por separado y rehacer
+únicamente las afectadas por una edición.
+"""
+from html import escape
+
+from catalogador.claves import NO_VERIFICADO, SIN_ID
+
+CSS_TABLAS = """
+<style>
+.black-border-table, .black-border-table th, .black-border-table td {
+    border: 2px solid black !important;
+    border-collapse: collapse !important;
+    padding: 4px 8px !important;
+    text-align: left !important;
+}
+</style>
+"""
+COLOR_SIN_ID = "#ffcccc"  # rojo claro
+COLOR_CON_ID = "#ccffcc"  # verde claro
+COLOR_NO_VERIFICADO = "#fff2cc"  # amarillo claro
+
+
+# Helper function to convert DataFrame to HTML table with black borders
+def df_to_html_table(df):
+    if df.empty:
+        return ""
+    return df.to_html(index=False, border=1, classes="black-border-table", escape=False)
+
+
+def tabla_archivos(metadatos):
+    df_file_tables = metadatos[['file_name', 'table_name']].groupby('file_name').agg({'table_name': 'nunique'}).reset_index().rename(columns={'table_name': 'Nro_tablas'})
+    return df_to_html_table(df_file_tables)
+
+
+def tabla_atributos(diccionario):
+    df_file_table_attrs = diccionario.groupby(['file_name', 'table_name']).agg({'Atributo': 'count'}).reset_index().rename(columns={'Atributo': 'Nro_atributos'})
+    return df_to_html_table(df_file_table_attrs)
+
+
+def tabla_ids(metadatos):
+    # HTML armado directamente: el color de ID_identificador sale de una comparación vectorizada, sin Styler
+    df_id = metadatos[['file_name', 'table_name', 'Columna_ID']].astype("string").fillna("")
+    colores = df_id['Columna_ID'].map({SIN_ID: COLOR_SIN_ID, NO_VERIFICADO: COLOR_NO_VERIFICADO}).fillna(COLOR_CON_ID)
+    borde = 'style="border:2px solid black;"'
+    filas = [
+        f'<tr><td {borde}>{escape(f)}</td><td {borde}>{escape(t)}</td>'
+        f'<td style="background-color: {c}; border:2px solid black;">{escape(i)}</td></tr>'
+        for f, t, i, c in zip(df_id['file_name'], df_id['table_name'], df_id['Columna_ID'], colores)
+    ]
+    encabezado = "".join(f"<th {borde}>{col}</th>" for col in ['file_name', 'table_name', 'ID_identificador'])
+    return (
+        '<table style="border:2px solid black;border-collapse:collapse;" class="black-border-table">'
+        f"<thead><tr>{encabezado}</tr></thead><tbody>{''.join(filas)}</tbody></table>"
+    )
+
+
+def tabla_roles(metadatos):
+    df_roles = metadatos[['file_name', 'table_name', 'data_owner_area', 'data_steward_operativo_contact', 'data_steward_ejecutivo_contact']]
+    return df_to_html_table(df_roles)
+
+
+def tabla_renombres(diccionario):
+    df_renames = diccionario[diccionario['column_rename_suggestion'].notnull() & (diccionario['column_rename_suggestion'] != '')]
+    if df_renames.empty:
+        return '<p>No hay propuestas de renombre.</p>'
+    return df_to_html_table(
+        df_renames[['file_name', 'table_name', 'Atributo', 'column_rename_suggestion']]
+        .rename(columns={'Atributo': 'Atributo_original', 'column_rename_suggestion': 'Nuevo_nombre_propuesto'})
+    )
+
+
+def tabla_relaciones(relaciones):
+    if relaciones.empty:
+        return '<p>No se encontraron relaciones entre las tablas.</p>'
+    return df_to_html_table(
+        relaciones[['tabla_origen', 'columna_origen', 'tabla_destino', 'columna_destino', 'inclusion', 'confianza']]
+    )
+
+
+def informe_markdown(fecha_generacion, num_tablas, num_atributos, tabla1_html, tabla2_html, tabla3_html, tabla4_html, tabla5_html,
+                     tabla6_html=""):
+    return f"""
+---
+# <b>INFORME DE RESULTADOS</b>
+
+Procesamiento Automático de Metadatos y Descripciones de Tablas
+
+<b>Fecha de generación: {fecha_generacion}</b>
+
+---
+
+### I. Resumen ejecutivo
+
+Durante el proceso se analizaron <b>{num_tablas}</b> tablas que contienen <b>{num_atributos}</b> atributos. Se generaron descripciones automáticas, se verificó la presencia de identificadores de registro, se asignaron/validaron responsables de gobierno de datos y se propusieron nombres para los atributos que carecían de denominación.
+
+---
+
+### II. Resultados detallados
+
+1. <b>Descripciones generadas</b>
+
+{tabla1_html}
+
+{tabla2_html}
+
+2. <b>Identificación de IDs de registro</b>
+
+{tabla3_html}
+
+3. <b>Asignación de roles de Gobierno de Datos</b>
+
+{tabla4_html}
+
+4. <b>Propuestas de nomenclatura para atributos sin nombre</b>
+
+{tabla5_html}
+
+5. <b>Relaciones entre tablas (posibles claves foráneas)</b>
+
+{tabla6_html}
+
+---
+
+### III. Recomendaciones inmediatas
+
+1. <b>Validar descripciones</b>: Revisar y aprobar las descripciones generadas para asegurar precisión semántica y alineación con el glosario corporativo.
+2. <b>Crear/normalizar IDs</b>: Asignar identificadores únicos a las tablas que carecen de ellos para garantizar trazabilidad.
+3. <b>Confirmar responsables</b>: Verificar la asignación de Data Stewards y Data Owners para cada tabla y actualizar en caso de cambios organizacionales.
+4. <b>Revisar nombres propuestos</b>: Aceptar o ajustar las sugerencias de nombre de atributos, asegurando consistencia con los estándares de nomenclatura. Verificar si no existen procesos automatizados que impidan el cambio del nombre del atributo.
+5. <b>Confirmar relaciones</b>: Validar las claves foráneas propuestas, en especial las de confianza media (sin coincidencia de nombres), antes de registrarlas en el catálogo.
+
+---
+
+### IV. Próximos pasos
+
+<table class="black-border-table">
+<thead>
+<tr>
+<th>Fase</th>
+<th>Acción</th>
+<th>Responsable</th>
+<th>Fecha objetivo</th>
+</tr>
+</thead>
+<tbody>
+<tr>
+<td>1</td>
+<td>Validación de descripciones y nombres propuestos</td>
+<td></td>
+<td></td>
+</tr>
+<tr>
+<td>2</td>
+<td>Actualización de metadatos en el Catálogo de datos</td>
+<td></td>
+<td></td>
+</tr>
+</tbody>
+</table>
+
+---
+
+### V. Anexos
+
+<ul>
+<li><b>A1. Metadatos y Diccionario de datos</b></li>
+<li><b>A2. Datos técnicos de automatización</b>
+    <ol>
+        <li><b>Fuente de los datos</b>:</li>
+        <li><b>Versión del modelo de IA utilizada</b>: ChatGPT-4.1-mini</li>
+        <li><b>Versión de la App</b>: v2.0</li>
+    </ol>
+</li>
+</ul>
+---
+"""
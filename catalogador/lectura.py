@@ -0,0 +1,84 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+from catalogador.normalizacion import DTYPE_TEXTO
+from catalogador.planos import es_plano, leer_plano, nombre_tabla
+from catalogador.streaming import perfilar_filas
+
+# calamine (Rust) es bastante más rápido que openpyxl y también lee .xls/.xlsb/.ods
+HAY_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+# Hojas generadas por el propio catalogador, que no se vuelven a catalogar
+HOJAS_EXCLUIDAS = ["METADATOS", "DICCIONARIO"]
+
+
+def nombre_archivo(archivo):
+    # Acepta archivos subidos en Streamlit (UploadedFile) o rutas en disco
+    return os.path.basename(getattr(archivo, "name", None) or str(archivo))
+
+
+def motor_excel(file_name):
+    if HAY_CALAMINE:
+        return "calamine"
+    extension = file_name.split('.')[-1].lower()
+    # pandas abre openpyxl en modo read_only / data_only
+    return "openpyxl" if extension in ("xlsx", "xlsm") else None
+
+
+def abrir_libro(uploaded_file):
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    return pd.ExcelFile(uploaded_file, engine=motor_excel(nombre_archivo(uploaded_file)))
+
+
+def nombres_hojas(uploaded_file):
+    # CSV/TXT/Parquet: una sola "hoja" con el nombre del archivo
+    if es_plano(nombre_archivo(uploaded_file)):
+        return [nombre_tabla(nombre_archivo(uploaded_file))]
+    with abrir_libro(uploaded_file) as xls:
+        return xls.sheet_names
+
+
+def filas_hoja(xls, sheet_name):
+    # Número de filas declarado por la hoja (incluye el encabezado), sin leer las celdas
+    if xls.engine == "calamine":
+        return xls.book.get_sheet_by_name(sheet_name).height
+    if xls.engine == "openpyxl":
+        return xls.book[sheet_name].max_row
+    return None
+
+
+def cursor_filas(xls, sheet_name):
+    # Recorre las filas con el cursor de solo lectura del motor, una a la vez
+    if xls.engine == "calamine":
+        hoja = xls.book.get_sheet_by_name(sheet_name)
+        return hoja.iter_rows() if hasattr(hoja, "iter_rows") else iter(hoja.to_python())
+    if xls.engine == "openpyxl":
+        return xls.book[sheet_name].iter_rows(values_only=True)
+    raise ValueError(f"El motor '{xls.engine}' no permite leer la hoja por cursor")
+
+
+def iterar_hojas(uploaded_file, hojas, dtype=DTYPE_TEXTO, umbral_streaming=None):
+    """Abre el libro una sola vez y entrega (nombre_hoja, df, perfil) por hoja pedida.
+
+    Si `hojas` es None se leen todas menos las de HOJAS_EXCLUIDAS. Las hojas con más de `umbral_streaming` filas no se cargan en un DataFrame:
+    se recorren con un cursor y se entrega un PerfilIncremental (df es None).
+    Los archivos planos (CSV/TXT/Parquet) entregan una sola tabla.
+    """
+    file_name = nombre_archivo(uploaded_file)
+    if es_plano(file_name):
+        tabla = nombre_tabla(file_name)
+        if hojas is None or tabla in hojas:
+            df, perfil = leer_plano(uploaded_file, file_name, umbral_streaming)
+            yield tabla, df, perfil
+        return
+    with abrir_libro(uploaded_file) as xls:
+        if hojas is None:
+            hojas = [s for s in xls.sheet_names if s.upper() not in HOJAS_EXCLUIDAS]
+        for sheet_name in hojas:
+            if umbral_streaming and (filas_hoja(xls, sheet_name) or 0) > umbral_streaming:
+                yield sheet_name, None, perfilar_filas(cursor_filas(xls, sheet_name))
+            else:
+                yield sheet_name, xls.parse(sheet_name, dtype=dtype), None
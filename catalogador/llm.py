@@ -0,0 +1,414 @@
+import functools
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httpx
+import openai
+import pydantic
+from openai import OpenAI
+
+from catalogador.cache import clave_cache
+from catalogador.modelos import TableMetadata
+from catalogador.prompt import (
+    TOKENS_POR_SOLICITUD, TOKENS_POR_TABLA, construir_lotes, contar_tokens, fusionar_respuestas,
+)
+
+MODELO = "gpt-4o-mini"
+# Cambiar al modificar prompt.construir_mensajes: invalida las respuestas cacheadas
+VERSION_PROMPT = "3"
+# Fallas del servicio: son las únicas que cuentan para abrir el circuito
+ERRORES_SERVICIO = (
+    openai.APIConnectionError,  # incluye APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+# Errores que suelen resolverse solos: se reintentan con espera exponencial y jitter
+ERRORES_TRANSITORIOS = ERRORES_SERVICIO + (
+    pydantic.ValidationError,  # respuesta que no cumple TableMetadata
+)
+REINTENTOS = 4
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 30.0
+
+
+# --- Cliente compartido con pool de conexiones HTTP ---
+def crear_cliente(api_key, max_conexiones=8, timeout=60.0):
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_conexiones, max_keepalive_connections=max_conexiones),
+        timeout=timeout,
+    )
+    # Sin reintentos del SDK: los hace describir_parte, con jitter y circuito compartido
+    return OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def estimar_tokens(mensajes, modelo=MODELO):
+    # Conteo local (tiktoken si está instalado) para reservar fichas en el limitador de tasa
+    return sum(contar_tokens(m["content"], modelo) for m in mensajes)
+
+
+class LimitadorTasa:
+    """Cubetas de fichas para solicitudes y tokens por minuto, compartidas entre hilos."""
+
+    def __init__(self, solicitudes_por_minuto=None, tokens_por_minuto=None):
+        self.rpm = solicitudes_por_minuto
+        self.tpm = tokens_por_minuto
+        self._solicitudes = float(solicitudes_por_minuto or 0)
+        self._tokens = float(tokens_por_minuto or 0)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        transcurrido = ahora - self._ultimo
+        self._ultimo = ahora
+        if self.rpm:
+            self._solicitudes = min(self.rpm, self._solicitudes + transcurrido * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + transcurrido * self.tpm / 60)
+
+    def adquirir(self, tokens=0):
+        # Una solicitud más grande que la cubeta completa se limita al tamaño de la cubeta
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._recargar()
+                espera = 0.0
+                if self.rpm and self._solicitudes < 1:
+                    espera = max(espera, (1 - self._solicitudes) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    espera = max(espera, (tokens - self._tokens) * 60 / self.tpm)
+                if espera == 0.0:
+                    if self.rpm:
+                        self._solicitudes -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+            time.sleep(espera)
+
+    def ajustar(self, diferencia_tokens):
+        # Corrige la reserva estimada con el uso real reportado por la API
+        if self.tpm and diferencia_tokens:
+            with self._lock:
+                self._recargar()
+                self._tokens -= diferencia_tokens
+
+
+class CircuitoAbierto(RuntimeError):
+    pass
+
+
+class Circuito:
+    """Corta las llamadas al modelo tras `umbral` fallas seguidas del servicio, compartido entre hilos.
+
+    Pasado el `enfriamiento` deja pasar una llamada de prueba: si responde, el
+    circuito se cierra; si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, umbral=5, enfriamiento=60.0):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self._fallos = 0
+        self._abierto_hasta = None
+        self._lock = threading.Lock()
+
+    @property
+    def abierto(self):
+        return self._abierto_hasta is not None
+
+    def verificar(self):
+        with self._lock:
+            if self._abierto_hasta is None:
+                return
+            ahora = time.monotonic()
+            if ahora < self._abierto_hasta:
+                raise CircuitoAbierto(f"{self._fallos} fallos seguidos del modelo; se reintentará más tarde")
+            # Llamada de prueba: las demás siguen bloqueadas mientras se resuelve
+            self._abierto_hasta = ahora + self.enfriamiento
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_hasta = None
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos >= self.umbral:
+                self._abierto_hasta = time.monotonic() + self.enfriamiento
+
+
+def _espera(intento, error=None):
+    # Backoff exponencial con jitter completo; se respeta Retry-After si la API lo envía
+    espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento))
+    respuesta = getattr(error, "response", None)
+    if respuesta is not None:
+        try:
+            espera = max(espera, float(respuesta.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return min(espera, ESPERA_MAXIMA)
+
+
+def describir_parte(client, mensajes, modelo=MODELO, limitador=None, metricas=None, table_id=None,
+                    circuito=None, reintentos=REINTENTOS):
+    estimados = estimar_tokens(mensajes, modelo)
+    for intento in range(reintentos + 1):
+        if circuito is not None:
+            circuito.verificar()
+        if limitador is not None:
+            limitador.adquirir(estimados)
+        # La latencia se mide después del limitador: no incluye la espera por tasa
+        inicio = time.perf_counter()
+        try:
+            response = client.responses.parse(
+                model=modelo,
+                input=mensajes,
+                text_format=TableMetadata,
+            )
+            dict_ia = response.output_parsed.dict()
+        except Exception as e:
+            if metricas is not None:
+                metricas.registrar_llamada(table_id, time.perf_counter() - inicio, error=repr(e), intento=intento + 1)
+            # Solo las fallas del servicio abren el circuito: una hoja con una solicitud o respuesta inválida no corta las demás
+            if circuito is not None and isinstance(e, ERRORES_SERVICIO):
+                circuito.registrar_fallo()
+            if not isinstance(e, ERRORES_TRANSITORIOS) or intento == reintentos:
+                raise
+            time.sleep(_espera(intento, e))
+            continue
+        usage = getattr(response, "usage", None)
+        if metricas is not None:
+            metricas.registrar_llamada(table_id, time.perf_counter() - inicio, usage, intento=intento + 1)
+        if circuito is not None:
+            circuito.registrar_exito()
+        if limitador is not None and usage is not None:
+            limitador.ajustar(usage.total_tokens - estimados)
+        return dict_ia
+
+
+def describir_tabla(client, muestra_tabla, user_context, modelo=MODELO, limitador=None,
+                    tokens_por_solicitud=TOKENS_POR_SOLICITUD, tokens_por_tabla=TOKENS_POR_TABLA, metricas=None):
+    # Versión secuencial: las partes de una tabla ancha se describen una tras otra
+    lotes, recorte = construir_lotes(muestra_tabla, user_context, tokens_por_solicitud, tokens_por_tabla, modelo=modelo)
+    if recorte and metricas is not None:
+        metricas.registrar_recorte(None, recorte)
+    respuestas = [describir_parte(client, mensajes, modelo, limitador, metricas) for mensajes in lotes]
+    return fusionar_respuestas(respuestas, list(muestra_tabla))
+
+
+def _unir_partes(partes, columnas, cache=None, clave=None, conocidas=(), indice=None, muestra_nueva=None):
+    """Future que se completa cuando terminan todas las partes, sin ocupar un hilo esperando.
+
+    Las columnas `conocidas` (descripciones reutilizadas) tienen prioridad sobre
+    lo que responda el modelo; las nuevas se agregan al `indice`.
+    """
+    unido = Future()
+    restantes = [len(partes)]
+    lock = threading.Lock()
+
+    def parte_terminada(_):
+        with lock:
+            restantes[0] -= 1
+            if restantes[0]:
+                return
+        try:
+            respuestas = [p.result() for p in partes]
+            if indice is not None:
+                for respuesta in respuestas:
+                    indice.agregar_respuesta(muestra_nueva, respuesta)
+            dict_ia = fusionar_respuestas([{"columns": list(conocidas)}] + respuestas, columnas)
+            if cache is not None:
+                cache.guardar(clave, dict_ia)
+            unido.set_result(dict_ia)
+        except Exception as e:
+            unido.set_exception(e)
+
+    for parte in partes:
+        parte.add_done_callback(parte_terminada)
+    return unido
+
+
+def derivar_respuesta(valor, columnas):
+    """Respuesta de otra tabla (Future o dict_ia) alineada con `columnas`, sin bloquear."""
+    if isinstance(valor, Future):
+        return _unir_partes([valor], columnas)
+    return fusionar_respuestas([valor], columnas)
+
+
+def enviar_tablas(executor, client, muestras, user_context, modelo=MODELO, limitador=None, cache=None,
+                  tokens_por_solicitud=TOKENS_POR_SOLICITUD, tokens_por_tabla=TOKENS_POR_TABLA, metricas=None,
+                  circuito=None, reintentos=REINTENTOS, indice=None):
+    """Encola la descripción de cada muestra en `executor` sin esperar los resultados.
+
+    Las tablas anchas se parten en grupos de columnas que se encolan como
+    solicitudes independientes. Con un `indice` (reutilizacion.IndiceColumnas)
+    las columnas ya catalogadas toman la descripción previa y solo las nuevas
+    llegan al modelo. Devuelve {table_id: Future}, o directamente el dict_ia
+    si estaba en `cache`.
+    """
+    pendientes = {}
+    for table_id, muestra in muestras.items():
+        clave = None
+        if cache is not None:
+            clave = clave_cache(muestra, user_context, modelo, VERSION_PROMPT)
+            cacheado = cache.obtener(clave)
+            if metricas is not None:
+                metricas.registrar_cache(cacheado is not None)
+            if cacheado is not None:
+                pendientes[table_id] = cacheado
+                continue
+        conocidas = indice.buscar_columnas(muestra) if indice is not None else {}
+        if metricas is not None and indice is not None:
+            metricas.registrar_reutilizacion(len(conocidas), len(muestra))
+        muestra_nueva = {col: valores for col, valores in muestra.items() if col not in conocidas}
+        lotes, recorte = construir_lotes(
+            muestra_nueva, user_context, tokens_por_solicitud, tokens_por_tabla, modelo=modelo,
+            columnas_conocidas=list(conocidas),
+        )
+        # Se respeta tokens_por_tabla a costa de la muestra; la respuesta recortada no se guarda en cache
+        if recorte and metricas is not None:
+            metricas.registrar_recorte(table_id, recorte)
+        if not lotes:
+            pendientes[table_id] = fusionar_respuestas([{"columns": list(conocidas.values())}], list(muestra))
+            continue
+        partes = [
+            executor.submit(describir_parte, client, mensajes, modelo, limitador, metricas, table_id, circuito, reintentos)
+            for mensajes in lotes
+        ]
+        pendientes[table_id] = _unir_partes(
+            partes, list(muestra), None if recorte else cache, clave, list(conocidas.values()), indice, muestra_nueva,
+        )
+    return pendientes
+
+
+def resolver(pendientes):
+    return {
+        table_id: valor.result() if isinstance(valor, Future) else valor
+        for table_id, valor in pendientes.items()
+    }
+
+
+def resolver_parcial(pendientes):
+    """Como resolver, pero una tabla que falla no aborta las demás: devuelve (respuestas, {table_id: error})."""
+    respuestas, fallidas = {}, {}
+    for table_id, valor in pendientes.items():
+        if not isinstance(valor, Future):
+            respuestas[table_id] = valor
+            continue
+        try:
+            respuestas[table_id] = valor.result()
+        except Exception as e:
+            fallidas[table_id] = repr(e)
+    return respuestas, fallidas
+
+
+def catalogar_tablas(client, muestras, user_context, modelo=MODELO, max_en_vuelo=4,
+                     solicitudes_por_minuto=None, tokens_por_minuto=None, cache=None,
+                     tokens_por_solicitud=TOKENS_POR_SOLICITUD, tokens_por_tabla=TOKENS_POR_TABLA, metricas=None,
+                     circuito=None, reintentos=REINTENTOS, indice=None):
+    """Describe varias tablas en paralelo.
+
+    `muestras` es un dict {table_id: muestra_tabla}; el resultado es
+    (respuestas, fallidas): {table_id: dict_ia} en el mismo orden de
+    `muestras`, sin importar el orden en que terminen las llamadas, y
+    {table_id: error} de las tablas que fallaron tras los reintentos. Si se
+    pasa un `cache`, solo las muestras sin respuesta cacheada llegan al modelo.
+    """
+    limitador = LimitadorTasa(solicitudes_por_minuto, tokens_por_minuto)
+    with ThreadPoolExecutor(max_workers=max(1, max_en_vuelo)) as executor:
+        return resolver_parcial(enviar_tablas(
+            executor, client, muestras, user_context, modelo, limitador, cache, tokens_por_solicitud, tokens_por_tabla,
+            metricas, circuito or Circuito(), reintentos, indice,
+        ))
+
+
+class CatalogacionEnCurso:
+    """Describe tablas en segundo plano; `recoger` entrega las que terminaron desde la última llamada.
+
+    Recibe los mismos parámetros que catalogar_tablas, pero no bloquea: las
+    respuestas del cache se entregan de inmediato y las del modelo a medida
+    que llegan, en el orden en que terminan. Con `abierta=True` se pueden
+    sumar tablas con `agregar` (p. ej. a medida que se leen los archivos)
+    hasta llamar a `cerrar`.
+    """
+
+    def __init__(self, client, muestras, user_context, modelo=MODELO, max_en_vuelo=4,
+                 solicitudes_por_minuto=None, tokens_por_minuto=None, cache=None,
+                 tokens_por_solicitud=TOKENS_POR_SOLICITUD, tokens_por_tabla=TOKENS_POR_TABLA, metricas=None,
+                 circuito=None, reintentos=REINTENTOS, indice=None, abierta=False):
+        self.total = 0
+        self.hechas = 0
+        self.fallidas = {}
+        self.metricas = metricas
+        self.cerrada = False
+        self._terminadas = []
+        self._lock = threading.Lock()
+        self._inicio = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_en_vuelo))
+        # Limitador y circuito compartidos por todas las tablas, también las agregadas después
+        self._envio = (
+            client, user_context, modelo, LimitadorTasa(solicitudes_por_minuto, tokens_por_minuto), cache,
+            tokens_por_solicitud, tokens_por_tabla, metricas, circuito or Circuito(), reintentos, indice,
+        )
+        self.agregar(muestras)
+        if not abierta:
+            self.cerrar()
+
+    def agregar(self, muestras):
+        client, user_context, modelo, *opciones = self._envio
+        with self._lock:
+            self.total += len(muestras)
+        pendientes = enviar_tablas(self._executor, client, muestras, user_context, modelo, *opciones)
+        for table_id, valor in pendientes.items():
+            if isinstance(valor, Future):
+                valor.add_done_callback(functools.partial(self._terminar, table_id))
+            else:
+                self._agregar(table_id, valor, None)
+
+    def cerrar(self):
+        # Las llamadas ya encoladas siguen corriendo; los hilos se liberan al terminar la última
+        self.cerrada = True
+        self._executor.shutdown(wait=False)
+
+    def _terminar(self, table_id, futuro):
+        if futuro.exception() is not None:
+            self._agregar(table_id, None, repr(futuro.exception()))
+        else:
+            self._agregar(table_id, futuro.result(), None)
+
+    def _agregar(self, table_id, dict_ia, error):
+        with self._lock:
+            self._terminadas.append((table_id, dict_ia, error))
+            self.hechas += 1
+            if error is not None:
+                self.fallidas[table_id] = error
+            if self.metricas is not None:
+                if error is not None:
+                    self.metricas.registrar_fallida(table_id, error)
+                else:
+                    self.metricas.descartar_pendiente(table_id)
+                segundos = time.perf_counter() - self._inicio
+                self.metricas.etapas.setdefault("primera_tabla_ia", segundos)
+                self.metricas.etapas["ia"] = segundos
+
+    @property
+    def terminada(self):
+        return self.cerrada and self.hechas >= self.total
+
+    @property
+    def hay_nuevas(self):
+        return bool(self._terminadas)
+
+    def recoger(self):
+        """Lista de (table_id, dict_ia, error) terminadas desde la última llamada; dict_ia es None si falló."""
+        with self._lock:
+            terminadas, self._terminadas = self._terminadas, []
+        return terminadas
+
+    def cancelar(self):
+        # Las llamadas que aún no empezaron se descartan; las tablas quedan como fallidas
+        self.cerrada = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,155 @@
+"""Instrumentación de una corrida: tiempos por etapa y por hoja, latencia y
+tokens de cada llamada al modelo, costo estimado y aciertos de cache.
+
+Los tiempos por hoja viajan dentro de cada tabla (clave "tiempos"), de modo
+que sobreviven al pool de procesos de la CLI y al cache de Streamlit; las
+llamadas al modelo se registran en un objeto Metricas compartido entre hilos.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# USD por millón de tokens (entrada, salida); se puede sobreescribir al crear Metricas
+PRECIOS_POR_MILLON = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o": (2.50, 10.00),
+}
+ETAPAS_HOJA = ["lectura", "normalizacion", "huellas", "claves", "perfil", "privacidad", "relaciones", "muestra"]
+
+
+@contextmanager
+def cronometro(tiempos, etapa):
+    # Acumula en tiempos[etapa] los segundos del bloque; con tiempos=None no registra nada
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if tiempos is not None:
+            tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+class Metricas:
+    def __init__(self, modelo=None, precios=None):
+        self.modelo = modelo
+        self.precios = precios or PRECIOS_POR_MILLON.get(modelo, (0.0, 0.0))
+        self.etapas = {}
+        self.hojas = []
+        self.llamadas = []
+        self.cache = {"aciertos": 0, "fallos": 0}
+        self.columnas = {"reutilizadas": 0, "enviadas": 0}
+        self.tablas_pendientes = {}
+        self.tablas_duplicadas = 0
+        self.tablas_recortadas = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa):
+        with cronometro(self.etapas, etapa):
+            yield
+
+    def agregar_hojas(self, tablas):
+        for t in tablas:
+            self.hojas.append({
+                "file_name": t["file_name"],
+                "sheet_name": t["sheet_name"],
+                "table_id": t.get("table_id", ""),
+                **{etapa: round(t.get("tiempos", {}).get(etapa, 0.0), 4) for etapa in ETAPAS_HOJA},
+            })
+
+    def registrar_duplicadas(self, cantidad):
+        # Hojas que no van al modelo por ser copia de otra de la misma carga
+        with self._lock:
+            self.tablas_duplicadas += cantidad
+
+    def registrar_recorte(self, table_id, detalle):
+        # Tabla cuya muestra no cabía en tokens_por_tabla: se envió recortada (ver prompt.construir_lotes)
+        with self._lock:
+            self.tablas_recortadas[table_id] = detalle
+
+    def registrar_cache(self, acierto):
+        with self._lock:
+            self.cache["aciertos" if acierto else "fallos"] += 1
+
+    def registrar_reutilizacion(self, reutilizadas, total):
+        # Columnas con descripción tomada del índice frente a las que van al modelo
+        with self._lock:
+            self.columnas["reutilizadas"] += reutilizadas
+            self.columnas["enviadas"] += total - reutilizadas
+
+    def registrar_llamada(self, table_id, segundos, usage=None, error=None, intento=1):
+        llamada = {
+            "table_id": table_id,
+            "intento": intento,
+            "segundos": round(segundos, 4),
+            "tokens_entrada": getattr(usage, "input_tokens", 0) or 0,
+            "tokens_salida": getattr(usage, "output_tokens", 0) or 0,
+            "error": error,
+        }
+        with self._lock:
+            self.llamadas.append(llamada)
+
+    def registrar_fallida(self, table_id, error):
+        # Tabla sin descripción tras agotar los reintentos: queda pendiente para otra ejecución
+        with self._lock:
+            self.tablas_pendientes[table_id] = error
+
+    def descartar_pendiente(self, table_id):
+        # La tabla se describió en un reintento posterior
+        with self._lock:
+            self.tablas_pendientes.pop(table_id, None)
+
+    def resumen(self):
+        with self._lock:
+            llamadas = list(self.llamadas)
+        latencias = [c["segundos"] for c in llamadas]
+        tokens_entrada = sum(c["tokens_entrada"] for c in llamadas)
+        tokens_salida = sum(c["tokens_salida"] for c in llamadas)
+        precio_entrada, precio_salida = self.precios
+        return {
+            "modelo": self.modelo,
+            "hojas": len(self.hojas),
+            "segundos_por_etapa": {
+                **{etapa: round(sum(h[etapa] for h in self.hojas), 3) for etapa in ETAPAS_HOJA},
+                **{etapa: round(s, 3) for etapa, s in list(self.etapas.items())},
+            },
+            "llamadas_ia": len(llamadas),
+            "llamadas_fallidas": sum(1 for c in llamadas if c["error"]),
+            "reintentos": sum(1 for c in llamadas if c["intento"] > 1),
+            "tablas_pendientes": len(self.tablas_pendientes),
+            "tablas_duplicadas": self.tablas_duplicadas,
+            "tablas_recortadas": len(self.tablas_recortadas),
+            "latencia_p50": round(_percentil(latencias, 50), 3),
+            "latencia_p95": round(_percentil(latencias, 95), 3),
+            "tokens_entrada": tokens_entrada,
+            "tokens_salida": tokens_salida,
+            "costo_estimado_usd": round((tokens_entrada * precio_entrada + tokens_salida * precio_salida) / 1e6, 6),
+            "cache_aciertos": self.cache["aciertos"],
+            "cache_fallos": self.cache["fallos"],
+            "columnas_reutilizadas": self.columnas["reutilizadas"],
+            "columnas_enviadas": self.columnas["enviadas"],
+        }
+
+    def a_dict(self):
+        # Solo tipos básicos: se puede cachear con st.cache_data y escribir como JSON
+        with self._lock:
+            pendientes = dict(self.tablas_pendientes)
+            recortadas = dict(self.tablas_recortadas)
+        return {
+            "resumen": self.resumen(),
+            "hojas": list(self.hojas),
+            "llamadas": list(self.llamadas),
+            "tablas_pendientes": [{"table_id": t, "error": e} for t, e in pendientes.items()],
+            "tablas_recortadas": [{"table_id": t, "recorte": r} for t, r in recortadas.items()],
+        }
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), ensure_ascii=False, indent=2)
@@ -0,0 +1,20 @@
+from typing import List
+from enum import Enum
+from pydantic import BaseModel
+
+
+class tipo_dato(str, Enum):
+    texto, numero, fecha = "texto", "numero", "fecha"
+
+class Column(BaseModel):
+    name: str  # Nombre de la columna
+    description: str  # Breve descripción del significado de la columna
+    # El tipo de dato ya no se pide al modelo: lo calcula perfil.perfilar_columnas
+    new_name: str | None = None  # Nuevo nombre sugerido en Pascal_Snake_Case y en base al contenido de la columna, o None si no hay recomendación
+    reason: str | None = None  # Razón de la sugerencia del new_name, si aplica
+
+class TableMetadata(BaseModel):
+    table_description: str  # Descripción general de la tabla (máx 500 caracteres)
+    columns: List[Column]
+
+TableMetadata.model_rebuild()  # This is required to enable recursive types
@@ -0,0 +1,136 @@
+"""Estrategias para elegir las filas de muestra que se envían al modelo.
+
+Cada estrategia recibe un DataFrame de candidatas y devuelve las posiciones
+de a lo sumo `n` filas:
+
+- "aleatoria": filas al azar con semilla fija, como el df.sample original.
+- "cobertura": pocas filas que cubran el máximo de columnas no nulas
+  (hasta `OBJETIVO_VALORES` valores por columna).
+- "estratificada": una fila por valor de la columna de baja cardinalidad
+  más completa; el resto, por cobertura.
+- "distintos": maximiza los valores distintos vistos por columna.
+
+Las codiciosas se detienen antes de `n` filas si ninguna fila agrega
+información, de modo que hojas dispersas o repetitivas generan prompts más
+cortos.
+"""
+import numpy as np
+import pandas as pd
+
+ESTRATEGIA_POR_DEFECTO = "cobertura"
+# Valores no nulos por columna que se busca mostrar al modelo
+OBJETIVO_VALORES = 3
+# Hojas grandes: las estrategias trabajan sobre un subconjunto aleatorio de filas
+MAX_CANDIDATAS = 5000
+
+
+def _mascara(df):
+    return df.notna().to_numpy(dtype=bool)
+
+
+def _codicioso(ganancia, n, elegidas=()):
+    # `ganancia(elegidas)` devuelve la ganancia de cada candidata dado lo ya elegido
+    elegidas = list(elegidas)
+    while len(elegidas) < n:
+        g = ganancia(elegidas).astype(float)
+        if elegidas:
+            g[elegidas] = -1
+        mejor = int(np.argmax(g))
+        if g[mejor] <= 0:
+            break
+        elegidas.append(mejor)
+    return elegidas
+
+
+def aleatoria(df, n, semilla=1):
+    rng = np.random.default_rng(semilla)
+    return sorted(rng.choice(len(df), size=min(n, len(df)), replace=False).tolist())
+
+
+def cobertura(df, n, semilla=1, elegidas=()):
+    mascara = _mascara(df)
+    objetivo = np.minimum(mascara.sum(axis=0), min(OBJETIVO_VALORES, n))
+    # Desempate estable por cantidad de celdas no nulas de la fila
+    desempate = mascara.sum(axis=1) / (mascara.shape[1] + 1)
+
+    peso = mascara.shape[1] + 1
+
+    def ganancia(actuales):
+        vistos = mascara[actuales].sum(axis=0)
+        faltan = objetivo - vistos > 0
+        # Primero cubrir columnas aún sin ningún valor; luego completar hasta el objetivo
+        sin_valor = faltan & (vistos == 0)
+        ganancia_base = peso * (mascara @ sin_valor) + (mascara @ faltan)
+        return ganancia_base + desempate * (ganancia_base > 0)
+
+    return _codicioso(ganancia, n, elegidas)
+
+
+def estratificada(df, n, semilla=1):
+    distintos = df.nunique(dropna=True)
+    candidatas = distintos[(distintos >= 2) & (distintos <= n)]
+    if candidatas.empty:
+        return cobertura(df, n, semilla)
+    # La columna de baja cardinalidad con menos nulos define los estratos
+    estrato = df[df[candidatas.index].notna().sum().idxmax()]
+    rng = np.random.default_rng(semilla)
+    elegidas = []
+    for valor in estrato.value_counts().index:
+        posiciones = np.flatnonzero((estrato == valor).to_numpy(dtype=bool, na_value=False))
+        # Dentro del estrato, la fila más completa
+        completas = _mascara(df.iloc[posiciones]).sum(axis=1)
+        mejores = posiciones[completas == completas.max()]
+        elegidas.append(int(rng.choice(mejores)))
+    return cobertura(df, n, semilla, elegidas=elegidas)
+
+
+def distintos(df, n, semilla=1):
+    codigos = [pd.factorize(df.iloc[:, j])[0] for j in range(df.shape[1])]
+
+    def ganancia(actuales):
+        g = np.zeros(len(df))
+        for c in codigos:
+            # La última posición corresponde al código -1 (nulo) y cuenta como ya vista
+            visto = np.zeros(c.max(initial=-1) + 2, dtype=bool)
+            visto[-1] = True
+            visto[c[actuales]] = True
+            g += ~visto[c]
+        return g
+
+    return _codicioso(ganancia, n)
+
+
+ESTRATEGIAS = {
+    "aleatoria": aleatoria,
+    "cobertura": cobertura,
+    "estratificada": estratificada,
+    "distintos": distintos,
+}
+
+
+def candidatas(df, semilla=1, max_candidatas=MAX_CANDIDATAS):
+    """Subconjunto aleatorio de filas, completado con la primera fila no nula de cada columna ausente."""
+    if len(df) <= max_candidatas:
+        return df
+    posiciones = set(np.random.default_rng(semilla).choice(len(df), size=max_candidatas, replace=False).tolist())
+    muestra = df.iloc[sorted(posiciones)]
+    # Columnas muy dispersas: sin esto, la muestra aleatoria podría no verlas nunca
+    for j in np.flatnonzero(~muestra.notna().any().to_numpy()):
+        no_nulas = np.flatnonzero(df.iloc[:, j].notna().to_numpy(dtype=bool))
+        if len(no_nulas):
+            posiciones.add(int(no_nulas[0]))
+    return df.iloc[sorted(posiciones)]
+
+
+def seleccionar_filas(df, n=10, semilla=1, estrategia=ESTRATEGIA_POR_DEFECTO):
+    """Devuelve el sub-DataFrame de muestra según `estrategia`."""
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia de muestreo desconocida: {estrategia}")
+    if len(df) == 0:
+        return df
+    base = candidatas(df, semilla)
+    posiciones = ESTRATEGIAS[estrategia](base, min(n, len(base)), semilla)
+    if not posiciones:
+        # Hoja sin ningún valor: basta una fila para mostrar los encabezados
+        posiciones = [0]
+    return base.iloc[posiciones]
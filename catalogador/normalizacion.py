@@ -0,0 +1,29 @@
+import importlib.util
+
+import pandas as pd
+
+from catalogador.muestreo import ESTRATEGIA_POR_DEFECTO, seleccionar_filas
+
+# Columnas de texto respaldadas por Arrow: un búfer contiguo por columna en lugar de un objeto Python por celda
+DTYPE_TEXTO = "string[pyarrow]" if importlib.util.find_spec("pyarrow") is not None else "string"
+
+
+def normalizar_hoja(df):
+    """Deja cada columna como texto con nulos uniformes (<NA>) en una sola pasada.
+
+    Las hojas leídas con dtype=DTYPE_TEXTO ya cumplen esto y no se copian; las
+    columnas de otro tipo (p. ej. Timestamp) se convierten una por una.
+    """
+    pendientes = [col for col, dtype in df.dtypes.items() if dtype != DTYPE_TEXTO]
+    if not pendientes:
+        return df
+    return df.astype({col: DTYPE_TEXTO for col in pendientes}, copy=False)
+
+
+def muestra_json(df, n=10, semilla=1, estrategia=ESTRATEGIA_POR_DEFECTO):
+    # Solo las filas muestreadas se convierten a objetos Python (None en lugar de <NA>)
+    muestra = seleccionar_filas(df, n, semilla, estrategia)
+    return {
+        col: [None if pd.isna(v) else str(v) for v in muestra.iloc[:, i].tolist()]
+        for i, col in enumerate(muestra.columns)
+    }
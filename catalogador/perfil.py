@@ -0,0 +1,99 @@
+import pandas as pd
+
+from catalogador.modelos import tipo_dato
+
+# Formatos de fecha que se prueban, en orden. Las fechas nativas de Excel llegan como "%Y-%m-%d %H:%M:%S"
+FORMATOS_FECHA = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d-%m-%Y",
+    "%m/%d/%Y",
+    "%Y/%m/%d",
+    "%d.%m.%Y",
+]
+
+# Campos del perfil que se agregan a cada atributo del DICCIONARIO
+CAMPOS_PERFIL = {
+    "pct_nulos": "% Nulos",
+    "distintos": "Valores distintos",
+    "minimo": "Mínimo",
+    "maximo": "Máximo",
+    "formatos_fecha": "Formatos de fecha",
+    "longitud_max": "Longitud máxima",
+    "dato_personal": "Dato personal",
+}
+
+
+def _a_texto(valor):
+    # Mínimo y máximo se guardan como texto para que la columna tenga un solo tipo en el editor
+    if valor is None or pd.isna(valor):
+        return None
+    return str(valor.item() if hasattr(valor, "item") else valor)
+
+
+def _es_numerica(texto):
+    numeros = pd.to_numeric(texto, errors="coerce")
+    if numeros.isna().any():
+        return None
+    # Códigos con ceros a la izquierda (ubigeo, RUC, cuentas) se mantienen como texto
+    if texto.str.match(r"^-?0\d").any():
+        return None
+    return numeros
+
+
+def _formatos_fecha(texto):
+    # Formatos que cubren todos los valores; se descartan con una muestra antes de probar la columna completa
+    muestra = texto.head(200)
+    pendientes = texto
+    formatos, fechas = [], []
+    for formato in FORMATOS_FECHA:
+        if pd.to_datetime(muestra, format=formato, errors="coerce").isna().all():
+            continue
+        convertidas = pd.to_datetime(pendientes, format=formato, errors="coerce")
+        if convertidas.notna().any():
+            formatos.append(formato)
+            fechas.append(convertidas.dropna())
+            pendientes = pendientes[convertidas.isna()]
+        if pendientes.empty:
+            return formatos, pd.concat(fechas)
+    return [], None
+
+
+def perfilar_columna(serie):
+    total = len(serie)
+    texto = serie.dropna()
+    if not isinstance(texto.dtype, pd.StringDtype):
+        texto = texto.astype(str)
+    perfil = {
+        "tipo": tipo_dato.texto.value,
+        "pct_nulos": round(100 * (total - len(texto)) / total, 1) if total else 0.0,
+        "distintos": int(texto.nunique()),
+        "minimo": None,
+        "maximo": None,
+        "formatos_fecha": "",
+        "longitud_max": int(texto.str.len().max()) if len(texto) else 0,
+    }
+    if texto.empty:
+        return perfil
+    numeros = _es_numerica(texto)
+    if numeros is not None:
+        perfil.update(tipo=tipo_dato.numero.value, minimo=_a_texto(numeros.min()), maximo=_a_texto(numeros.max()))
+        return perfil
+    formatos, fechas = _formatos_fecha(texto)
+    if formatos:
+        perfil.update(
+            tipo=tipo_dato.fecha.value,
+            minimo=_a_texto(fechas.min()),
+            maximo=_a_texto(fechas.max()),
+            formatos_fecha=", ".join(formatos),
+        )
+        return perfil
+    perfil.update(minimo=texto.min(), maximo=texto.max())
+    return perfil
+
+
+def perfilar_columnas(df):
+    """Perfil determinístico por columna: tipo, % de nulos, distintos, mín/máx, formatos de fecha y longitud máxima."""
+    return {col: perfilar_columna(df.iloc[:, i]) for i, col in enumerate(df.columns)}
@@ -0,0 +1,409 @@
+import datetime
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from catalogador import trabajador
+from catalogador.claves import tiene_columna_id
+from catalogador.huellas import IndiceDuplicados, hash_esquema, hash_contenido, hashes_filas, huellas_duplicados
+from catalogador.incremental import clasificar_tablas, fusionar_con_anterior, ESTADOS_A_CATALOGAR
+from catalogador.lectura import iterar_hojas, nombre_archivo
+from catalogador.planos import es_plano, nombre_tabla
+from catalogador.metricas import Metricas, cronometro
+from catalogador.llm import MODELO, catalogar_tablas
+from catalogador.prompt import fusionar_respuestas
+from catalogador.muestreo import ESTRATEGIA_POR_DEFECTO
+from catalogador.normalizacion import normalizar_hoja, muestra_json
+from catalogador.perfil import perfilar_columnas, CAMPOS_PERFIL
+from catalogador.privacidad import detectar_datos_personales, privacidad_tabla
+from catalogador.relaciones import descubrir_relaciones, firmas_columnas
+
+# Campos del DICCIONARIO que escribe la IA (el tipo de dato sale del perfil)
+CAMPOS_IA_DICCIONARIO = ["Descripción", "column_rename_suggestion", "reason"]
+
+
+def marcar_datos_personales(perfil_columnas, evidencias):
+    for col, perfil_col in perfil_columnas.items():
+        perfil_col["dato_personal"] = evidencias.get(col, "")
+
+
+def analizar_hoja(df, perfil, max_columnas_clave=3, estrategia_muestreo=ESTRATEGIA_POR_DEFECTO, tiempos=None):
+    if perfil is not None:
+        # Hoja muy grande: muestra reservorio y estadísticas incrementales, sin DataFrame
+        with cronometro(tiempos, "muestra"):
+            muestra_tabla = perfil.muestra_tabla(estrategia_muestreo)
+        perfil_columnas = perfil.perfil_columnas()
+        with cronometro(tiempos, "privacidad"):
+            marcar_datos_personales(perfil_columnas, perfil.datos_personales())
+        with cronometro(tiempos, "relaciones"):
+            firmas = perfil.firmas_columnas()
+        return {
+            "schema_hash": hash_esquema(perfil.columnas),
+            "content_hash": perfil.hash_contenido(),
+            **perfil.huellas_duplicados(),
+            "columnas": perfil.columnas,
+            "muestra_tabla": muestra_tabla,
+            "nombre_id": perfil.columna_id(max_columnas_clave),
+            "perfil_columnas": perfil_columnas,
+            "firmas_columnas": firmas,
+        }
+    # Una sola pasada: columnas de texto Arrow con <NA>; solo la muestra pasa a objetos Python
+    with cronometro(tiempos, "normalizacion"):
+        df = normalizar_hoja(df)
+    with cronometro(tiempos, "huellas"):
+        # Un solo hash por fila para la huella de contenido y la firma de duplicados
+        hashes = hashes_filas(df)
+        huellas = {
+            "schema_hash": hash_esquema(df.columns),
+            "content_hash": hash_contenido(df, hashes),
+            **huellas_duplicados(df, hashes),
+        }
+    # --- Filas de muestra elegidas para cubrir el máximo de columnas (ver muestreo.py) ---
+    with cronometro(tiempos, "muestra"):
+        muestra_tabla = muestra_json(df, estrategia=estrategia_muestreo)
+    # --- Verificar si la tabla tiene columna identificador único o clave compuesta ---
+    with cronometro(tiempos, "claves"):
+        nombre_id = tiene_columna_id(df, max_columnas=max_columnas_clave)
+    # --- Perfil determinístico de columnas: define el tipo de dato sin la IA ---
+    with cronometro(tiempos, "perfil"):
+        perfil_columnas = perfilar_columnas(df)
+    # --- Datos personales (DNI, RUC, correos, teléfonos, cuentas, nombres): proponen data_privacy ---
+    with cronometro(tiempos, "privacidad"):
+        marcar_datos_personales(perfil_columnas, detectar_datos_personales(df))
+    # --- Firmas de valores por columna para descubrir relaciones entre tablas (ver relaciones.py) ---
+    with cronometro(tiempos, "relaciones"):
+        firmas = firmas_columnas(df, perfil_columnas)
+    return {
+        **huellas,
+        "columnas": list(df.columns),
+        "muestra_tabla": muestra_tabla,
+        "nombre_id": nombre_id,
+        "perfil_columnas": perfil_columnas,
+        "firmas_columnas": firmas,
+    }
+
+
+def leer_archivo(archivo, hojas=None, umbral_streaming=None, max_columnas_clave=3,
+                 estrategia_muestreo=ESTRATEGIA_POR_DEFECTO):
+    """Lee y analiza las hojas de un libro (todas menos las excluidas si `hojas` es None).
+
+    Devuelve una lista de tablas sin table_id; acepta rutas o archivos subidos.
+    """
+    file_name = nombre_archivo(archivo)
+    file_format = file_name.split('.')[-1].lower()
+    # Para archivos en disco la ubicación se conoce; los subidos a la app la dejan vacía
+    location_path = os.path.dirname(os.path.abspath(archivo)) if isinstance(archivo, (str, os.PathLike)) else ""
+    tablas = []
+    # El libro se abre una sola vez para todas las hojas seleccionadas
+    hojas_leidas = iterar_hojas(archivo, hojas, umbral_streaming=umbral_streaming)
+    while True:
+        # "lectura" es el tiempo del parser (o del perfil incremental, en hojas grandes)
+        tiempos = {}
+        with cronometro(tiempos, "lectura"):
+            siguiente = next(hojas_leidas, None)
+        if siguiente is None:
+            break
+        sheet_name, df, perfil = siguiente
+        tablas.append({
+            "file_name": file_name,
+            "file_format": file_format,
+            "sheet_name": sheet_name,
+            "location_path": location_path,
+            **analizar_hoja(df, perfil, max_columnas_clave, estrategia_muestreo, tiempos),
+            "tiempos": tiempos,
+        })
+    return tablas
+
+
+def procesos_disponibles():
+    # Núcleos que este proceso puede usar (respeta taskset y los límites del contenedor en Linux)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pool_lectura(procesos=None):
+    """Pool de procesos para leer archivos en paralelo.
+
+    Usa forkserver donde existe: la app corre con varios hilos y un fork de
+    ese proceso puede heredar locks tomados por otro hilo. Los procesos no
+    vuelven a ejecutar la página de Streamlit (ver trabajador.py).
+    """
+    return ProcessPoolExecutor(max_workers=procesos or procesos_disponibles(), mp_context=trabajador.contexto())
+
+
+def _leer_compartido(file_name, memoria, tamano, *argumentos):
+    # Proceso lector: el archivo llega por memoria compartida y se devuelven solo las tablas resumidas
+    bloque = shared_memory.SharedMemory(name=memoria)
+    try:
+        with bloque.buf[:tamano] as contenido:
+            archivo = io.BytesIO(contenido)
+    finally:
+        bloque.close()
+    archivo.name = file_name
+    return leer_archivo(archivo, *argumentos)
+
+
+def _tablas_esperadas(archivo, hojas):
+    # Hojas que producirá cada archivo: fija los table_id antes de que termine la lectura
+    if es_plano(nombre_archivo(archivo)):
+        return int(nombre_tabla(nombre_archivo(archivo)) in hojas)
+    return len(hojas)
+
+
+def _tamano(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        return os.path.getsize(archivo)
+    return getattr(archivo, "size", None) or archivo.getbuffer().nbytes
+
+
+def asignar_ids(tablas, inicio=1):
+    for i, t in enumerate(tablas, start=inicio):
+        t["table_id"] = f"T{str(i).zfill(3)}"
+    return tablas
+
+
+def respuesta_vacia(columnas):
+    # Generar estructura vacía con los mismos keys que la respuesta de la IA
+    return {
+        "table_description": "",
+        "columns": [
+            {
+                "name": col,
+                "description": "",
+                "new_name": "",
+                "reason": ""
+            } for col in columnas
+        ]
+    }
+
+
+def consolidar_tablas(tablas, respuestas_ia, fecha=None):
+    """Arma METADATOS y DICCIONARIO en orden de table_id."""
+    fecha = fecha or str(datetime.date.today())
+    metadatos_list = []
+    diccionarios_list = []
+    table_names = []
+    for t in tablas:
+        file_name, sheet_name, table_id = t["file_name"], t["sheet_name"], t["table_id"]
+        dict_ia = respuestas_ia.get(table_id) or respuesta_vacia(t["columnas"])
+        metadatos = {
+            "file_name": file_name,
+            "table_id": table_id,
+            "table_name": sheet_name,
+            "table_description": dict_ia.get("table_description", ""),
+            "format": t["file_format"],
+            "date_modified": fecha,
+            "date_register": fecha,
+            # "Personales" si alguna columna tiene datos personales (ver privacidad.py)
+            "data_privacy": privacidad_tabla(t["perfil_columnas"]),
+            "data_steward_operativo_contact": "",
+            "data_steward_ejecutivo_contact": "",
+            "domain": "",
+            "data_owner_area": "",
+            "location_path": t.get("location_path", ""),
+            "periodicity": "Ad hoc (sin frecuencia fija)",
+            "table_status": "Activa",
+            "Columna_ID": t["nombre_id"],  # NUEVO: columna al final
+            # Hoja idéntica o casi idéntica a otra: se describe con la respuesta de esa otra
+            "duplicado_de": t.get("duplicado_de", ""),
+            "similitud_duplicado": t.get("similitud_duplicado", ""),
+            # Huellas de la hoja para la re-catalogación incremental
+            "schema_hash": t["schema_hash"],
+            "content_hash": t["content_hash"],
+        }
+        metadatos_list.append(metadatos)
+        for i, col in enumerate(dict_ia.get("columns", [])):
+            id_atributo = f"a{str(i+1).zfill(3)}"
+            perfil_col = t["perfil_columnas"].get(col.get("name", ""), {})
+            atributo = {
+                "file_name": file_name,
+                "table_name": sheet_name,
+                "table_id": table_id,
+                "id_atributo": id_atributo,
+                "Atributo": col.get("name", ""),
+                "Descripción": col.get("description", ""),
+                "Tipo de dato": perfil_col.get("tipo", ""),
+                "column_rename_suggestion": col.get("new_name", ""),
+                "reason": col.get("reason", ""),
+            }
+            for campo, etiqueta in CAMPOS_PERFIL.items():
+                atributo[etiqueta] = perfil_col.get(campo)
+            diccionarios_list.append(atributo)
+        table_names.append(sheet_name)
+    return metadatos_list, diccionarios_list, table_names
+
+
+def leer_tablas(files, selected_sheets_per_file, umbral_streaming=None, max_columnas_clave=3,
+                estrategia_muestreo=ESTRATEGIA_POR_DEFECTO, pool=None, al_leer=None):
+    """Lee las hojas seleccionadas de todos los archivos y les asigna table_id.
+
+    Con `pool` (ver pool_lectura) cada archivo se lee y analiza en otro
+    proceso. Los archivos subidos viajan por memoria compartida y de vuelta
+    solo llegan las tablas resumidas (muestra, perfil, firmas), nunca
+    DataFrames. Los table_id son los mismos que en la lectura secuencial.
+    `al_leer(tablas)` recibe las tablas de cada archivo apenas termina de
+    leerse, para describirlas mientras se leen las demás.
+    """
+    argumentos, inicios, inicio = {}, {}, 1
+    for i, archivo in enumerate(files):
+        hojas = selected_sheets_per_file.get(nombre_archivo(archivo), [])
+        argumentos[i] = (hojas, umbral_streaming, max_columnas_clave, estrategia_muestreo)
+        inicios[i] = inicio
+        inicio += _tablas_esperadas(archivo, hojas)
+    por_archivo = {}
+
+    def terminar(i, tablas):
+        por_archivo[i] = asignar_ids(tablas, inicio=inicios[i])
+        if al_leer is not None and tablas:
+            al_leer(tablas)
+
+    if pool is None:
+        for i, archivo in enumerate(files):
+            terminar(i, leer_archivo(archivo, *argumentos[i]))
+        return [t for i in range(len(files)) for t in por_archivo[i]]
+
+    bloques = []
+    try:
+        lecturas = {}
+        # Los archivos más grandes primero: ningún proceso se queda con el más pesado al final
+        for i in sorted(range(len(files)), key=lambda i: -_tamano(files[i])):
+            archivo = files[i]
+            if isinstance(archivo, (str, os.PathLike)):
+                lecturas[pool.submit(leer_archivo, archivo, *argumentos[i])] = i
+                continue
+            with archivo.getbuffer() as contenido:
+                tamano = contenido.nbytes
+                bloque = shared_memory.SharedMemory(create=True, size=max(1, tamano))
+                bloques.append(bloque)
+                bloque.buf[:tamano] = contenido
+            lecturas[pool.submit(_leer_compartido, nombre_archivo(archivo), bloque.name, tamano, *argumentos[i])] = i
+        for futuro in as_completed(lecturas):
+            terminar(lecturas[futuro], futuro.result())
+    finally:
+        for bloque in bloques:
+            bloque.close()
+            bloque.unlink()
+    return [t for i in range(len(files)) for t in por_archivo[i]]
+
+
+def catalogo_inicial(tablas, estados, respuestas_ia, archivos_subidos, catalogo_anterior=None):
+    """METADATOS y DICCIONARIO con las respuestas disponibles; las tablas sin respuesta quedan vacías."""
+    metadatos_list, diccionarios_list, table_names = consolidar_tablas(tablas, respuestas_ia)
+    if catalogo_anterior is not None:
+        metadatos_list, diccionarios_list = fusionar_con_anterior(
+            metadatos_list, diccionarios_list, estados, catalogo_anterior, archivos_subidos,
+        )
+        table_names = [m["table_name"] for m in metadatos_list]
+    return metadatos_list, diccionarios_list, table_names
+
+
+def etiqueta_tabla(tabla):
+    return f"{tabla['file_name']} › {tabla['sheet_name']}"
+
+
+def marcar_duplicados(tablas, indice=None, vistas=None):
+    """Agrupa hojas idénticas o casi idénticas; devuelve {table_id duplicada: table_id representante}.
+
+    Cada duplicada queda marcada con duplicado_de (archivo › hoja del
+    representante) y similitud_duplicado, que pasan a METADATOS. Para marcar
+    las hojas por partes se pasan el mismo `indice` y el mismo dict `vistas`
+    ({table_id: tabla} de las partes anteriores) en cada llamada.
+    """
+    indice = indice or IndiceDuplicados()
+    por_id = vistas if vistas is not None else {}
+    por_id.update((t["table_id"], t) for t in tablas)
+    duplicados = {}
+    for t in tablas:
+        encontrada = indice.agregar(t["table_id"], t)
+        if encontrada is None:
+            continue
+        representante, similitud = encontrada
+        duplicados[t["table_id"]] = representante
+        t["duplicado_de"] = etiqueta_tabla(por_id[representante])
+        t["similitud_duplicado"] = f"{similitud:.0%}"
+    return duplicados
+
+
+def propagar_duplicados(respuestas_ia, duplicados, tablas_por_id):
+    # La respuesta del representante se alinea con las columnas de cada duplicada (pueden estar en otro orden)
+    respuestas = dict(respuestas_ia)
+    for duplicada, representante in duplicados.items():
+        if duplicada not in respuestas and representante in respuestas_ia:
+            respuestas[duplicada] = fusionar_respuestas([respuestas_ia[representante]], tablas_por_id[duplicada]["columnas"])
+    return respuestas
+
+
+def respuesta_tabla(tabla, dict_ia):
+    """(table_description, filas de DICCIONARIO) de una tabla cuya respuesta llegó después del catálogo inicial."""
+    metadatos_list, diccionarios_list, _ = consolidar_tablas([tabla], {tabla["table_id"]: dict_ia})
+    return metadatos_list[0]["table_description"], diccionarios_list
+
+
+def muestras_a_catalogar(tablas, estados, duplicados=None, ya_enviadas=()):
+    # Solo las hojas nuevas o con esquema distinto llegan al modelo, y de cada grupo de duplicadas solo el representante
+    # (`ya_enviadas`: table_id enviados con archivos leídos antes, cuando se envía archivo por archivo)
+    enviadas = {
+        t["table_id"]: t["muestra_tabla"] for t in tablas
+        if estados.get(t["table_id"], "nueva") in ESTADOS_A_CATALOGAR
+    }
+    return {
+        table_id: muestra for table_id, muestra in enviadas.items()
+        if (duplicados or {}).get(table_id) not in enviadas and (duplicados or {}).get(table_id) not in ya_enviadas
+    }
+
+
+def procesar_archivos(files, selected_sheets_per_file, user_context, usar_ia, client=None, cache=None,
+                      opciones_llm=None, umbral_streaming=None, max_columnas_clave=3, catalogo_anterior=None,
+                      estrategia_muestreo=ESTRATEGIA_POR_DEFECTO, metricas=None, pool=None):
+    """Cataloga las hojas seleccionadas.
+
+    Con `catalogo_anterior` (METADATOS, DICCIONARIO) solo las hojas nuevas o
+    con esquema distinto se envían al modelo, y se conservan las ediciones.
+    De cada grupo de hojas duplicadas solo el representante llega al modelo.
+    Una tabla que falla tras los reintentos queda sin descripción y se anota
+    en las métricas ("tablas_pendientes") en lugar de abortar el lote.
+    Con `pool` (ver pool_lectura) los archivos se leen en paralelo.
+    Devuelve (metadatos_list, diccionarios_list, table_names, relaciones,
+    métricas), con las relaciones entre tablas de relaciones.descubrir_relaciones
+    y las métricas como dict (ver metricas.Metricas.a_dict).
+    """
+    if metricas is None:
+        # Mismo modelo que usa catalogar_tablas cuando opciones_llm no lo indica
+        metricas = Metricas((opciones_llm or {}).get("modelo", MODELO))
+    inicio = time.perf_counter()
+    # --- 1) Lectura de hojas: se guarda solo lo necesario (muestra, columnas, ID, perfil) ---
+    with metricas.medir("lectura_archivos"):
+        tablas = leer_tablas(files, selected_sheets_per_file, umbral_streaming, max_columnas_clave, estrategia_muestreo, pool)
+    metricas.agregar_hojas(tablas)
+    duplicados = marcar_duplicados(tablas)
+    metricas.registrar_duplicadas(len(duplicados))
+    with metricas.medir("relaciones"):
+        relaciones = descubrir_relaciones(tablas)
+    estados = {}
+    if catalogo_anterior is not None:
+        estados = clasificar_tablas(tablas, catalogo_anterior)
+    # --- 2) Opción para usar IA o no: todas las hojas se describen en paralelo ---
+    respuestas_ia = {}
+    if usar_ia and tablas:
+        with metricas.medir("ia"):
+            respuestas_ia, fallidas = catalogar_tablas(
+                client,
+                muestras_a_catalogar(tablas, estados, duplicados),
+                user_context,
+                cache=cache,
+                metricas=metricas,
+                **(opciones_llm or {}),
+            )
+        for table_id, error in fallidas.items():
+            metricas.registrar_fallida(table_id, error)
+        respuestas_ia = propagar_duplicados(respuestas_ia, duplicados, {t["table_id"]: t for t in tablas})
+    # --- 3) Consolidar resultados en orden de table_id ---
+    with metricas.medir("consolidacion"):
+        metadatos_list, diccionarios_list, table_names = catalogo_inicial(
+            tablas, estados, respuestas_ia, {nombre_archivo(archivo) for archivo in files}, catalogo_anterior,
+        )
+    metricas.etapas["total"] = time.perf_counter() - inicio
+    return metadatos_list, diccionarios_list, table_names, relaciones, metricas.a_dict()
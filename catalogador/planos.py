@@ -0,0 +1,178 @@
+"""Lectura de archivos planos (CSV/TXT/TSV y Parquet) como una sola tabla.
+
+El delimitador y la codificación de los textos se detectan con los primeros
+bytes. Con pyarrow el análisis es multihilo y en columnas Arrow; los archivos
+que superan `umbral_streaming` filas se recorren por lotes y se entrega un
+PerfilIncremental, igual que las hojas grandes de Excel.
+"""
+import csv
+import importlib.util
+import io
+import os
+
+import pandas as pd
+
+from catalogador.normalizacion import DTYPE_TEXTO, normalizar_hoja
+from catalogador.streaming import nombres_columnas, perfilar_filas
+
+HAY_PYARROW = importlib.util.find_spec("pyarrow") is not None
+if HAY_PYARROW:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv, parquet as pq
+
+EXTENSIONES_TEXTO = ("csv", "txt", "tsv")
+EXTENSIONES_PARQUET = ("parquet", "pq")
+# Bytes leídos para detectar codificación, delimitador y largo promedio de fila
+BYTES_MUESTRA = 1 << 20
+DELIMITADORES = ",;\t|"
+CODIFICACIONES = ("utf-8", "cp1252", "latin-1")
+# Tamaño de bloque del lector Arrow: bloques grandes aprovechan mejor los hilos
+TAMANO_BLOQUE = 16 << 20
+FILAS_POR_LOTE = 65536
+
+
+def _extension(nombre):
+    return nombre.rsplit(".", 1)[-1].lower() if "." in nombre else ""
+
+
+def es_plano(nombre):
+    return _extension(nombre) in EXTENSIONES_TEXTO + EXTENSIONES_PARQUET
+
+
+def nombre_tabla(nombre):
+    # Un archivo plano es una sola tabla: se nombra como el archivo sin extensión
+    return os.path.splitext(nombre)[0]
+
+
+def _abrir(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        return open(archivo, "rb")
+    archivo.seek(0)
+    return archivo
+
+
+def _tamano(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        return os.path.getsize(archivo)
+    if getattr(archivo, "size", None) is not None:
+        return archivo.size
+    posicion = archivo.tell()
+    archivo.seek(0, io.SEEK_END)
+    tamano = archivo.tell()
+    archivo.seek(posicion)
+    return tamano
+
+
+def detectar_formato(archivo):
+    """Devuelve (codificación, delimitador, encabezado, filas estimadas) de un archivo de texto."""
+    f = _abrir(archivo)
+    try:
+        muestra = f.read(BYTES_MUESTRA)
+    finally:
+        if f is not archivo:
+            f.close()
+    completo = len(muestra) < BYTES_MUESTRA
+    if not completo and b"\n" in muestra:
+        # Evita cortar un carácter multibyte o una fila a la mitad
+        muestra = muestra[:muestra.rindex(b"\n") + 1]
+    codificacion, texto = "latin-1", None
+    for candidata in CODIFICACIONES:
+        try:
+            texto = muestra.decode(candidata)
+            codificacion = candidata
+            break
+        except UnicodeDecodeError:
+            continue
+    texto = texto.lstrip("\ufeff")
+    lineas = texto.splitlines()
+    try:
+        delimitador = csv.Sniffer().sniff("\n".join(lineas[:50]), delimiters=DELIMITADORES).delimiter
+    except csv.Error:
+        # Sin patrón claro: el delimitador más frecuente en el encabezado
+        delimitador = max(DELIMITADORES, key=lambda d: lineas[0].count(d) if lineas else 0)
+    encabezado = next(csv.reader(lineas[:1], delimiter=delimitador), [])
+    if completo:
+        filas = max(len(lineas) - 1, 0)
+    else:
+        filas = int(_tamano(archivo) / (len(muestra) / max(len(lineas), 1)))
+    return codificacion, delimitador, nombres_columnas(encabezado), filas
+
+
+def _opciones_arrow(codificacion, delimitador, columnas):
+    lectura = pa_csv.ReadOptions(
+        encoding="utf8" if codificacion == "utf-8" else codificacion,
+        column_names=columnas, skip_rows=1, block_size=TAMANO_BLOQUE, use_threads=True,
+    )
+    # Filas con más o menos campos que el encabezado se omiten en lugar de abortar la lectura
+    analisis = pa_csv.ParseOptions(delimiter=delimitador, newlines_in_values=True, invalid_row_handler=lambda fila: "skip")
+    conversion = pa_csv.ConvertOptions(column_types={c: pa.string() for c in columnas}, strings_can_be_null=True)
+    return lectura, analisis, conversion
+
+
+def _filas_lotes(columnas, lotes):
+    # Encabezado y filas para perfilar_filas, convirtiendo a Python un lote a la vez
+    yield columnas
+    for lote in lotes:
+        yield from zip(*(lote.column(i).to_pylist() for i in range(lote.num_columns)))
+
+
+def _filas_lotes_tipados(columnas, lotes):
+    # Columnas tipadas (Parquet): mismo texto que normalizar_hoja en la lectura completa, p. ej. 1.0 queda "1.0"
+    yield columnas
+    for lote in lotes:
+        df = normalizar_hoja(lote.to_pandas())
+        yield from zip(*(df.iloc[:, i].to_numpy(dtype=object, na_value=None) for i in range(df.shape[1])))
+
+
+def _encadenar(encabezado, filas):
+    yield encabezado
+    yield from filas
+
+
+def leer_texto(archivo, umbral_streaming=None):
+    """Devuelve (df, perfil) de un CSV/TXT; uno de los dos es None."""
+    codificacion, delimitador, columnas, filas = detectar_formato(archivo)
+    streaming = bool(umbral_streaming) and filas > umbral_streaming
+    if not HAY_PYARROW:
+        opciones = dict(sep=delimitador, encoding=codificacion, names=columnas, skiprows=1, dtype=DTYPE_TEXTO, on_bad_lines="skip")
+        f = _abrir(archivo)
+        try:
+            if streaming:
+                lotes = pd.read_csv(f, chunksize=FILAS_POR_LOTE, **opciones)
+                filas_texto = (fila for lote in lotes for fila in lote.itertuples(index=False, name=None))
+                return None, perfilar_filas(_encadenar(columnas, filas_texto))
+            return pd.read_csv(f, **opciones), None
+        finally:
+            if f is not archivo:
+                f.close()
+    lectura, analisis, conversion = _opciones_arrow(codificacion, delimitador, columnas)
+    f = _abrir(archivo)
+    try:
+        if streaming:
+            lector = pa_csv.open_csv(f, read_options=lectura, parse_options=analisis, convert_options=conversion)
+            return None, perfilar_filas(_filas_lotes(columnas, lector))
+        tabla = pa_csv.read_csv(f, read_options=lectura, parse_options=analisis, convert_options=conversion)
+        return tabla.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get), None
+    finally:
+        if f is not archivo:
+            f.close()
+
+
+def leer_parquet(archivo, umbral_streaming=None):
+    """Devuelve (df, perfil) de un Parquet; el número de filas sale de los metadatos."""
+    f = _abrir(archivo)
+    try:
+        pf = pq.ParquetFile(f)
+        if umbral_streaming and pf.metadata.num_rows > umbral_streaming:
+            columnas = nombres_columnas(pf.schema_arrow.names)
+            return None, perfilar_filas(_filas_lotes_tipados(columnas, pf.iter_batches(batch_size=FILAS_POR_LOTE)))
+        return pf.read().to_pandas(), None
+    finally:
+        if f is not archivo:
+            f.close()
+
+
+def leer_plano(archivo, nombre, umbral_streaming=None):
+    if _extension(nombre) in EXTENSIONES_PARQUET:
+        return leer_parquet(archivo, umbral_streaming)
+    return leer_texto(archivo, umbral_streaming)
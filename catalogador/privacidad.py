@@ -0,0 +1,121 @@
+"""Detección de datos personales por columna para proponer data_privacy.
+
+Cada detector es una expresión regular que se evalúa con los métodos .str
+de pandas (en columnas Arrow, RE2 compilado y sin un bucle de Python por
+celda). La columna se revisa en bloques crecientes de tramos contiguos
+tomados en orden aleatorio: la revisión termina en cuanto la proporción de
+coincidencias queda claramente por encima o por debajo del umbral, de modo
+que una hoja de millones de filas rara vez se recorre completa.
+
+Los detectores ambiguos por contenido (RUC, DNI, cuenta bancaria, nombres)
+exigen además que el nombre de la columna lo sugiera.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from catalogador.reutilizacion import normalizar_nombre
+
+# Proporción de valores no nulos que deben coincidir para marcar la columna
+UMBRAL_COINCIDENCIA = 0.8
+# Filas por tramo; el primer bloque es un tramo y los siguientes duplican su tamaño
+BLOQUE_INICIAL = 1024
+# Ancho del intervalo (en desviaciones estándar) para decidir antes de revisar la columna completa
+Z_CONFIANZA = 3.0
+PRIVACIDAD_PERSONALES = "Personales"
+PRIVACIDAD_POR_DEFECTO = "Cerrado"
+
+_LETRAS = "A-Za-zÁÉÍÓÚÜÑáéíóúüñ'"
+# (etiqueta, patrón del valor, patrón del nombre normalizado, exige nombre, patrón de nombres excluidos)
+DETECTORES = [
+    ("Correo electrónico", r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", None, False, None),
+    # Once dígitos que empiezan en 10 también son códigos internos comunes: exige un nombre tipo RUC
+    # (anclado, para que "estructura" o "construccion" no cuenten)
+    ("RUC de persona natural", r"(?:10|15|17)\d{9}", r"^(?:nro|num|numero)?ruc|ruc$|contribuyente", True, None),
+    ("CCI", r"\d{3}-?\d{3}-?\d{12}-?\d{2}", None, False, None),
+    ("Teléfono", r"(?:\+?51[ -]?)?9\d{2}[ -]?\d{3}[ -]?\d{3}", r"telefono|celular|movil|fono|whatsapp", False, None),
+    # Un DNI guardado como número pierde el cero inicial
+    ("DNI", r"\d{7,8}", r"dni|documento|nrodoc|numdoc|identidad", True, None),
+    ("Cuenta bancaria", r"\d{3,4}[- ]?\d{6,12}(?:[- ]?\d{1,3}){0,2}", r"cuenta|cta|account", True, None),
+    (
+        "Nombre de persona",
+        rf"[{_LETRAS}]+(?:,? +[{_LETRAS}]+){{1,5}}",
+        r"nombre|apellido|titular|cliente|afiliado|trabajador|empleado|contacto|beneficiario|usuario",
+        True,
+        r"producto|banco|entidad|empresa|razonsocial|archivo|hoja|distrito|provincia|departamento|agencia|area",
+    ),
+]
+
+
+def _decidida(coincidencias, revisados):
+    # True/False si el intervalo de confianza ya no cruza el umbral; None si hay que seguir revisando
+    p = coincidencias / revisados
+    margen = Z_CONFIANZA * math.sqrt(p * (1 - p) / revisados) + Z_CONFIANZA / revisados
+    if p - margen >= UMBRAL_COINCIDENCIA:
+        return True
+    if p + margen < UMBRAL_COINCIDENCIA:
+        return False
+    return None
+
+
+def _posiciones(orden, desde, hasta, filas):
+    # Filas de los tramos orden[desde:hasta]; cada tramo son BLOQUE_INICIAL filas contiguas
+    inicios = orden[desde:hasta, None] * BLOQUE_INICIAL
+    posiciones = (inicios + np.arange(BLOQUE_INICIAL)).ravel()
+    return posiciones[posiciones < filas]
+
+
+def _revisar(serie, patron, orden):
+    """(coincidencias, revisados) de `patron` sobre los valores no nulos, con salida anticipada."""
+    coincidencias = revisados = 0
+    desde, tramos = 0, 1
+    while desde < len(orden):
+        bloque = serie.iloc[_posiciones(orden, desde, desde + tramos, len(serie))].dropna()
+        if not isinstance(bloque.dtype, pd.StringDtype):
+            bloque = bloque.astype(str)
+        coincidencias += int(bloque.str.strip().str.fullmatch(patron).sum())
+        revisados += len(bloque)
+        desde += tramos
+        tramos *= 2
+        if revisados and desde < len(orden) and _decidida(coincidencias, revisados) is not None:
+            break
+    return coincidencias, revisados
+
+
+def detectar_columna(nombre, serie, semilla=1):
+    """Evidencia de dato personal de una columna ("DNI: 99.8% de 1,024 valores revisados") o ""."""
+    clave = normalizar_nombre(nombre)
+    # Tramos en orden aleatorio: una columna ordenada no sesga la revisión anticipada
+    orden = np.random.default_rng(semilla).permutation(-(-len(serie) // BLOQUE_INICIAL))
+    for etiqueta, patron, patron_nombre, exige_nombre, excluidos in DETECTORES:
+        por_nombre = bool(patron_nombre and re.search(patron_nombre, clave))
+        if exige_nombre and (not por_nombre or (excluidos and re.search(excluidos, clave))):
+            continue
+        coincidencias, revisados = _revisar(serie, patron, orden)
+        if not revisados:
+            # Columna vacía: ningún detector puede coincidir
+            return ""
+        if coincidencias / revisados < UMBRAL_COINCIDENCIA:
+            continue
+        evidencia = f"{etiqueta}: {coincidencias / revisados:.1%} de {revisados:,} valores revisados"
+        return evidencia + (" (y nombre de columna)" if por_nombre else "")
+    return ""
+
+
+def detectar_datos_personales(df):
+    """{columna: evidencia} de las columnas con datos personales."""
+    evidencias = {}
+    for i, col in enumerate(df.columns):
+        evidencia = detectar_columna(col, df.iloc[:, i])
+        if evidencia:
+            evidencias[col] = evidencia
+    return evidencias
+
+
+def privacidad_tabla(perfil_columnas):
+    # Una sola columna con datos personales basta para proponer "Personales"
+    if any(p.get("dato_personal") for p in perfil_columnas.values()):
+        return PRIVACIDAD_PERSONALES
+    return PRIVACIDAD_POR_DEFECTO
@@ -0,0 +1,204 @@
+"""Construcción de prompts con presupuesto de tokens.
+
+Las celdas largas se recortan. Una hoja muy ancha se parte en grupos de
+columnas, cada uno de los cuales cabe en `tokens_por_solicitud` y se describe
+en una llamada independiente; luego fusionar_respuestas une las partes en un
+solo TableMetadata alineado con las columnas reales. Si toda la tabla no cabe
+en `tokens_por_tabla`, se envían menos filas de muestra; si ni así cabe, solo
+los nombres de las columnas y, en último caso, solo las primeras columnas.
+El recorte se informa junto con los lotes para registrarlo en las métricas.
+"""
+import functools
+import importlib.util
+import json
+
+# tiktoken cuenta tokens exactos para el modelo; sin él se estiman ~4 caracteres por token
+HAY_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+
+TOKENS_POR_SOLICITUD = 6000
+TOKENS_POR_TABLA = 24000
+MAX_CARACTERES_CELDA = 200
+# Filas de muestra que se prueban, de más a menos, hasta respetar el presupuesto de la tabla
+# (0: solo los nombres de las columnas)
+FILAS_MUESTRA = (10, 5, 3, 1, 0)
+# Tokens reservados para el prompt del sistema y el texto fijo de cada solicitud
+TOKENS_FIJOS = 400
+
+
+@functools.lru_cache(maxsize=None)
+def _codificador(modelo):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(modelo)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def contar_tokens(texto, modelo="gpt-4o-mini"):
+    if HAY_TIKTOKEN:
+        try:
+            return len(_codificador(modelo).encode(texto, disallowed_special=()))
+        except Exception:
+            # Sin acceso a los archivos del codificador se usa la estimación
+            pass
+    return len(texto) // 4 + 1
+
+
+def truncar_celda(valor, max_caracteres=MAX_CARACTERES_CELDA):
+    if isinstance(valor, str) and len(valor) > max_caracteres:
+        return valor[:max_caracteres] + "…"
+    return valor
+
+
+def recortar_muestra(muestra_tabla, filas=None, max_caracteres=MAX_CARACTERES_CELDA):
+    return {
+        col: [truncar_celda(v, max_caracteres) for v in valores[:filas]]
+        for col, valores in muestra_tabla.items()
+    }
+
+
+def _tokens_columna(col, valores, modelo):
+    return contar_tokens(json.dumps({col: valores}, ensure_ascii=False), modelo)
+
+
+def agrupar_columnas(muestra_tabla, tokens_por_solicitud=TOKENS_POR_SOLICITUD, modelo="gpt-4o-mini", reservados=0):
+    """Parte la muestra en grupos contiguos de columnas que caben en una solicitud."""
+    disponible = max(1, tokens_por_solicitud - TOKENS_FIJOS - reservados)
+    grupos, actual, usados = [], {}, 0
+    for col, valores in muestra_tabla.items():
+        costo = _tokens_columna(col, valores, modelo)
+        # Una columna que sola excede el presupuesto se envía con menos valores
+        while costo > disponible and len(valores) > 1:
+            valores = valores[:len(valores) // 2]
+            costo = _tokens_columna(col, valores, modelo)
+        if actual and usados + costo > disponible:
+            grupos.append(actual)
+            actual, usados = {}, 0
+        actual[col] = valores
+        usados += costo
+    if actual or not grupos:
+        grupos.append(actual)
+    return grupos
+
+
+def _mensaje_sistema(user_context):
+    # --- Incluir contexto del usuario en el prompt del sistema ---
+    system_msg = "Eres un experto catalogador de datos. Analiza la siguiente muestra de una tabla y responde en **español**."
+    if user_context and user_context.strip():
+        system_msg += f"\n\nContexto adicional proporcionado por el usuario para mejorar la catalogación: {user_context.strip()}"
+    return system_msg
+
+
+def construir_mensajes(muestra_tabla, user_context, parte=None, columnas_tabla=None, columnas_conocidas=None):
+    system_msg = _mensaje_sistema(user_context)
+    conocidas = ""
+    if columnas_conocidas:
+        # Columnas con descripción reutilizada (ver reutilizacion.py): dan contexto a table_description
+        conocidas = f"""
+                La tabla también tiene estas columnas, ya descritas en el catálogo; no las incluyas en columns: {json.dumps(columnas_conocidas, ensure_ascii=False)}"""
+    if parte is None:
+        prompt_dict = f"""{conocidas}
+                Muestra de la tabla (formato JSON):
+                {json.dumps(muestra_tabla, ensure_ascii=False)}
+                """
+    else:
+        indice, total = parte
+        # Sin presupuesto para repetir los nombres de toda la tabla en cada parte, la línea se omite
+        completas = f"""
+                Columnas de la tabla completa: {json.dumps(columnas_tabla, ensure_ascii=False)}""" if columnas_tabla else ""
+        prompt_dict = f"""{conocidas}
+                La tabla es demasiado ancha y se envía en {total} partes; esta es la parte {indice}.
+                Describe la tabla completa en table_description y, en columns, solo las columnas de esta parte.{completas}
+                Muestra de las columnas de esta parte (formato JSON):
+                {json.dumps(muestra_tabla, ensure_ascii=False)}
+                """
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": prompt_dict}
+    ]
+
+
+def _grupos_y_costo(muestra, tokens_por_solicitud, modelo, tokens_nombres, tokens_conocidas):
+    # Grupos de columnas y tokens totales de la tabla; cada parte repite la lista de nombres (si se envía)
+    grupos = agrupar_columnas(muestra, tokens_por_solicitud, modelo, reservados=tokens_conocidas)
+    if len(grupos) > 1 and tokens_nombres:
+        grupos = agrupar_columnas(muestra, tokens_por_solicitud, modelo, reservados=tokens_nombres + tokens_conocidas)
+    costo = sum(_tokens_columna(c, v, modelo) for g in grupos for c, v in g.items())
+    costo += (tokens_conocidas + TOKENS_FIJOS) * len(grupos)
+    if len(grupos) > 1:
+        costo += tokens_nombres * len(grupos)
+    return grupos, costo
+
+
+def construir_lotes(muestra_tabla, user_context, tokens_por_solicitud=TOKENS_POR_SOLICITUD,
+                    tokens_por_tabla=TOKENS_POR_TABLA, max_caracteres=MAX_CARACTERES_CELDA, modelo="gpt-4o-mini",
+                    columnas_conocidas=None):
+    """Devuelve (lotes, recorte): los mensajes a enviar para una tabla (uno por grupo de columnas).
+
+    `columnas_conocidas` son nombres de columnas que ya tienen descripción y no
+    van en la muestra; se mencionan para que el modelo vea la tabla completa.
+    `recorte` es None si la muestra de 1 fila o más cabe en `tokens_por_tabla`;
+    si no, describe qué se dejó fuera para respetarlo. `lotes` puede quedar
+    vacío si ni una columna cabe en el presupuesto.
+    """
+    # Los nombres de todas las columnas dan contexto a cada parte; se recortan para no inflar el prompt
+    nombres = [truncar_celda(str(c), 40) for c in muestra_tabla]
+    tokens_nombres = contar_tokens(json.dumps(nombres, ensure_ascii=False), modelo)
+    conocidas = [truncar_celda(str(c), 40) for c in columnas_conocidas or []]
+    tokens_conocidas = contar_tokens(json.dumps(conocidas, ensure_ascii=False), modelo) if conocidas else 0
+    recorte = None
+    for filas in FILAS_MUESTRA:
+        if not filas:
+            # Solo nombres: cada parte ya los lleva en su muestra, no se repite la lista completa
+            nombres, tokens_nombres = None, 0
+            recorte = "sin valores de muestra, solo nombres de columnas"
+        muestra = recortar_muestra(muestra_tabla, filas, max_caracteres)
+        grupos, costo = _grupos_y_costo(muestra, tokens_por_solicitud, modelo, tokens_nombres, tokens_conocidas)
+        if costo <= tokens_por_tabla:
+            break
+    else:
+        # Ni los nombres caben: se envían las primeras columnas que quepan (búsqueda binaria del prefijo)
+        columnas = list(muestra)
+        bajo, alto = 0, len(columnas) - 1
+        while bajo < alto:
+            medio = (bajo + alto + 1) // 2
+            _, costo = _grupos_y_costo(
+                {c: muestra[c] for c in columnas[:medio]}, tokens_por_solicitud, modelo, 0, tokens_conocidas,
+            )
+            bajo, alto = (medio, alto) if costo <= tokens_por_tabla else (bajo, medio - 1)
+        recorte = f"solo nombres de {bajo} de {len(columnas)} columnas; el resto queda sin descripción"
+        grupos = agrupar_columnas({c: muestra[c] for c in columnas[:bajo]}, tokens_por_solicitud, modelo,
+                                  reservados=tokens_conocidas) if bajo else []
+    if len(grupos) == 1:
+        return [construir_mensajes(grupos[0], user_context, columnas_conocidas=conocidas)], recorte
+    return [
+        construir_mensajes(grupo, user_context, parte=(i, len(grupos)), columnas_tabla=nombres, columnas_conocidas=conocidas)
+        for i, grupo in enumerate(grupos, start=1)
+    ], recorte
+
+
+def fusionar_respuestas(respuestas, columnas):
+    """Une las respuestas de cada parte en un dict TableMetadata con una entrada por columna real.
+
+    Las columnas que el modelo omitió quedan con descripción vacía y las que
+    inventó se descartan.
+    """
+    por_nombre = {}
+    for respuesta in respuestas:
+        for col in respuesta.get("columns", []):
+            nombre = str(col.get("name", ""))
+            por_nombre.setdefault(nombre, col)
+            por_nombre.setdefault(nombre.strip().lower(), col)
+    columnas_fusionadas = []
+    for col in columnas:
+        nombre = str(col)
+        encontrada = por_nombre.get(nombre) or por_nombre.get(nombre.strip().lower()) or {}
+        columnas_fusionadas.append({
+            "name": nombre,
+            "description": encontrada.get("description") or "",
+            "new_name": encontrada.get("new_name") or "",
+            "reason": encontrada.get("reason") or "",
+        })
+    # La descripción de la tabla sale de la primera parte que la trae
+    descripcion = next((r.get("table_description") for r in respuestas if r.get("table_description")), "")
+    return {"table_description": descripcion, "columns": columnas_fusionadas}
@@ -0,0 +1,235 @@
+"""Descubrimiento de relaciones (posibles claves foráneas) entre las tablas de una carga.
+
+Una columna A referencia a una columna B cuando todos (o casi todos) los
+valores de A aparecen en B y B no tiene valores repetidos. En lugar de cruzar
+los valores completos de cada par de columnas, cada hoja guarda al leerse una
+firma por columna (firmas_columnas):
+
+- los `K_MUESTRA` hashes más pequeños de sus valores distintos (una muestra
+  uniforme de esos valores, igual para la misma columna en cualquier hoja);
+- en las columnas sin repetidos (candidatas a ser referenciadas), un filtro de
+  Bloom con todos sus valores.
+
+La inclusión de A en B se estima buscando la muestra de A en el filtro de B.
+Antes se descartan los pares por tipo de dato, cardinalidad y longitud, y los
+sobrevivientes se prueban primero con unos pocos hashes, todos los de una
+columna B a la vez; solo los que pasan esa prueba se revisan completos.
+"""
+import base64
+import re
+
+import numpy as np
+import pandas as pd
+
+from catalogador.modelos import tipo_dato
+from catalogador.reutilizacion import normalizar_nombre
+
+# Hashes distintos más pequeños que se guardan por columna
+K_MUESTRA = 256
+# Hashes de la muestra que se prueban contra todas las candidatas antes de la revisión completa
+K_PRUEBA = 4
+# Filtro de Bloom: bits por valor y funciones de hash (~1% de falsos positivos)
+BITS_POR_VALOR = 10
+FUNCIONES_BLOOM = 7
+# Columnas referenciadas con más valores distintos no llevan filtro (acota la memoria y el checkpoint)
+MAX_VALORES_FILTRO = 2_000_000
+# Proporción mínima de la muestra presente en la columna referenciada (tolera algunos huérfanos)
+UMBRAL_INCLUSION = 0.95
+# Columnas con menos valores distintos (banderas, estados) no se consideran claves foráneas
+MIN_DISTINTOS = 5
+# Holgura en la cardinalidad: en hojas leídas en streaming los distintos son una estimación
+HOLGURA_DISTINTOS = 1.05
+CAMPOS_RELACIONES = [
+    "table_id_origen", "tabla_origen", "columna_origen", "table_id_destino", "tabla_destino", "columna_destino",
+    "inclusion", "confianza", "valores_revisados",
+]
+
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+
+
+# --- Firmas por columna ---
+def hashes_valores(valores):
+    # Mismo hash para el mismo texto en columnas Arrow y object (hojas en streaming)
+    return pd.util.hash_pandas_object(pd.Series(valores), index=False).to_numpy()
+
+
+def _posiciones_bloom(hashes, bits):
+    # Doble hashing: h1 + i * h2 con las dos mitades de cada hash de 64 bits
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    h1 = hashes & _MASCARA_32
+    h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+    i = np.arange(FUNCIONES_BLOOM, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return (h1[..., None] + i * h2[..., None]) & np.uint64(bits - 1)
+
+
+def filtro_bloom(hashes):
+    """Filtro de Bloom (bytes) de un arreglo de hashes; el número de bits es potencia de 2."""
+    bits = 1 << max(6, int(np.ceil(np.log2(max(len(hashes), 1) * BITS_POR_VALOR))))
+    filtro = np.zeros(bits // 8, dtype=np.uint8)
+    posiciones = _posiciones_bloom(hashes, bits).ravel()
+    np.bitwise_or.at(filtro, (posiciones >> np.uint64(3)).astype(np.int64), (1 << (posiciones & np.uint64(7))).astype(np.uint8))
+    return filtro.tobytes()
+
+
+def en_bloom(filtro, hashes):
+    """Máscara (misma forma que `hashes`) de los hashes presentes en el filtro."""
+    bits = len(filtro) * 8
+    posiciones = _posiciones_bloom(hashes, bits)
+    encendidos = filtro[(posiciones >> np.uint64(3)).astype(np.int64)] >> (posiciones & np.uint64(7)).astype(np.uint8) & 1
+    return encendidos.all(axis=-1)
+
+
+def menores_hashes(hashes, previos=None):
+    # Los K_MUESTRA hashes distintos más pequeños, combinando con los de un bloque anterior
+    if previos is not None:
+        hashes = np.concatenate([previos, hashes])
+    return np.unique(hashes)[:K_MUESTRA]
+
+
+def firma_columna(distintos, muestra, filtro=None):
+    # Solo tipos básicos: viaja en el checkpoint JSON de la CLI y en el cache de Streamlit
+    return {
+        "distintos": int(distintos),
+        "muestra": [int(h) for h in muestra],
+        "filtro": base64.b64encode(filtro).decode("ascii") if filtro is not None else None,
+    }
+
+
+def firmas_columnas(df, perfil_columnas):
+    """{columna: firma} de las columnas con al menos MIN_DISTINTOS valores distintos."""
+    firmas = {}
+    for i, col in enumerate(df.columns):
+        if perfil_columnas.get(col, {}).get("distintos", 0) < MIN_DISTINTOS:
+            continue
+        # Solo se hashean los valores distintos: barato en columnas de baja cardinalidad
+        hashes = hashes_valores(df.iloc[:, i].dropna().unique())
+        # Referenciable: sin nulos ni repetidos, como las candidatas a ID del perfil en streaming
+        referenciable = len(hashes) == len(df) and len(hashes) <= MAX_VALORES_FILTRO
+        filtro = filtro_bloom(hashes) if referenciable else None
+        firmas[col] = firma_columna(len(hashes), menores_hashes(hashes), filtro)
+    return firmas
+
+
+# --- Descubrimiento ---
+# Partes de nombre que no identifican a qué se refiere la columna
+TOKENS_GENERICOS = {"id", "cod", "codigo", "nro", "num", "numero", "n", "clave", "key", "pk", "fk"}
+# Largo mínimo de una parte para contar como coincidencia ("op" dentro de "nropedido" no cuenta)
+MIN_LARGO_TOKEN = 3
+
+
+def _raiz(token):
+    # Plural simple del español: "clientes" -> "cliente", "sucursales" -> "sucursal"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lrndz":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokens_nombre(nombre):
+    """Partes significativas de un nombre, separadas por símbolos, espacios, camelCase y dígitos."""
+    texto = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(nombre))
+    partes = [p for parte in re.split(r"[\W_]+", texto) for p in re.findall(r"[a-z]+|\d+", normalizar_nombre(parte))]
+    return {_raiz(p) for p in partes if len(p) >= MIN_LARGO_TOKEN and p not in TOKENS_GENERICOS}
+
+
+def _afinidad(columna_origen, columna_destino, tabla_destino):
+    # Las partes significativas de una columna (o de la tabla referenciada) están en la otra;
+    # nombres sin partes significativas ("id", "op") no aportan afinidad ni siquiera si son iguales
+    origen, destino = tokens_nombre(columna_origen), tokens_nombre(columna_destino)
+    tabla = tokens_nombre(tabla_destino)
+    if not origen:
+        return False
+    return bool(destino and (destino <= origen or origen <= destino)) or bool(tabla and tabla <= origen)
+
+
+def _columnas(tablas):
+    # Una fila por columna con firma; las hojas duplicadas de otra no aportan relaciones nuevas
+    filas = []
+    for t in tablas:
+        if t.get("duplicado_de"):
+            continue
+        for col, firma in t.get("firmas_columnas", {}).items():
+            perfil_col = t["perfil_columnas"].get(col, {})
+            # Las fechas coinciden entre tablas sin ser referencias
+            if perfil_col.get("tipo") == tipo_dato.fecha.value or not firma["muestra"]:
+                continue
+            filas.append({
+                "tabla": t,
+                "columna": col,
+                "tipo": perfil_col.get("tipo", ""),
+                "longitud_max": perfil_col.get("longitud_max") or 0,
+                "distintos": firma["distintos"],
+                "muestra": np.array(firma["muestra"], dtype=np.uint64),
+                "filtro": np.frombuffer(base64.b64decode(firma["filtro"]), dtype=np.uint8) if firma["filtro"] else None,
+            })
+    return filas
+
+
+def descubrir_relaciones(tablas, umbral=UMBRAL_INCLUSION):
+    """Lista de relaciones {campo: valor} (ver CAMPOS_RELACIONES), una por columna origen.
+
+    Cada columna origen se asocia con la columna referenciada más probable:
+    primero las de nombre afín, luego la de mayor inclusión y menor
+    cardinalidad. Las columnas numéricas solo se relacionan con nombre afín
+    (secuencias 1..n coinciden entre tablas sin ser referencias).
+    """
+    columnas = _columnas(tablas)
+    if not columnas:
+        return []
+    tipos = np.array([c["tipo"] for c in columnas])
+    tablas_ids = np.array([c["tabla"]["table_id"] for c in columnas])
+    distintos = np.array([c["distintos"] for c in columnas], dtype=float)
+    longitudes = np.array([c["longitud_max"] for c in columnas])
+    # Cabeza de cada muestra; las muestras más cortas se repiten (un hash repetido no cambia la proporción)
+    cabezas = np.array([np.resize(c["muestra"][:K_PRUEBA], K_PRUEBA) for c in columnas], dtype=np.uint64)
+
+    mejores = {}
+    for destino in (c for c in columnas if c["filtro"] is not None):
+        # --- Poda: mismo tipo, otra tabla, no más distintos ni valores más largos que la referenciada ---
+        candidatas = np.flatnonzero(
+            (tipos == destino["tipo"])
+            & (tablas_ids != destino["tabla"]["table_id"])
+            & (distintos <= destino["distintos"] * HOLGURA_DISTINTOS)
+            & (longitudes <= destino["longitud_max"])
+        )
+        if not len(candidatas):
+            continue
+        # --- Prueba rápida: la cabeza de todas las candidatas contra el filtro, en una sola operación ---
+        candidatas = candidatas[en_bloom(destino["filtro"], cabezas[candidatas]).mean(axis=1) >= umbral]
+        for i in candidatas:
+            origen = columnas[i]
+            # Dos claves con los mismos valores (relación 1 a 1): se informa una sola dirección
+            if origen["filtro"] is not None and origen["distintos"] == destino["distintos"] \
+                    and origen["tabla"]["table_id"] < destino["tabla"]["table_id"]:
+                continue
+            afin = _afinidad(origen["columna"], destino["columna"], destino["tabla"]["sheet_name"])
+            if origen["tipo"] == tipo_dato.numero.value and not afin:
+                continue
+            inclusion = float(en_bloom(destino["filtro"], origen["muestra"]).mean())
+            if inclusion < umbral:
+                continue
+            orden = (afin, inclusion, -destino["distintos"])
+            clave = (origen["tabla"]["table_id"], origen["columna"])
+            if clave not in mejores or orden > mejores[clave][0]:
+                mejores[clave] = (orden, origen, destino, inclusion, afin)
+
+    relaciones = []
+    for _, origen, destino, inclusion, afin in sorted(mejores.values(), key=lambda m: (m[1]["tabla"]["table_id"], m[1]["columna"])):
+        relaciones.append({
+            "table_id_origen": origen["tabla"]["table_id"],
+            "tabla_origen": f"{origen['tabla']['file_name']} › {origen['tabla']['sheet_name']}",
+            "columna_origen": origen["columna"],
+            "table_id_destino": destino["tabla"]["table_id"],
+            "tabla_destino": f"{destino['tabla']['file_name']} › {destino['tabla']['sheet_name']}",
+            "columna_destino": destino["columna"],
+            "inclusion": f"{inclusion:.0%}",
+            "confianza": "alta" if afin else "media",
+            "valores_revisados": len(origen["muestra"]),
+        })
+    return relaciones
+
+
+def relaciones_df(relaciones):
+    return pd.DataFrame(relaciones, columns=CAMPOS_RELACIONES)
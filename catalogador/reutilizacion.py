@@ -0,0 +1,200 @@
+"""Índice local de columnas ya catalogadas para reutilizar sus descripciones.
+
+Una columna de una hoja nueva se compara con las del índice que tienen el
+mismo nombre normalizado ("Fecha Corte", "fecha_corte" y "FechaCorte" son la
+misma clave). Entre esos candidatos se elige el de mayor similitud de valores,
+estimada con MinHash sobre los valores mismos; la forma de los valores
+("P001" -> "a999") debe coincidir además con un umbral más estricto. Así una
+columna "codigo" de productos (P001, P017) no hereda la descripción de un
+"codigo" de entidades (E900, E431) aunque ambas tengan la misma forma. Las
+columnas reconocidas con suficiente similitud no se envían al modelo.
+
+El índice se alimenta de las respuestas del modelo, de las ediciones que el
+usuario guarda en el catálogo local y de los DICCIONARIO cargados como
+catálogo anterior (estos dos últimos tienen prioridad: fueron revisados).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from catalogador.huellas import NUM_PERMUTACIONES, firma_minhash
+from catalogador.perfil import CAMPOS_PERFIL
+
+# Similitud de Jaccard estimada mínima de los valores para reutilizar una descripción
+UMBRAL_SIMILITUD = 0.5
+# Similitud mínima de las formas: valores comunes en columnas de formato distinto no bastan
+UMBRAL_FORMA = 0.8
+MAX_VALORES_FIRMA = 50
+
+
+def normalizar_nombre(nombre):
+    # Sin tildes, mayúsculas ni separadores: solo letras y dígitos
+    texto = unicodedata.normalize("NFKD", str(nombre))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^0-9a-z]", "", texto.lower())
+
+
+def _texto(valor):
+    # Celdas vacías de un DataFrame llegan como NaN
+    return valor.strip() if isinstance(valor, str) else ""
+
+
+def forma_valor(valor):
+    # Cada dígito se vuelve "9" y cada tramo de letras una "a"; la puntuación se conserva
+    forma = re.sub(r"\d", "9", str(valor).strip())
+    return re.sub(r"[^\W\d_]+", "a", forma)
+
+
+def _minhash(fichas):
+    return firma_minhash([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=4).digest(), "little") for f in fichas])
+
+
+def firma_valores(valores):
+    """Firma MinHash de una columna: formas de los valores seguidas de los valores; None si está vacía."""
+    valores = [str(v).strip() for v in valores if v is not None and str(v).strip()][:MAX_VALORES_FIRMA]
+    if not valores:
+        return None
+    return np.concatenate([_minhash({forma_valor(v) for v in valores}), _minhash({v.lower() for v in valores})])
+
+
+def similitud(firma_a, firma_b, umbral_forma=UMBRAL_FORMA):
+    # Similitud de valores; 0 si las formas no coinciden al menos en `umbral_forma` (la forma sola no basta)
+    if firma_a is None or firma_b is None or len(firma_a) != len(firma_b):
+        return 0.0
+    iguales = firma_a == firma_b
+    if iguales[:NUM_PERMUTACIONES].mean() < umbral_forma:
+        return 0.0
+    return float(iguales[NUM_PERMUTACIONES:].mean())
+
+
+class IndiceColumnas:
+    """Columnas descritas (SQLite), una entrada por nombre normalizado y descripción.
+
+    Una misma descripción vista en varias hojas acumula usos y une las firmas
+    (el mínimo elemento a elemento es la firma MinHash de la unión).
+    """
+
+    def __init__(self, ruta, umbral=UMBRAL_SIMILITUD):
+        self.ruta = ruta
+        self.umbral = umbral
+        self.reutilizadas = 0
+        self.consultadas = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS columnas (
+                    clave TEXT NOT NULL,
+                    huella_descripcion TEXT NOT NULL,
+                    nombre TEXT NOT NULL,
+                    descripcion TEXT NOT NULL,
+                    new_name TEXT NOT NULL DEFAULT '',
+                    reason TEXT NOT NULL DEFAULT '',
+                    firma BLOB,
+                    revisada INTEGER NOT NULL DEFAULT 0,
+                    usos INTEGER NOT NULL DEFAULT 1,
+                    actualizado REAL NOT NULL,
+                    PRIMARY KEY (clave, huella_descripcion)
+                )"""
+            )
+
+    def agregar(self, nombre, descripcion, valores=(), new_name="", reason="", revisada=False):
+        clave = normalizar_nombre(nombre)
+        descripcion = _texto(descripcion)
+        if not clave or not descripcion:
+            return
+        huella = hashlib.sha256(descripcion.encode("utf-8")).hexdigest()[:16]
+        firma = firma_valores(valores)
+        with self._lock, self._conn:
+            previa = self._conn.execute(
+                "SELECT firma FROM columnas WHERE clave = ? AND huella_descripcion = ?", (clave, huella)
+            ).fetchone()
+            if previa is None:
+                self._conn.execute(
+                    "INSERT INTO columnas VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                    (clave, huella, str(nombre), descripcion, _texto(new_name), _texto(reason),
+                     None if firma is None else firma.tobytes(), int(revisada), time.time()),
+                )
+                return
+            if previa[0] is not None:
+                anterior = np.frombuffer(previa[0], dtype=np.uint64)
+                firma = anterior if firma is None else np.minimum(anterior, firma)
+            self._conn.execute(
+                """UPDATE columnas SET firma = ?, new_name = ?, reason = ?, revisada = MAX(revisada, ?),
+                   usos = usos + 1, actualizado = ? WHERE clave = ? AND huella_descripcion = ?""",
+                (None if firma is None else firma.tobytes(), _texto(new_name), _texto(reason), int(revisada),
+                 time.time(), clave, huella),
+            )
+
+    def buscar(self, nombre, valores):
+        """Descripción previa de la columna más parecida con el mismo nombre normalizado, o None."""
+        firma = firma_valores(valores)
+        if firma is None:
+            return None
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT descripcion, new_name, reason, firma, revisada, usos FROM columnas WHERE clave = ?",
+                (normalizar_nombre(nombre),),
+            ).fetchall()
+        mejor, orden_mejor = None, None
+        for descripcion, new_name, reason, firma_previa, revisada, usos in filas:
+            if firma_previa is None:
+                continue
+            parecido = similitud(firma, np.frombuffer(firma_previa, dtype=np.uint64))
+            if parecido < self.umbral:
+                continue
+            # Las revisadas por un steward primero; luego la más parecida y la más usada
+            orden = (revisada, parecido, usos)
+            if orden_mejor is None or orden > orden_mejor:
+                mejor, orden_mejor = {"description": descripcion, "new_name": new_name, "reason": reason}, orden
+        return mejor
+
+    def buscar_columnas(self, muestra_tabla):
+        """{columna: {name, description, new_name, reason}} de las columnas reconocidas en la muestra."""
+        conocidas = {}
+        for col, valores in muestra_tabla.items():
+            encontrada = self.buscar(col, valores)
+            if encontrada is not None:
+                conocidas[col] = {"name": col, **encontrada}
+        with self._lock:
+            self.consultadas += len(muestra_tabla)
+            self.reutilizadas += len(conocidas)
+        return conocidas
+
+    def agregar_respuesta(self, muestra_tabla, dict_ia):
+        # Columnas recién descritas por el modelo, con los valores de la muestra como firma
+        for col in dict_ia.get("columns", []):
+            nombre = col.get("name", "")
+            if nombre in muestra_tabla:
+                self.agregar(nombre, col.get("description"), muestra_tabla[nombre], col.get("new_name"), col.get("reason"))
+
+    def indexar_diccionario(self, diccionario, muestras=None):
+        """Agrega las descripciones de un DICCIONARIO (DataFrame) revisado.
+
+        `muestras` ({table_id: muestra_tabla}) aporta valores para la firma; sin
+        ella se usan el mínimo y el máximo del perfil.
+        """
+        muestras = muestras or {}
+        minimo, maximo = CAMPOS_PERFIL["minimo"], CAMPOS_PERFIL["maximo"]
+        for fila in diccionario.to_dict(orient="records"):
+            nombre = fila.get("Atributo", "")
+            valores = muestras.get(fila.get("table_id"), {}).get(nombre) or [
+                v for v in (fila.get(minimo), fila.get(maximo)) if isinstance(v, str)
+            ]
+            self.agregar(
+                nombre, fila.get("Descripción"), valores,
+                fila.get("column_rename_suggestion"), fila.get("reason"), revisada=True,
+            )
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM columnas").fetchone()[0]
+        return {"reutilizadas": self.reutilizadas, "consultadas": self.consultadas, "entradas": entradas}
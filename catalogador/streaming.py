@@ -0,0 +1,340 @@
+import datetime
+import hashlib
+import random
+import re
+
+import numpy as np
+import pandas as pd
+
+from catalogador.claves import HASH_NULO, NO_VERIFICADO, SIN_ID, clave_por_hashes
+from catalogador.huellas import firma_minhash, suma_hashes
+from catalogador.modelos import tipo_dato
+from catalogador.muestreo import ESTRATEGIA_POR_DEFECTO, seleccionar_filas
+from catalogador.normalizacion import DTYPE_TEXTO
+from catalogador.perfil import FORMATOS_FECHA
+from catalogador.privacidad import detectar_datos_personales
+from catalogador.relaciones import (
+    MAX_VALORES_FILTRO, MIN_DISTINTOS, filtro_bloom, firma_columna, hashes_valores, menores_hashes,
+)
+
+# Filas acumuladas antes de calcular sus hashes en bloque (firma de filas para duplicados)
+FILAS_POR_BLOQUE_HASH = 65536
+# Memoria máxima para los hashes por fila de cada columna (búsqueda de claves y filtros de relaciones)
+MAX_BYTES_CLAVES = 256 << 20
+# Mismas reglas que perfil._es_numerica: códigos con ceros a la izquierda son texto
+_CERO_IZQUIERDA = re.compile(r"^-?0\d")
+# Textos que pd.to_numeric convierte a entero o a decimal (admite espacios, signo, exponente e "inf")
+_ENTERO = re.compile(r"\s*[-+]?\d+\s*", re.ASCII)
+_DECIMAL = re.compile(r"\s*[-+]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|inf|infinity)\s*", re.ASCII | re.IGNORECASE)
+_LIMITE_ENTERO = 2 ** 63
+
+
+def normalizar_celda(valor):
+    # Mismo resultado que read_excel(dtype=str) seguido de la limpieza de nulos
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, float):
+        if valor != valor:
+            return None
+        if valor.is_integer():
+            valor = int(valor)
+    elif isinstance(valor, (datetime.datetime, datetime.date)):
+        return str(pd.Timestamp(valor))
+    return str(valor)
+
+
+def nombres_columnas(encabezado):
+    # Replica los nombres que asigna pandas: "Unnamed: i" y sufijos ".1", ".2" en duplicados
+    nombres, vistos = [], {}
+    for i, valor in enumerate(encabezado):
+        nombre = normalizar_celda(valor)
+        if nombre is None:
+            nombre = f"Unnamed: {i}"
+        base = nombre
+        while nombre in vistos:
+            vistos[base] += 1
+            nombre = f"{base}.{vistos[base]}"
+        vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+class EstimadorDistintos:
+    """Estimador KMV (k valores mínimos) de cardinalidad con memoria constante.
+
+    Recibe hashes estables (hash_pandas_object), no hash() de Python, que
+    cambia entre procesos: la estimación es la misma en cada lectura.
+    """
+
+    def __init__(self, k=1024):
+        self.k = k
+        self._menores = np.empty(0, dtype=np.uint64)  # los k hashes distintos más pequeños, ordenados
+
+    def agregar(self, hashes):
+        self._menores = np.unique(np.concatenate([self._menores, np.asarray(hashes, dtype=np.uint64)]))[:self.k]
+
+    def estimar(self):
+        if len(self._menores) < self.k:
+            return len(self._menores)
+        return int((self.k - 1) * (2 ** 64) / int(self._menores[-1]))
+
+
+def _numero(valor):
+    # int o float como los daría pd.to_numeric; None si no es numérico
+    if _ENTERO.fullmatch(valor):
+        numero = int(valor)
+        # Fuera del rango de int64 pandas pasa la columna a decimal
+        return numero if -_LIMITE_ENTERO <= numero < _LIMITE_ENTERO else float(numero)
+    if _DECIMAL.fullmatch(valor):
+        numero = float(valor)
+        if numero in (float("inf"), float("-inf")) and "n" not in valor.lower():
+            return None  # desborde (p. ej. 1e500): pd.to_numeric lo deja nulo
+        return numero
+    return None
+
+
+def tipo_texto(valor):
+    """(tipo, valor comparable, formato de fecha) de una celda según su texto, como perfil.perfilar_columna."""
+    if not _CERO_IZQUIERDA.match(valor):
+        numero = _numero(valor)
+        if numero is not None:
+            return tipo_dato.numero.value, numero, None
+    # Solo se prueban formatos en valores con forma de fecha: evita excepciones en cada texto libre
+    if 8 <= len(valor) <= 19 and valor[0].isdigit():
+        for formato in FORMATOS_FECHA:
+            try:
+                return tipo_dato.fecha.value, datetime.datetime.strptime(valor, formato), formato
+            except ValueError:
+                continue
+    return tipo_dato.texto.value, valor, None
+
+
+def tipo_celda(crudo, valor):
+    """Como tipo_texto sobre el texto normalizado; las fechas nativas sin microsegundos no pasan por strptime."""
+    if isinstance(crudo, datetime.datetime):
+        if crudo.tzinfo is None and not crudo.microsecond:
+            return tipo_dato.fecha.value, crudo, FORMATOS_FECHA[0]
+    elif isinstance(crudo, datetime.date):
+        return tipo_dato.fecha.value, datetime.datetime.combine(crudo, datetime.time()), FORMATOS_FECHA[0]
+    return tipo_texto(valor)
+
+
+class PerfilIncremental:
+    """Recorre una hoja fila por fila sin cargarla completa en memoria.
+
+    Mantiene una muestra reservorio de `tam_candidatas` filas, más la primera
+    fila no nula de cada columna, sobre la que se aplica la estrategia de
+    muestreo del prompt; y, por columna, el conteo
+    de nulos, los valores distintos (exactos o estimados), el tipo inferido del texto, mínimo,
+    máximo y longitud máxima. Guarda además el hash de cada celda por columna
+    (8 bytes) para buscar la clave como claves.tiene_columna_id; si la hoja
+    supera `max_bytes_claves` se descartan y la clave queda sin verificar.
+    """
+
+    def __init__(self, columnas, tam_muestra=10, semilla=1, max_bytes_claves=MAX_BYTES_CLAVES, tam_candidatas=500):
+        self.columnas = columnas
+        self.tam_muestra = tam_muestra
+        self.tam_candidatas = tam_candidatas
+        self.semilla = semilla
+        self.max_bytes_claves = max_bytes_claves
+        self.filas = 0
+        self.nulos = [0] * len(columnas)
+        self._rng = random.Random(semilla)
+        self._reservorio = []
+        self._primera_no_nula = {}  # índice de columna -> primera fila donde no es nula
+        self._distintos = [EstimadorDistintos() for _ in columnas]
+        self._conteo_distintos = None  # (filas, distintos por columna) del último cálculo
+        # El tipo sale del texto de cada celda, igual que en perfil.perfilar_columna
+        self._tipos = [{} for _ in columnas]  # tipo -> [conteo, mínimo, máximo]
+        self._decimales = [False] * len(columnas)  # algún número no entero: mín/máx se muestran como decimales
+        self._extremos_texto = [None] * len(columnas)  # mínimo y máximo lexicográficos de todos los valores
+        self._formatos_fecha = [set() for _ in columnas]
+        self._longitud_max = [0] * len(columnas)
+        # Huella de contenido y firma de filas: mismos hashes que huellas.hashes_filas sobre la hoja completa
+        self._hash_contenido = hashlib.sha256()
+        self._filas_sin_hash = []
+        self._firma_filas = None
+        self._suma_filas = 0
+        # Firmas para relaciones: menores hashes de valores por columna
+        self._menores_valores = [None] * len(columnas)
+        # Hashes por fila de cada columna, en bloques (None si se superó max_bytes_claves)
+        self._hashes_columnas = [[] for _ in columnas]
+
+    def agregar(self, fila):
+        crudos = list(fila[:len(self.columnas)])
+        crudos += [None] * (len(self.columnas) - len(crudos))
+        valores = [normalizar_celda(v) for v in crudos]
+        self.filas += 1
+        self._filas_sin_hash.append(valores)
+        if len(self._filas_sin_hash) >= FILAS_POR_BLOQUE_HASH:
+            self._hashear_filas()
+        # --- Muestra reservorio (algoritmo R) ---
+        if len(self._reservorio) < self.tam_candidatas:
+            self._reservorio.append(valores)
+        else:
+            j = self._rng.randrange(self.filas)
+            if j < self.tam_candidatas:
+                self._reservorio[j] = valores
+        for i, valor in enumerate(valores):
+            if valor is None:
+                self.nulos[i] += 1
+                continue
+            tipo, comparable, formato = tipo_celda(crudos[i], valor)
+            if formato is not None:
+                self._formatos_fecha[i].add(formato)
+            elif isinstance(comparable, float):
+                self._decimales[i] = True
+            extremos = self._extremos_texto[i]
+            if extremos is None:
+                self._extremos_texto[i] = [valor, valor]
+            elif valor < extremos[0]:
+                extremos[0] = valor
+            elif valor > extremos[1]:
+                extremos[1] = valor
+            acumulado = self._tipos[i].get(tipo)
+            if acumulado is None:
+                self._tipos[i][tipo] = [1, comparable, comparable]
+            else:
+                acumulado[0] += 1
+                if comparable < acumulado[1]:
+                    acumulado[1] = comparable
+                elif comparable > acumulado[2]:
+                    acumulado[2] = comparable
+            if i not in self._primera_no_nula:
+                self._primera_no_nula[i] = valores
+            if len(valor) > self._longitud_max[i]:
+                self._longitud_max[i] = len(valor)
+
+    def _hashear_filas(self):
+        if not self._filas_sin_hash:
+            return
+        bloque = pd.DataFrame(self._filas_sin_hash, columns=range(len(self.columnas)), dtype=object)
+        hashes = pd.util.hash_pandas_object(bloque, index=False).to_numpy()
+        # Los bloques llegan en orden: concatenar sus bytes equivale a huellas.hash_contenido de la hoja
+        self._hash_contenido.update(hashes.tobytes())
+        self._firma_filas = firma_minhash(hashes, self._firma_filas)
+        self._suma_filas = suma_hashes(hashes, self._suma_filas)
+        if self._hashes_columnas is not None and self.filas * len(self.columnas) * 8 > self.max_bytes_claves:
+            self._hashes_columnas = None
+        for i in range(len(self.columnas)):
+            valores = hashes_valores(bloque[i].dropna().unique())
+            self._menores_valores[i] = menores_hashes(valores, self._menores_valores[i])
+            self._distintos[i].agregar(valores)
+            if self._hashes_columnas is not None:
+                # Mismos hashes que claves._Columnas sobre la hoja en memoria (los nulos incluidos)
+                self._hashes_columnas[i].append(pd.util.hash_pandas_object(bloque[i], index=False).to_numpy())
+        self._filas_sin_hash = []
+
+    def _hashes_por_columna(self):
+        # Une los bloques una sola vez; None si la hoja superó max_bytes_claves
+        self._hashear_filas()
+        if self._hashes_columnas is None:
+            return None
+        self._hashes_columnas = [
+            [np.concatenate(bloques) if bloques else np.empty(0, dtype=np.uint64)]
+            for bloques in self._hashes_columnas
+        ]
+        return [bloques[0] for bloques in self._hashes_columnas]
+
+    def huellas_duplicados(self):
+        # Mismo formato que huellas.huellas_duplicados
+        self._hashear_filas()
+        return {
+            "huella_filas": f"{self.filas}:{self._suma_filas:016x}",
+            "firma_filas": (self._firma_filas if self._firma_filas is not None else firma_minhash([])).tolist(),
+        }
+
+    def firmas_columnas(self):
+        # Mismo formato que relaciones.firmas_columnas; mismos distintos que el perfil
+        hashes_columnas = self._hashes_por_columna()
+        conteo = self._distintos_columnas()
+        firmas = {}
+        for i, col in enumerate(self.columnas):
+            distintos = conteo[i]
+            if distintos < MIN_DISTINTOS or self._menores_valores[i] is None:
+                continue
+            filtro = None
+            # Referenciable: sin nulos ni repetidos, como en relaciones.firmas_columnas
+            if hashes_columnas is not None and not self.nulos[i] and self.filas <= MAX_VALORES_FILTRO:
+                hashes = hashes_columnas[i]
+                if len(np.unique(hashes)) == len(hashes):
+                    filtro = filtro_bloom(hashes)
+            firmas[col] = firma_columna(distintos, self._menores_valores[i], filtro)
+        return firmas
+
+    def muestra_tabla(self, estrategia=ESTRATEGIA_POR_DEFECTO):
+        # Las filas candidatas sin repetir: la primera no nula de una columna puede estar en el reservorio
+        filas = {id(f): f for f in self._reservorio}
+        filas.update({id(f): f for f in self._primera_no_nula.values()})
+        candidatas = pd.DataFrame(list(filas.values()), columns=range(len(self.columnas)), dtype=object)
+        muestra = seleccionar_filas(candidatas, self.tam_muestra, self.semilla, estrategia)
+        return {
+            col: muestra[i].tolist()
+            for i, col in enumerate(self.columnas)
+        }
+
+    def datos_personales(self):
+        # La muestra reservorio es uniforme sobre toda la hoja: basta para estimar la proporción de coincidencias
+        candidatas = pd.DataFrame(self._reservorio, columns=self.columnas, dtype=object).astype(DTYPE_TEXTO)
+        return detectar_datos_personales(candidatas)
+
+    def _formatos_fecha_columna(self, i):
+        return ", ".join(f for f in FORMATOS_FECHA if f in self._formatos_fecha[i])
+
+    def _distintos_columnas(self):
+        # Exactos con los hashes guardados (como nunique en la hoja en memoria); si no, la estimación KMV
+        if self._conteo_distintos is None or self._conteo_distintos[0] != self.filas:
+            hashes_columnas = self._hashes_por_columna()
+            if hashes_columnas is None:
+                conteo = [est.estimar() for est in self._distintos]
+            else:
+                conteo = [int(np.count_nonzero(np.unique(h) != HASH_NULO)) for h in hashes_columnas]
+            self._conteo_distintos = (self.filas, conteo)
+        return self._conteo_distintos[1]
+
+    def distintos(self):
+        return dict(zip(self.columnas, self._distintos_columnas()))
+
+    def perfil_columnas(self):
+        # Mismo resultado que perfil.perfilar_columnas: numérica o fecha solo si lo son todos los valores
+        perfiles = {}
+        conteo = self._distintos_columnas()
+        for i, col in enumerate(self.columnas):
+            tipos = self._tipos[i]
+            tipo = next(iter(tipos)) if len(tipos) == 1 else tipo_dato.texto.value
+            minimo, maximo = self._extremos_texto[i] or (None, None)
+            if tipo == tipo_dato.numero.value:
+                minimo, maximo = (str(float(v)) if self._decimales[i] else str(v) for v in tipos[tipo][1:])
+            elif tipo == tipo_dato.fecha.value:
+                minimo, maximo = (normalizar_celda(v) for v in tipos[tipo][1:])
+            perfiles[col] = {
+                "tipo": tipo,
+                "pct_nulos": round(100 * self.nulos[i] / self.filas, 1) if self.filas else 0.0,
+                "distintos": conteo[i],
+                "minimo": minimo,
+                "maximo": maximo,
+                "formatos_fecha": self._formatos_fecha_columna(i) if tipo == tipo_dato.fecha.value else "",
+                "longitud_max": self._longitud_max[i],
+            }
+        return perfiles
+
+    def hash_contenido(self):
+        self._hashear_filas()
+        return self._hash_contenido.hexdigest()[:16]
+
+    def columna_id(self, max_columnas=3):
+        # Misma búsqueda que claves.tiene_columna_id (columna simple o clave compuesta mínima) sobre los hashes guardados
+        hashes_columnas = self._hashes_por_columna()
+        if hashes_columnas is None:
+            # Sin hashes no se verifica ninguna clave: una estimación de distintos no basta para afirmarla
+            return SIN_ID if all(self.nulos) else NO_VERIFICADO
+        return clave_por_hashes(self.columnas, hashes_columnas, max_columnas)
+
+
+def perfilar_filas(filas, tam_muestra=10, semilla=1):
+    filas = iter(filas)
+    encabezado = next(filas, None)
+    perfil = PerfilIncremental(nombres_columnas(encabezado or []), tam_muestra, semilla)
+    for fila in filas:
+        perfil.agregar(fila)
+    return perfil
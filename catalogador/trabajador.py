@@ -0,0 +1,60 @@
+"""Arranque de los procesos lectores sin volver a ejecutar la página de Streamlit.
+
+Con forkserver y spawn, multiprocessing re-ejecuta el módulo __main__ en cada
+proceso nuevo. En la app ese módulo es la página (02_Catalogador_Multiple.py):
+cada lector leería secrets, dibujaría la interfaz y crearía otro pool. Mientras
+se arranca un proceso, __main__ pasa a ser este módulo, que no hace nada al
+importarse; el servidor de forkserver precarga solo catalogador.pipeline.
+"""
+import contextlib
+import multiprocessing
+import sys
+import threading
+from multiprocessing import context
+
+# Módulos que el servidor de forkserver importa una vez para todos los lectores
+PRECARGA = ["catalogador.pipeline"]
+
+_candado = threading.Lock()
+
+
+@contextlib.contextmanager
+def _este_modulo_como_main():
+    with _candado:
+        principal = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            # Streamlit reemplaza __main__ en cada ejecución de la página: solo se restaura si sigue siendo este módulo
+            if sys.modules["__main__"] is sys.modules[__name__]:
+                sys.modules["__main__"] = principal
+
+
+class _ProcesoSpawn(context.SpawnProcess):
+    def start(self):
+        with _este_modulo_como_main():
+            super().start()
+
+
+class _ContextoSpawn(context.SpawnContext):
+    Process = _ProcesoSpawn
+
+
+if sys.platform != "win32":
+    class _ProcesoForkserver(context.ForkServerProcess):
+        def start(self):
+            with _este_modulo_como_main():
+                super().start()
+
+    class _ContextoForkserver(context.ForkServerContext):
+        Process = _ProcesoForkserver
+
+
+def contexto():
+    """Contexto para ProcessPoolExecutor: forkserver donde existe, si no spawn."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = _ContextoForkserver()
+        ctx.set_forkserver_preload(PRECARGA)
+        return ctx
+    return _ContextoSpawn()
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from catalogador.almacen import AlmacenCatalogo
+from catalogador.relaciones import relaciones_df
+
+
+def _catalogo(tablas):
+    """METADATOS y DICCIONARIO mínimos: tablas es [(table_id, file_name, table_name, {atributo: descripción})]."""
+    metadatos = pd.DataFrame([
+        {"file_name": f, "table_id": t, "table_name": n, "table_description": f"Tabla {n}", "domain": "Créditos"}
+        for t, f, n, _ in tablas
+    ])
+    diccionario = pd.DataFrame([
+        {"file_name": f, "table_name": n, "table_id": t, "id_atributo": f"a{i:03d}", "Atributo": a,
+         "Descripción": d, "Tipo de dato": "texto", "column_rename_suggestion": "", "reason": ""}
+        for t, f, n, atributos in tablas for i, (a, d) in enumerate(atributos.items(), start=1)
+    ])
+    return metadatos, diccionario
+
+
+def _relacion(origen, destino, columna):
+    return {
+        "table_id_origen": origen, "tabla_origen": "", "columna_origen": columna,
+        "table_id_destino": destino, "tabla_destino": "", "columna_destino": columna,
+        "inclusion": 1.0, "confianza": "alta", "valores_revisados": 100,
+    }
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenCatalogo(str(tmp_path / "catalogo.sqlite"))
+
+
+@pytest.mark.parametrize("texto_completo", [True, False])
+def test_busqueda_por_descripcion(almacen, texto_completo):
+    if texto_completo and not almacen.texto_completo:
+        pytest.skip("SQLite sin FTS5")
+    almacen.guardar(*_catalogo([
+        ("T001", "creditos.xlsx", "Prestamos", {"monto": "Monto desembolsado en soles", "agencia": "Agencia de origen"}),
+        ("T002", "clientes.xlsx", "Clientes", {"dni": "Documento de identidad del cliente"}),
+    ]))
+    # Sin FTS5 la búsqueda cae a LIKE: mismos resultados para palabras completas
+    almacen.texto_completo = texto_completo
+    encontrados = almacen.buscar("desembolsado soles")
+    assert encontrados[["tipo", "table_id", "atributo"]].values.tolist() == [["atributo", "T001", "monto"]]
+    assert set(almacen.buscar("cliente", dominio="Créditos")["table_id"]) == {"T002"}
+    assert almacen.buscar("cliente", dominio="Otro").empty
+
+
+def test_historial_de_campos_editados(almacen):
+    almacen.guardar(*_catalogo([("T001", "creditos.xlsx", "Prestamos", {"monto": "Monto"})]))
+    metadatos, diccionario = _catalogo([("T001", "creditos.xlsx", "Prestamos", {"monto": "Monto desembolsado"})])
+    metadatos.loc[0, "domain"] = "Finanzas"
+    assert almacen.guardar(metadatos, diccionario) == 2
+    historial = almacen.historial("creditos.xlsx", "Prestamos")
+    cambios = sorted(historial[["atributo", "campo", "anterior", "nuevo"]].values.tolist())
+    assert cambios == [["", "domain", "Créditos", "Finanzas"], ["monto", "Descripción", "Monto", "Monto desembolsado"]]
+
+
+def test_tablas_conservadas_se_renumeran_con_sus_relaciones(almacen):
+    almacen.guardar(*_catalogo([
+        ("T001", "creditos.xlsx", "Prestamos", {"id_cliente": "Cliente"}),
+        ("T002", "creditos.xlsx", "Clientes", {"id_cliente": "Identificador del cliente"}),
+        ("T003", "agencias.xlsx", "Agencias", {"agencia": "Agencia"}),
+    ]), relaciones_df([_relacion("T001", "T002", "id_cliente"), _relacion("T001", "T003", "agencia")]))
+    # Nueva sesión con solo agencias.xlsx: las tablas de creditos.xlsx se conservan detrás con table_id nuevos
+    almacen.guardar(*_catalogo([("T001", "agencias.xlsx", "Agencias", {"agencia": "Agencia"})]), relaciones_df([]))
+    metadatos, diccionario = almacen.cargar()
+    assert metadatos[["table_id", "table_name"]].values.tolist() == [["T001", "Agencias"], ["T002", "Prestamos"], ["T003", "Clientes"]]
+    assert sorted(set(diccionario["table_id"])) == ["T001", "T002", "T003"]
+    # La relación entre tablas conservadas sigue con los table_id nuevos; la que iba a la tabla reemplazada se descarta
+    relaciones = almacen.relaciones()
+    assert relaciones[["table_id_origen", "table_id_destino", "columna_origen"]].values.tolist() == [["T002", "T003", "id_cliente"]]
+    assert almacen.buscar("Identificador")["table_id"].tolist() == ["T003"]
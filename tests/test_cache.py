@@ -0,0 +1,88 @@
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from catalogador import cache as modulo_cache, llm
+from catalogador.cache import CacheDescripciones, clave_cache
+
+MUESTRA = {"agencia": ["AG1", "AG2"], "monto": ["10.5", "20"]}
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1_700_000_000.0
+
+    def time(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(modulo_cache, "time", reloj)
+    return reloj
+
+
+def test_expira_pasado_el_ttl(tmp_path, reloj):
+    cache = CacheDescripciones(str(tmp_path / "cache.sqlite"), ttl_dias=1)
+    cache.guardar("a", {"table_description": "x"})
+    reloj.ahora += 86400 - 1
+    assert cache.obtener("a") == {"table_description": "x"}
+    reloj.ahora += 2
+    assert cache.obtener("a") is None
+    assert cache.estadisticas() == {"aciertos": 1, "fallos": 1, "entradas": 0}
+
+
+def test_limite_elimina_la_de_acceso_menos_reciente(tmp_path, reloj):
+    cache = CacheDescripciones(str(tmp_path / "cache.sqlite"), max_entradas=2)
+    cache.guardar("a", {"n": 1})
+    reloj.ahora += 1
+    cache.guardar("b", {"n": 2})
+    reloj.ahora += 1
+    # Leer "a" la vuelve la más reciente: al entrar "c" sale "b"
+    assert cache.obtener("a") == {"n": 1}
+    reloj.ahora += 1
+    cache.guardar("c", {"n": 3})
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == {"n": 1}
+    assert cache.obtener("c") == {"n": 3}
+    assert cache.estadisticas()["entradas"] == 2
+
+
+def test_la_clave_cambia_con_version_modelo_y_contexto():
+    base = clave_cache(MUESTRA, "contexto", "modelo", "3")
+    assert base == clave_cache(dict(MUESTRA), " contexto ", "modelo", "3")
+    assert base != clave_cache(MUESTRA, "contexto", "modelo", "4")
+    assert base != clave_cache(MUESTRA, "contexto", "otro", "3")
+    assert base != clave_cache(MUESTRA, "otro contexto", "modelo", "3")
+
+
+class ClienteFalso:
+    def __init__(self):
+        self.llamadas = 0
+        self.responses = self
+
+    def parse(self, model, input, text_format):
+        self.llamadas += 1
+        columnas = [{"name": c, "description": f"desc {c}", "new_name": "", "reason": ""} for c in MUESTRA]
+        return types.SimpleNamespace(
+            output_parsed=types.SimpleNamespace(dict=lambda: {"table_description": "t", "columns": columnas}),
+            usage=None,
+        )
+
+
+def test_cambiar_version_prompt_no_usa_respuestas_cacheadas(tmp_path, monkeypatch):
+    cache = CacheDescripciones(str(tmp_path / "cache.sqlite"))
+    cliente = ClienteFalso()
+
+    def describir():
+        with ThreadPoolExecutor(1) as executor:
+            return llm.resolver(llm.enviar_tablas(executor, cliente, {"T001": MUESTRA}, "", cache=cache))
+
+    primera = describir()
+    assert describir() == primera
+    assert cliente.llamadas == 1
+    monkeypatch.setattr(llm, "VERSION_PROMPT", llm.VERSION_PROMPT + "-nueva")
+    assert describir() == primera
+    assert cliente.llamadas == 2
@@ -0,0 +1,29 @@
+from catalogador.diccionario import AlmacenDiccionario
+from catalogador.reutilizacion import IndiceColumnas
+
+
+def _almacen():
+    return AlmacenDiccionario([
+        {"table_id": "T001", "Atributo": "codigo", "Descripción": "Texto del modelo", "reason": ""},
+        {"table_id": "T001", "Atributo": "monto", "Descripción": "Texto del modelo", "reason": ""},
+        {"table_id": "T002", "Atributo": "fecha", "Descripción": "Texto del modelo", "reason": ""},
+    ])
+
+
+def test_solo_lo_editado_se_entrega_una_vez():
+    almacen = _almacen()
+    almacen.aplicar_cambios("T001", {"edited_rows": {1: {"Descripción": "Monto del préstamo en soles"}}})
+    editados = almacen.tomar_editados()
+    assert editados["Atributo"].tolist() == ["monto"]
+    assert editados["Descripción"].tolist() == ["Monto del préstamo en soles"]
+    assert almacen.tomar_editados().empty
+
+
+def test_guardar_dos_veces_no_suma_usos(tmp_path):
+    almacen = _almacen()
+    indice = IndiceColumnas(str(tmp_path / "indice.sqlite"))
+    almacen.aplicar_cambios("T001", {"edited_rows": {1: {"Descripción": "Monto del préstamo en soles"}}})
+    for _ in range(2):
+        indice.indexar_diccionario(almacen.tomar_editados(), {"T001": {"monto": ["10", "20", "30"]}})
+    filas = indice._conn.execute("SELECT nombre, usos, revisada FROM columnas").fetchall()
+    assert filas == [("monto", 1, 1)]
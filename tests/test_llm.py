@@ -0,0 +1,134 @@
+import types
+
+import httpx
+import openai
+import pytest
+
+from catalogador import llm
+from catalogador.llm import Circuito, CircuitoAbierto, LimitadorTasa, describir_parte
+
+
+class RelojFalso:
+    """Reemplaza al módulo time en llm: sleep avanza el reloj sin esperar."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.ahora
+
+    perf_counter = monotonic
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(llm, "time", reloj)
+    return reloj
+
+
+def _error(clase, estado):
+    solicitud = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    if clase is openai.APIConnectionError:
+        return clase(request=solicitud)
+    return clase("error", response=httpx.Response(estado, request=solicitud), body=None)
+
+
+class ClienteFalso:
+    """Responde con los errores de `fallas` en orden y luego con una respuesta válida."""
+
+    def __init__(self, *fallas):
+        self.fallas = list(fallas)
+        self.llamadas = 0
+        self.responses = self
+
+    def parse(self, model, input, text_format):
+        self.llamadas += 1
+        if self.fallas:
+            raise self.fallas.pop(0)
+        return types.SimpleNamespace(
+            output_parsed=types.SimpleNamespace(dict=lambda: {"table_description": "ok", "columns": []}),
+            usage=types.SimpleNamespace(total_tokens=10),
+        )
+
+
+MENSAJES = [{"role": "user", "content": "describe"}]
+
+
+def test_limitador_espera_a_que_se_recarguen_las_fichas(reloj):
+    limitador = LimitadorTasa(solicitudes_por_minuto=60, tokens_por_minuto=600)
+    limitador.adquirir(300)
+    limitador.adquirir(300)
+    assert reloj.esperas == []
+    # La cubeta de tokens está vacía: 300 tokens a 10 por segundo son 30 segundos
+    limitador.adquirir(300)
+    assert sum(reloj.esperas) == pytest.approx(30.0)
+
+
+def test_limitador_recorta_solicitudes_mayores_que_la_cubeta(reloj):
+    limitador = LimitadorTasa(tokens_por_minuto=600)
+    limitador.adquirir(5000)
+    assert reloj.esperas == []
+
+
+def test_circuito_abre_prueba_y_cierra(reloj):
+    circuito = Circuito(umbral=2, enfriamiento=60.0)
+    circuito.registrar_fallo()
+    circuito.verificar()
+    circuito.registrar_fallo()
+    assert circuito.abierto
+    with pytest.raises(CircuitoAbierto):
+        circuito.verificar()
+    # Pasado el enfriamiento pasa una sola llamada de prueba (semiabierto)
+    reloj.ahora += 61
+    circuito.verificar()
+    with pytest.raises(CircuitoAbierto):
+        circuito.verificar()
+    circuito.registrar_exito()
+    assert not circuito.abierto
+    circuito.verificar()
+
+
+def test_circuito_reabre_si_falla_la_prueba(reloj):
+    circuito = Circuito(umbral=1, enfriamiento=60.0)
+    circuito.registrar_fallo()
+    reloj.ahora += 61
+    circuito.verificar()
+    circuito.registrar_fallo()
+    with pytest.raises(CircuitoAbierto):
+        circuito.verificar()
+
+
+def test_reintenta_errores_transitorios_con_espera(reloj, monkeypatch):
+    monkeypatch.setattr(llm.random, "uniform", lambda a, b: b)
+    cliente = ClienteFalso(_error(openai.RateLimitError, 429), _error(openai.APIConnectionError, None))
+    circuito = Circuito(umbral=5)
+    assert describir_parte(cliente, MENSAJES, circuito=circuito)["table_description"] == "ok"
+    assert cliente.llamadas == 3
+    # Espera exponencial: ESPERA_BASE * 2 ** intento
+    assert reloj.esperas == [llm.ESPERA_BASE, 2 * llm.ESPERA_BASE]
+    assert not circuito.abierto
+
+
+def test_agota_los_reintentos(reloj):
+    cliente = ClienteFalso(*[_error(openai.InternalServerError, 500) for _ in range(3)])
+    with pytest.raises(openai.InternalServerError):
+        describir_parte(cliente, MENSAJES, reintentos=2)
+    assert cliente.llamadas == 3
+
+
+def test_error_no_transitorio_falla_sin_reintentar_ni_abrir_el_circuito(reloj):
+    circuito = Circuito(umbral=1)
+    for _ in range(3):
+        cliente = ClienteFalso(_error(openai.BadRequestError, 400))
+        with pytest.raises(openai.BadRequestError):
+            describir_parte(cliente, MENSAJES, circuito=circuito)
+        assert cliente.llamadas == 1
+    assert reloj.esperas == []
+    assert not circuito.abierto
+    circuito.verificar()
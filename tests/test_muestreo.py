@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from catalogador import muestreo
+from catalogador.muestreo import ESTRATEGIAS, seleccionar_filas
+
+
+@pytest.mark.parametrize("estrategia", list(ESTRATEGIAS))
+def test_cada_estrategia_se_despacha_desde_el_registro(monkeypatch, estrategia):
+    llamadas = []
+    original = ESTRATEGIAS[estrategia]
+
+    def espia(df, n, semilla=1):
+        llamadas.append(n)
+        return original(df, n, semilla)
+
+    monkeypatch.setitem(muestreo.ESTRATEGIAS, estrategia, espia)
+    df = pd.DataFrame({"a": [str(i) for i in range(50)], "b": [None if i % 2 else "x" for i in range(50)]})
+    muestra = seleccionar_filas(df, 10, estrategia=estrategia)
+    assert llamadas == [10]
+    assert 0 < len(muestra) <= 10
+
+
+def test_aleatoria_es_reproducible():
+    df = pd.DataFrame({"a": range(100)})
+    primera = seleccionar_filas(df, 10, estrategia="aleatoria")
+    assert len(primera) == 10
+    assert primera.equals(seleccionar_filas(df, 10, estrategia="aleatoria"))
+    assert seleccionar_filas(df.iloc[:0], 10, estrategia="aleatoria").empty
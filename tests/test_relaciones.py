@@ -0,0 +1,40 @@
+import pandas as pd
+
+from catalogador import pipeline
+from catalogador.relaciones import _afinidad, descubrir_relaciones
+
+
+def _tablas(tmp_path, hojas):
+    rutas = []
+    for nombre, df in hojas.items():
+        ruta = tmp_path / f"{nombre}.csv"
+        df.to_csv(ruta, index=False)
+        rutas.append(str(ruta))
+    return pipeline.asignar_ids([t for ruta in rutas for t in pipeline.leer_archivo(ruta)])
+
+
+def test_nombre_corto_no_es_afin():
+    assert not _afinidad("op", "nro_pedido", "Pedidos")
+    assert not _afinidad("id", "id", "Pedidos")
+    assert _afinidad("id_cliente", "id", "Clientes")
+    assert _afinidad("CodAgencia", "agencia", "Agencias")
+
+
+def test_columna_corta_numerica_no_referencia_a_otra(tmp_path):
+    tablas = _tablas(tmp_path, {
+        "Pedidos": pd.DataFrame({"nro_pedido": range(1000), "monto": [i * 3 for i in range(1000)]}),
+        "Comp": pd.DataFrame({"op": [i % 30 for i in range(600)], "detalle": [f"x{i}" for i in range(600)]}),
+    })
+    relaciones = descubrir_relaciones(tablas)
+    assert not [r for r in relaciones if r["columna_origen"] == "op"]
+
+
+def test_clave_foranea_con_nombre_afin(tmp_path):
+    tablas = _tablas(tmp_path, {
+        "Pedidos": pd.DataFrame({"nro_pedido": range(1000), "monto": [i * 3 for i in range(1000)]}),
+        "Detalle": pd.DataFrame({"pedido": [i % 1000 for i in range(0, 3000, 7)], "cantidad": range(0, 3000, 7)}),
+    })
+    relaciones = descubrir_relaciones(tablas)
+    assert [(r["columna_origen"], r["columna_destino"], r["confianza"]) for r in relaciones] == [
+        ("pedido", "nro_pedido", "alta")
+    ]
@@ -0,0 +1,16 @@
+from catalogador.reutilizacion import IndiceColumnas, firma_valores, similitud
+
+
+def test_misma_forma_con_otros_valores_no_es_similar():
+    productos = firma_valores(["P001", "P002", "P017", "P120"])
+    assert similitud(productos, firma_valores(["E900", "E431", "E222"])) == 0.0
+    assert similitud(firma_valores(["1001", "1002", "1003"]), firma_valores(["9001", "9002", "9003"])) == 0.0
+    assert similitud(productos, firma_valores(["P001", "P002", "P017", "P120"])) == 1.0
+
+
+def test_codigo_de_productos_no_hereda_descripcion_de_entidades(tmp_path):
+    indice = IndiceColumnas(str(tmp_path / "indice.sqlite"))
+    indice.agregar("codigo", "Código de la entidad financiera", ["E900", "E431", "E222", "E105"], revisada=True)
+    assert indice.buscar("Codigo", ["P001", "P002", "P017", "P120"]) is None
+    encontrada = indice.buscar("CODIGO", ["E900", "E431", "E222"])
+    assert encontrada["description"] == "Código de la entidad financiera"
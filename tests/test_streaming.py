@@ -0,0 +1,109 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import openpyxl
+import pandas as pd
+
+from catalogador import pipeline
+from catalogador.claves import NO_VERIFICADO
+from catalogador.streaming import PerfilIncremental
+
+
+def _libro(tmp_path, filas=300):
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.title = "datos"
+    hoja.append(["agencia", "op", "codigo", "monto", "fecha", "ubigeo", "nota", "fecha_txt"])
+    for i in range(filas):
+        hoja.append([
+            f"AG{i % 5}", i // 5, str(i % 15), round(i * 1.5, 2) if i % 7 else i,
+            datetime.datetime(2024, 1, 1) + datetime.timedelta(days=i % 300),
+            f"0{10101 + i % 50}", None if i % 3 else f"nota {i}", f"{1 + i % 28:02d}/03/2024",
+        ])
+    ruta = tmp_path / "libro.xlsx"
+    libro.save(ruta)
+    return str(ruta)
+
+
+def _ambas_lecturas(ruta):
+    # Sin umbral la hoja se carga completa; con un umbral bajo se lee en streaming
+    en_memoria, = pipeline.leer_archivo(ruta, None, None)
+    en_streaming, = pipeline.leer_archivo(ruta, None, 10)
+    return en_memoria, en_streaming
+
+
+def test_huellas_iguales_en_memoria_y_streaming(tmp_path):
+    en_memoria, en_streaming = _ambas_lecturas(_libro(tmp_path))
+    for campo in ("schema_hash", "content_hash", "huella_filas", "firma_filas"):
+        assert en_memoria[campo] == en_streaming[campo], campo
+
+
+def test_huellas_de_parquet_iguales_en_memoria_y_streaming(tmp_path):
+    ruta = tmp_path / "tabla.parquet"
+    pd.DataFrame({
+        "monto": [i / 4 if i % 5 else None for i in range(300)],
+        "cantidad": range(300),
+        "fecha": pd.date_range("2024-01-01", periods=300, freq="h"),
+    }).to_parquet(ruta)
+    en_memoria, en_streaming = _ambas_lecturas(str(ruta))
+    for campo in ("content_hash", "huella_filas"):
+        assert en_memoria[campo] == en_streaming[campo], campo
+
+
+def test_perfil_de_textos_igual_en_memoria_y_streaming(tmp_path):
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(["codigo_txt", "decimal_txt", "cero_izq", "mixta", "fecha_txt", "numero_y_fecha"])
+    for i in range(200):
+        hoja.append([
+            str(i % 15), f"{i / 4}" if i % 9 else f"{i}e1", f"0{i % 7}" if i % 50 == 0 else str(i),
+            i if i % 11 else f"x{i}", f"{1 + i % 28:02d}/03/2024", "2024-05-01" if i % 2 else 20240501,
+        ])
+    ruta = tmp_path / "textos.xlsx"
+    libro.save(ruta)
+    en_memoria, en_streaming = _ambas_lecturas(str(ruta))
+    assert en_streaming["perfil_columnas"]["codigo_txt"]["tipo"] == "numero"
+    assert en_streaming["perfil_columnas"]["cero_izq"]["tipo"] == "texto"
+    assert en_memoria["perfil_columnas"] == en_streaming["perfil_columnas"]
+
+
+def test_clave_compuesta_igual_en_memoria_y_streaming(tmp_path):
+    # Ninguna columna es única por sí sola: la clave es agencia + op
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(["agencia", "op", "monto", "nota"])
+    for i in range(12000):
+        hoja.append([f"AG{i % 4}", i // 4, (i // 4) % 500, None if i % 3 else "x"])
+    ruta = tmp_path / "clave.xlsx"
+    libro.save(ruta)
+    en_memoria, en_streaming = _ambas_lecturas(str(ruta))
+    assert en_memoria["nombre_id"] == en_streaming["nombre_id"] == "agencia + op"
+
+
+def test_sin_hashes_la_clave_queda_sin_verificar():
+    perfil = PerfilIncremental(["a", "b"], max_bytes_claves=64)
+    for i in range(100):
+        perfil.agregar([str(i), "x"])
+    assert perfil.columna_id() == NO_VERIFICADO
+
+
+def test_distintos_estimados_no_dependen_del_proceso():
+    # Sin hashes guardados los distintos son una estimación KMV: debe repetirse con otra semilla de hash()
+    codigo = (
+        "from catalogador.streaming import PerfilIncremental\n"
+        "perfil = PerfilIncremental(['a'], max_bytes_claves=64)\n"
+        "for i in range(20000): perfil.agregar([f'v{i % 5000}'])\n"
+        "print(perfil.perfil_columnas()['a']['distintos'])\n"
+    )
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    salidas = {
+        subprocess.run(
+            [sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONPATH": raiz, "PYTHONHASHSEED": semilla},
+        ).stdout
+        for semilla in ("1", "2")
+    }
+    assert len(salidas) == 1
+    assert abs(int(salidas.pop()) - 5000) < 500
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Hace de página de Streamlit: código sin guardia __name__ que anota el PID de cada proceso que la ejecuta
+PAGINA = textwrap.dedent("""
+    import os, sys
+    from concurrent.futures import ProcessPoolExecutor
+    with open(sys.argv[1], "a") as marca:
+        marca.write(f"{os.getpid()}\\n")
+    from catalogador import pipeline, trabajador
+    from catalogador.planos import nombre_tabla
+    archivos = sys.argv[3:]
+    if sys.argv[2] == "spawn":
+        pool = ProcessPoolExecutor(2, mp_context=trabajador._ContextoSpawn())
+    else:
+        pool = pipeline.pool_lectura(2)
+    with pool:
+        tablas = pipeline.leer_tablas(archivos, {os.path.basename(a): [nombre_tabla(os.path.basename(a))] for a in archivos}, pool=pool)
+    print(len(tablas))
+""")
+
+
+@pytest.mark.parametrize("metodo", ["pool_lectura", "spawn"])
+def test_los_lectores_no_ejecutan_la_pagina(tmp_path, metodo):
+    archivos = []
+    for k in range(3):
+        ruta = tmp_path / f"datos_{k}.csv"
+        ruta.write_text("id,valor\n" + "".join(f"{i},{i * k}\n" for i in range(50)))
+        archivos.append(str(ruta))
+    pagina = tmp_path / "pagina.py"
+    pagina.write_text(PAGINA)
+    marca = tmp_path / "pids.txt"
+    resultado = subprocess.run(
+        [sys.executable, str(pagina), str(marca), metodo, *archivos],
+        capture_output=True, text=True, timeout=120, env={**os.environ, "PYTHONPATH": RAIZ},
+    )
+    assert resultado.returncode == 0, resultado.stderr
+    assert resultado.stdout.strip() == "3"
+    assert len(marca.read_text().split()) == 1